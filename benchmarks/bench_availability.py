@@ -0,0 +1,171 @@
+"""
+Compares the old way of evaluating availability (lists of ISO date strings,
+strptime and itertools.groupby) with the bitmask one in `camping`, on
+synthetic campgrounds shaped like `other/sample.json`.
+
+Run it from the project root:
+
+    python -m benchmarks.bench_availability --sites 500 --months 6 --nights 3
+"""
+import argparse
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import count, groupby
+
+import camping
+from benchmarks.generators import generate_park, months_from
+from enums.date_format import DateFormat
+from utils import formatter
+
+# The implementation before bitmasks, kept here as the baseline.
+
+
+def legacy_get_park_information(api_data):
+    data = {}
+    for month_data in api_data:
+        for campsite_id, campsite_data in month_data["campsites"].items():
+            a = data.setdefault(campsite_id, [])
+            for date, value in campsite_data["availabilities"].items():
+                if value == "Available":
+                    a.append(date)
+    return data
+
+
+def legacy_consecutive_nights(available, nights):
+    ordinal_dates = [
+        datetime.strptime(
+            dstr, DateFormat.ISO_DATE_FORMAT_RESPONSE.value
+        ).toordinal()
+        for dstr in available
+    ]
+    c = count()
+    consecutive_ranges = list(
+        list(g) for _, g in groupby(ordinal_dates, lambda x: x - next(c))
+    )
+    ranges = []
+    for r in consecutive_ranges:
+        if len(r) < nights:
+            continue
+        for start_index in range(0, len(r) - nights + 1):
+            ranges.append(
+                (
+                    formatter.format_date(
+                        datetime.fromordinal(r[start_index]),
+                        format_string=DateFormat.INPUT_DATE_FORMAT.value,
+                    ),
+                    formatter.format_date(
+                        datetime.fromordinal(r[start_index + nights - 1] + 1),
+                        format_string=DateFormat.INPUT_DATE_FORMAT.value,
+                    ),
+                )
+            )
+    return ranges
+
+
+def legacy_get_num_available_sites(
+    park_information, start_date, end_date, nights=None, weekends_only=False
+):
+    maximum = len(park_information)
+    num_available = 0
+    num_days = (end_date - start_date).days
+    dates = [end_date - timedelta(days=i) for i in range(1, num_days + 1)]
+    if weekends_only:
+        dates = filter(camping.is_weekend, dates)
+    dates = set(
+        formatter.format_date(
+            i, format_string=DateFormat.ISO_DATE_FORMAT_RESPONSE.value
+        )
+        for i in dates
+    )
+    if nights not in range(1, num_days + 1):
+        nights = num_days
+    available_dates_by_campsite_id = defaultdict(list)
+    for site, availabilities in park_information.items():
+        desired_available = [d for d in availabilities if d in dates]
+        if not desired_available:
+            continue
+        ranges = legacy_consecutive_nights(desired_available, nights)
+        if ranges:
+            num_available += 1
+        for start, end in ranges:
+            available_dates_by_campsite_id[int(site)].append(
+                {"start": start, "end": end}
+            )
+    return num_available, maximum, available_dates_by_campsite_id
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=500)
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--nights", type=int, default=3)
+    parser.add_argument("--weekends-only", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start_date = datetime(2022, 5, 1)
+    api_data = generate_park(
+        1, months_from(start_date, args.months), args.sites, args.density
+    )
+    end_date = start_date + timedelta(days=30 * args.months)
+
+    legacy_collapse, legacy_info = best_of(
+        lambda: legacy_get_park_information(api_data), args.repeat
+    )
+    legacy_eval, legacy_result = best_of(
+        lambda: legacy_get_num_available_sites(
+            legacy_info, start_date, end_date, args.nights, args.weekends_only
+        ),
+        args.repeat,
+    )
+    bitmask_collapse, bitmask_info = best_of(
+        lambda: camping.collapse_park_information(api_data, origin=start_date),
+        args.repeat,
+    )
+    bitmask_eval, bitmask_result = best_of(
+        lambda: camping.get_num_available_sites(
+            bitmask_info, start_date, end_date, args.nights, args.weekends_only
+        ),
+        args.repeat,
+    )
+    assert legacy_result == bitmask_result, "Results differ!"
+
+    print(
+        "{} sites x {} months, density {}, {} nights{}".format(
+            args.sites,
+            args.months,
+            args.density,
+            args.nights,
+            ", weekends only" if args.weekends_only else "",
+        )
+    )
+    print("{:<10} {:>12} {:>12}".format("", "collapse ms", "evaluate ms"))
+    for name, collapse, evaluate in (
+        ("strings", legacy_collapse, legacy_eval),
+        ("bitmasks", bitmask_collapse, bitmask_eval),
+    ):
+        print(
+            "{:<10} {:>12.2f} {:>12.2f}".format(
+                name, collapse * 1000, evaluate * 1000
+            )
+        )
+    print(
+        "Speedup: {:.1f}x overall".format(
+            (legacy_collapse + legacy_eval) / (bitmask_collapse + bitmask_eval)
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
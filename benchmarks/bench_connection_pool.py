@@ -0,0 +1,78 @@
+"""
+Compares a new connection per request (the old `requests.get` behaviour)
+against `RecreationClient`'s pooled keep-alive session, using
+`benchmarks.fake_server` so nothing touches recreation.gov.
+
+Run it from the project root:
+
+    python -m benchmarks.bench_connection_pool --requests 200
+
+Localhost has no TLS and next to no round trip time, so the saving measured
+here is a lower bound on what you get against the real site.
+"""
+import argparse
+import time
+
+import requests
+
+from benchmarks.fake_server import FakeRecreationServer
+from clients.rate_limiter import CAMPGROUND_ENDPOINT, RateLimiter
+from clients.recreation_client import RecreationClient
+
+
+def run(name, send, server, url, num_requests):
+    server.connections = 0
+    start = time.perf_counter()
+    for _ in range(num_requests):
+        send(url)
+    elapsed = time.perf_counter() - start
+    return {
+        "name": name,
+        "requests": num_requests,
+        "connections": server.connections,
+        "total_s": elapsed,
+        "per_request_ms": elapsed / num_requests * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    # Measure connections, not the rate limiter.
+    RecreationClient.rate_limiter = RateLimiter({CAMPGROUND_ENDPOINT: 1e9})
+    server = FakeRecreationServer().start()
+    url = server.base_url + RecreationClient.MAIN_PAGE_ENDPOINT.format(park_id=1)
+
+    results = [
+        run(
+            "new connection per request",
+            lambda u: requests.get(u, headers=RecreationClient.get_headers()).json(),
+            server,
+            url,
+            args.requests,
+        ),
+        run(
+            "pooled session",
+            lambda u: RecreationClient._send_request(
+                u, {}, CAMPGROUND_ENDPOINT
+            ),
+            server,
+            url,
+            args.requests,
+        ),
+    ]
+    server.stop()
+
+    for r in results:
+        print(
+            "{name:<28} {requests} requests over {connections} connection(s), "
+            "{per_request_ms:.3f} ms/request".format(**r)
+        )
+    saved = results[0]["per_request_ms"] - results[1]["per_request_ms"]
+    print("Saved {:.3f} ms per request by reusing connections".format(saved))
+
+
+if __name__ == "__main__":
+    main()
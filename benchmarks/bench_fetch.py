@@ -0,0 +1,104 @@
+"""
+Load tests fetching availability against `benchmarks.fake_server`, at a
+range of concurrency levels and with whatever latency, errors and
+throttling you like.
+
+Run it from the project root:
+
+    python -m benchmarks.bench_fetch --parks 20 --months 3 --latency 0.05 --concurrency 1 4 8 16
+
+With --cache each level is run twice against a fresh `ResponseCache`, to
+compare a cold cache with a warm one.
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.fake_server import FakeRecreationServer
+from benchmarks.generators import months_from
+from clients.rate_limiter import RateLimiter
+from clients.recreation_client import RecreationClient
+from clients.response_cache import ResponseCache
+from utils.fetcher import RequestLimiter, fetch_all
+
+
+def run(name, keys, concurrency):
+    start = time.perf_counter()
+    results = fetch_all(
+        lambda key: RecreationClient.get_availability(*key),
+        keys,
+        max_workers=concurrency,
+    )
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for r in results if r.error is not None)
+    print(
+        "{:<24} {:>8.2f}s {:>8.1f} months/s {:>4} failed".format(
+            name, elapsed, len(keys) / elapsed, failed
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parks", type=int, default=20)
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--sites", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--cache", action="store_true")
+    args = parser.parse_args()
+
+    server = FakeRecreationServer(
+        sites=args.sites,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=0,
+    ).start()
+    RecreationClient.BASE_URL = server.base_url
+    # Measure the client, not the rate limiter or backoff.
+    RecreationClient.rate_limiter = RateLimiter(
+        {endpoint: 1e9 for endpoint in RateLimiter().rates}
+    )
+    RecreationClient.backoff_base = 0.01
+
+    months = months_from(datetime(2022, 6, 1), args.months)
+    keys = [
+        (park_id, month_date)
+        for park_id in range(1, args.parks + 1)
+        for month_date in months
+    ]
+    # Generate every month up front so the first run isn't penalised.
+    for park_id, month_date in keys:
+        server.month_body(park_id, month_date)
+
+    for concurrency in args.concurrency:
+        RecreationClient.limiter = RequestLimiter(concurrency, concurrency)
+        RecreationClient.configure_session(pool_maxsize=concurrency)
+        server.stats.clear()
+        if args.cache:
+            with tempfile.TemporaryDirectory() as directory:
+                RecreationClient.cache = ResponseCache(directory)
+                run("concurrency {} cold".format(concurrency), keys, concurrency)
+                run("concurrency {} warm".format(concurrency), keys, concurrency)
+            RecreationClient.cache = None
+        else:
+            run("concurrency {}".format(concurrency), keys, concurrency)
+        print(
+            "    responses: {}".format(
+                ", ".join(
+                    "{} {}: {}".format(endpoint, status, count)
+                    for (endpoint, status), count in sorted(server.stats.items())
+                )
+            )
+        )
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compares parsing an availability month the old way (`requests`'
+`Response.json`, i.e. decode to str then `json.loads`) with `parse_month`,
+which drops the dates that aren't available while decoding, for peak
+memory and time. `filter_month` is what each search then does with the
+shared, parsed month, with and without the park's `SiteIndex`.
+
+Run it from the project root:
+
+    python -m benchmarks.bench_parsing --sites 1000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.generators import generate_month
+from clients.payload_parser import filter_month, parse_month
+from utils.site_index import SiteFilter, SiteIndex
+
+
+def measure(fn, repeat):
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return peak, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=1000)
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    month = generate_month(1, datetime(2022, 6, 1), args.sites, args.density)
+    body = json.dumps(month).encode("utf-8")
+    excluded = list(month["campsites"])[::7]
+    site_filter = SiteFilter(
+        loops=["A", "B"],
+        people=6,
+        reserve_types=["Site-Specific"],
+        excluded_site_ids=excluded,
+    )
+    index = SiteIndex(month["campsites"])
+    parsed = parse_month(body)
+
+    cases = [
+        ("Response.json", lambda: json.loads(body.decode("utf-8"))),
+        ("parse_month", lambda: parse_month(body)),
+        (
+            "filter_month",
+            lambda: filter_month(
+                parsed,
+                campsite_type="STANDARD NONELECTRIC",
+                excluded_site_ids=excluded,
+            ),
+        ),
+        (
+            "filter_month + site filter",
+            lambda: filter_month(parsed, site_filter=site_filter),
+        ),
+        (
+            "filter_month + index",
+            lambda: filter_month(parsed, site_filter=site_filter, index=index),
+        ),
+    ]
+
+    print(
+        "{} sites, {:.0f} KB body, density {}".format(
+            args.sites, len(body) / 1024, args.density
+        )
+    )
+    print("{:<28} {:>14} {:>10}".format("", "peak memory KB", "time ms"))
+    for name, fn in cases:
+        peak, elapsed = measure(fn, args.repeat)
+        print(
+            "{:<28} {:>14.0f} {:>10.2f}".format(
+                name, peak / 1024, elapsed * 1000
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Measures how long `camping.py` takes to start, using `python -X importtime`.
+
+Run it from the project root:
+
+    python -m benchmarks.bench_startup --repeat 5
+
+Prints the best total import time of `camping` and the modules that took
+longest to import. `tests/test_startup.py` checks the slow optional imports
+stay out of startup.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use only, so `--help` and argument errors don't pay for
+# them.
+LAZY_MODULES = ("requests", "urllib3", "user_agent", "dateutil")
+
+
+def import_times(args=("-c", "import camping")):
+    """
+    Runs `python -X importtime <args>` in the project root and returns
+    {<module>: (<self microseconds>, <cumulative microseconds>)}.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime"] + list(args),
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            # The header line.
+            continue
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.repeat)]
+    best = min(runs, key=lambda times: times["camping"][1])
+    print(
+        "import camping: {:.1f}ms (best of {})".format(
+            best["camping"][1] / 1000, args.repeat
+        )
+    )
+    print()
+    print("{:<48} {:>10} {:>10}".format("module", "self ms", "total ms"))
+    slowest = sorted(best.items(), key=lambda item: item[1][1], reverse=True)
+    for module, (self_us, cumulative_us) in slowest[: args.top]:
+        print(
+            "{:<48} {:>10.1f} {:>10.1f}".format(
+                module, self_us / 1000, cumulative_us / 1000
+            )
+        )
+
+    lazy = sorted(
+        module
+        for module in best
+        if module.split(".")[0] in LAZY_MODULES
+    )
+    if lazy:
+        print()
+        print("Imported at startup but meant to be lazy: {}".format(", ".join(lazy)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+A stand-in for recreation.gov's availability and campground endpoints, for
+load and latency testing without going anywhere near the real site.
+
+Run it from the project root:
+
+    python -m benchmarks.fake_server --port 8000 --latency 0.05 --error-rate 0.01 --throttle-rate 0.02 --churn 0.01
+
+and point the script at it:
+
+    python camping.py --base-url http://127.0.0.1:8000 --start-date 2030-06-01 --end-date 2030-06-05 --parks 1 2 3
+
+Months are made up by `benchmarks.generators` unless --recorded is given,
+either a directory of availability responses saved by `--cache-dir` or a
+JSON list of month payloads like `other/sample.json`, which are then
+served for every park.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.generators import UNAVAILABLE_VALUES, generate_month
+
+AVAILABILITY_PATH = re.compile(r"^/api/camps/availability/campground/(\d+)/month$")
+CAMPGROUND_PATH = re.compile(r"^/api/camps/campgrounds/(\d+)$")
+
+
+class FakeRecreationServer:
+    """
+    Serves availability months and campground names on localhost.
+
+    - `latency` seconds (plus up to `latency_jitter` more) are added to
+      every response.
+    - a random `error_rate` of requests get a 500, and `throttle_rate` a
+      429 with a Retry-After of `retry_after` seconds.
+    - every `churn_interval` seconds, a fraction `churn` of the nights in
+      each month flip between available and not, like bookings and
+      cancellations coming in.
+    - responses carry an ETag, and If-None-Match gets a 304 while the month
+      hasn't changed. Bodies are gzipped for clients that accept it.
+
+    `stats` counts the responses sent by (endpoint, status), and
+    `connections` the connections opened to the server.
+    """
+
+    def __init__(
+        self,
+        sites=100,
+        density=0.3,
+        latency=0.0,
+        latency_jitter=0.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        retry_after=1,
+        churn=0.0,
+        churn_interval=60.0,
+        recorded=None,
+        seed=0,
+        host="127.0.0.1",
+        port=0,
+        clock=time.monotonic,
+    ):
+        self.sites = sites
+        self.density = density
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.churn = churn
+        self.churn_interval = churn_interval
+        self.seed = seed
+        self.clock = clock
+        self.started = clock()
+        self.stats = {}
+        self.connections = 0
+        self._recorded = _load_recorded(recorded) if recorded else None
+        # {(park_id, month_date): (body, etag)} for `_bodies_epoch` only.
+        self._bodies = {}
+        self._bodies_epoch = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def epoch(self):
+        if not self.churn:
+            return 0
+        return int((self.clock() - self.started) // self.churn_interval)
+
+    def month_body(self, park_id, month_date):
+        """
+        The (body, etag) of the month as it stands in the current epoch.
+        """
+        epoch = self.epoch()
+        key = (park_id, month_date)
+        with self._lock:
+            if epoch != self._bodies_epoch:
+                # Earlier epochs' bodies are never served again.
+                self._bodies = {}
+                self._bodies_epoch = epoch
+            cached = self._bodies.get(key)
+        if cached is not None:
+            return cached
+
+        month = self._month(park_id, month_date)
+        if month is None:
+            return None
+        if epoch:
+            seed = "{}-{}".format((park_id, month_date, epoch), self.seed)
+            _churn(month, self.churn, random.Random(seed))
+        body = json.dumps(month).encode("utf-8")
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        with self._lock:
+            if epoch == self._bodies_epoch:
+                self._bodies[key] = (body, etag)
+        return body, etag
+
+    def _month(self, park_id, month_date):
+        if self._recorded is None:
+            return generate_month(
+                park_id, month_date, self.sites, self.density, self.seed
+            )
+        for key in ((park_id, month_date), (None, month_date)):
+            if key in self._recorded:
+                return json.loads(self._recorded[key])
+        return None
+
+    def outcome(self):
+        """
+        Picks the status of the next response: 200, or a 500 or 429.
+        """
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.error_rate:
+            return 500
+        if roll < self.error_rate + self.throttle_rate:
+            return 429
+        return 200
+
+    def delay(self):
+        if self.latency or self.latency_jitter:
+            with self._lock:
+                jitter = self._rng.uniform(0, self.latency_jitter)
+            time.sleep(self.latency + jitter)
+
+    def record(self, endpoint, status):
+        with self._lock:
+            key = (endpoint, status)
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+
+def _churn(month, fraction, rng):
+    for site in month["campsites"].values():
+        availabilities = site["availabilities"]
+        for date, value in availabilities.items():
+            if rng.random() < fraction:
+                availabilities[date] = (
+                    rng.choice(UNAVAILABLE_VALUES)
+                    if value == "Available"
+                    else "Available"
+                )
+
+
+def _load_recorded(path):
+    """
+    {(<park_id or None for any park>, <month>): <body bytes>} from a cache
+    directory or a JSON list of months.
+    """
+    recorded = {}
+    if os.path.isdir(path):
+        for name in os.listdir(path):
+            match = re.match(r"^(\d+)-(\d{4})-(\d{2})\.json$", name)
+            if match:
+                park_id, year, month = (int(g) for g in match.groups())
+                with open(os.path.join(path, name), "rb") as f:
+                    recorded[(park_id, datetime(year, month, 1))] = f.read()
+        return recorded
+
+    with open(path) as f:
+        months = json.load(f)
+    for month in months:
+        for site in month["campsites"].values():
+            first_date = next(iter(site["availabilities"]), None)
+            if first_date is not None:
+                month_date = datetime(int(first_date[0:4]), int(first_date[5:7]), 1)
+                recorded[(None, month_date)] = json.dumps(month).encode("utf-8")
+            break
+    return recorded
+
+
+def _handler_for(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes, which without this
+        # stalls every keep-alive response on delayed ACKs.
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with server._lock:
+                server.connections += 1
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            server.delay()
+
+            match = AVAILABILITY_PATH.match(url.path)
+            if match:
+                return self._availability(int(match.group(1)), parse_qs(url.query))
+            match = CAMPGROUND_PATH.match(url.path)
+            if match:
+                return self._campground(int(match.group(1)))
+            self._send("other", 404, b"")
+
+        def _availability(self, park_id, query):
+            status = server.outcome()
+            if status != 200:
+                return self._send("availability", status, b"")
+            try:
+                start_date = query["start_date"][0]
+                month_date = datetime(int(start_date[0:4]), int(start_date[5:7]), 1)
+            except (KeyError, ValueError):
+                return self._send("availability", 400, b"")
+
+            month = server.month_body(park_id, month_date)
+            if month is None:
+                return self._send("availability", 404, b"")
+            body, etag = month
+            if self.headers.get("If-None-Match") == etag:
+                return self._send("availability", 304, b"", {"ETag": etag})
+            self._send("availability", 200, body, {"ETag": etag})
+
+        def _campground(self, park_id):
+            status = server.outcome()
+            body = b""
+            if status == 200:
+                body = json.dumps(
+                    {"campground": {"facility_name": "FAKE PARK {}".format(park_id)}}
+                ).encode("utf-8")
+            self._send("campground", status, body)
+
+        def _send(self, endpoint, status, body, headers=None):
+            server.record(endpoint, status)
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            if status == 429:
+                self.send_header("Retry-After", str(server.retry_after))
+            if body and "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body, compresslevel=1)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--sites", type=int, default=100)
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--churn", type=float, default=0.0)
+    parser.add_argument("--churn-interval", type=float, default=60.0)
+    parser.add_argument("--recorded")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeRecreationServer(
+        sites=args.sites,
+        density=args.density,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        churn=args.churn,
+        churn_interval=args.churn_interval,
+        recorded=args.recorded,
+        seed=args.seed,
+        host=args.host,
+        port=args.port,
+    )
+    print("Serving on {}".format(server.base_url), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Synthetic campgrounds in the same schema as the availability endpoint (see
+`other/sample.json`), for benchmarks and the like.
+
+Everything is seeded, so the same arguments always give the same data.
+"""
+import random
+from datetime import datetime, timedelta
+
+from enums.date_format import DateFormat
+from utils.planner import month_starts
+
+CAMPSITE_TYPES = (
+    "STANDARD NONELECTRIC",
+    "STANDARD ELECTRIC",
+    "TENT ONLY NONELECTRIC",
+    "GROUP STANDARD NONELECTRIC",
+    "RV NONELECTRIC",
+)
+LOOPS = ("A", "B", "C", "D")
+RESERVE_TYPES = ("Site-Specific", "Non Site-Specific")
+CAPACITY_RATINGS = ("Single", "Double", "Group")
+UNAVAILABLE_VALUES = ("Reserved", "Not Reservable", "Not Available")
+
+
+def months_from(start, num_months):
+    """
+    The first of each of the `num_months` months starting with `start`'s.
+    """
+    # The year and (0-based) month of the last month.
+    year, month = divmod(start.year * 12 + start.month - 2 + num_months, 12)
+    return month_starts(start, datetime(year, month + 1, 1))
+
+
+def generate_campsites(park_id, num_sites, seed=0):
+    """
+    The metadata of each site in a park, without availabilities.
+    """
+    rng = random.Random("{}-{}".format(seed, park_id))
+    campsites = []
+    for i in range(num_sites):
+        max_people = rng.choice((4, 6, 8, 12, 40))
+        campsites.append(
+            {
+                "campsite_id": str(park_id * 100000 + i),
+                "campsite_reserve_type": rng.choice(RESERVE_TYPES),
+                "campsite_type": rng.choice(CAMPSITE_TYPES),
+                "capacity_rating": rng.choice(CAPACITY_RATINGS),
+                "loop": rng.choice(LOOPS),
+                "max_num_people": max_people,
+                "min_num_people": 1,
+                "quantities": None,
+                "site": "{:03d}".format(i + 1),
+                "type_of_use": "Overnight",
+            }
+        )
+    return campsites
+
+
+def generate_month(park_id, month_date, num_sites, density=0.3, seed=0):
+    """
+    One month payload for `park_id`. Each night of each site is "Available"
+    with probability `density`.
+    """
+    rng = random.Random(
+        "{}-{}-{}".format(seed, park_id, month_date.strftime("%Y-%m"))
+    )
+    next_month = months_from(month_date, 2)[1]
+    dates = [
+        (month_date + timedelta(days=d)).strftime(
+            DateFormat.ISO_DATE_FORMAT_RESPONSE.value
+        )
+        for d in range((next_month - month_date).days)
+    ]
+
+    campsites = {}
+    for campsite in generate_campsites(park_id, num_sites, seed):
+        site = {
+            "availabilities": {
+                date: (
+                    "Available"
+                    if rng.random() < density
+                    else rng.choice(UNAVAILABLE_VALUES)
+                )
+                for date in dates
+            }
+        }
+        site.update(campsite)
+        campsites[site["campsite_id"]] = site
+    return {"campsites": campsites, "count": num_sites}
+
+
+def generate_park(park_id, months, num_sites, density=0.3, seed=0):
+    return [
+        generate_month(park_id, month_date, num_sites, density, seed)
+        for month_date in months
+    ]
+
+
+def generate_parks(num_parks, months, num_sites, density=0.3, seed=0, first_park_id=1):
+    """
+    {<park_id>: [<month payload>, ...]} for `num_parks` parks.
+    """
+    return {
+        park_id: generate_park(park_id, months, num_sites, density, seed)
+        for park_id in range(first_park_id, first_park_id + num_parks)
+    }
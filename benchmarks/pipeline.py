@@ -0,0 +1,221 @@
+"""
+Times each stage of the availability pipeline on synthetic campgrounds and
+tracks the peak memory of each, without touching the network.
+
+Run it from the project root:
+
+    python -m benchmarks.pipeline --parks 10 --sites 300 --months 3 --output results.json
+
+Results are written as JSON, so runs on different commits can be compared:
+
+    python -m benchmarks.pipeline --compare results.json
+
+exits with status 1 if any stage got slower than --threshold (20% by
+default) compared with results.json.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import camping
+from benchmarks.generators import generate_parks, months_from
+from clients.payload_parser import parse_month
+
+
+def time_stage(fn, repeat):
+    """
+    Runs `fn` `repeat` times for timings, then once more under tracemalloc
+    for its peak memory. Returns the stats and the result of the last run.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (
+        {
+            "min_seconds": min(timings),
+            "median_seconds": statistics.median(timings),
+            "peak_bytes": peak,
+        },
+        result,
+    )
+
+
+def run(args):
+    start_date = datetime(2022, 6, 1)
+    months = months_from(start_date, args.months)
+    end_date = start_date + timedelta(days=30 * args.months - 1)
+    parks = generate_parks(args.parks, months, args.sites, args.density)
+    bodies = {
+        park_id: [json.dumps(month).encode("utf-8") for month in park_months]
+        for park_id, park_months in parks.items()
+    }
+
+    stages = {}
+
+    stages["parse"], api_data = time_stage(
+        lambda: {
+            park_id: [parse_month(body) for body in park_bodies]
+            for park_id, park_bodies in bodies.items()
+        },
+        args.repeat,
+    )
+    stages["collapse"], park_information = time_stage(
+        lambda: {
+            park_id: camping.collapse_park_information(
+                park_months, origin=months[0]
+            )
+            for park_id, park_months in api_data.items()
+        },
+        args.repeat,
+    )
+    stages["evaluate"], results = time_stage(
+        lambda: {
+            park_id: camping.get_num_available_sites(
+                info,
+                start_date,
+                end_date,
+                nights=args.nights,
+                weekends_only=args.weekends_only,
+            )
+            for park_id, info in park_information.items()
+        },
+        args.repeat,
+    )
+    info_by_park_id = {
+        park_id: result + ("PARK {}".format(park_id),)
+        for park_id, result in results.items()
+    }
+    stages["human_output"], _ = time_stage(
+        lambda: camping.generate_human_output(
+            info_by_park_id, start_date, end_date, True
+        ),
+        args.repeat,
+    )
+    stages["json_output"], _ = time_stage(
+        lambda: camping.generate_json_output(info_by_park_id), args.repeat
+    )
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "parks": args.parks,
+            "sites": args.sites,
+            "months": args.months,
+            "density": args.density,
+            "nights": args.nights,
+            "weekends_only": args.weekends_only,
+            "repeat": args.repeat,
+        },
+        "stages": stages,
+    }
+
+
+def git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode("utf-8")
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints each stage against `baseline` and returns the names of the
+    stages that got slower by more than `threshold`.
+    """
+    regressions = []
+    print(
+        "{:<14} {:>12} {:>12} {:>8}".format(
+            "stage", "baseline ms", "now ms", "change"
+        )
+    )
+    for stage, stats in results["stages"].items():
+        if stage not in baseline["stages"]:
+            continue
+        before = baseline["stages"][stage]["min_seconds"]
+        after = stats["min_seconds"]
+        change = after / before - 1 if before else 0
+        if change > threshold:
+            regressions.append(stage)
+        print(
+            "{:<14} {:>12.2f} {:>12.2f} {:>+7.0%}{}".format(
+                stage,
+                before * 1000,
+                after * 1000,
+                change,
+                "  <- slower" if stage in regressions else "",
+            )
+        )
+    return regressions
+
+
+def print_results(results):
+    print(json.dumps(results["meta"]))
+    print(
+        "{:<14} {:>10} {:>10} {:>10}".format(
+            "stage", "min ms", "median ms", "peak KB"
+        )
+    )
+    for stage, stats in results["stages"].items():
+        print(
+            "{:<14} {:>10.2f} {:>10.2f} {:>10.0f}".format(
+                stage,
+                stats["min_seconds"] * 1000,
+                stats["median_seconds"] * 1000,
+                stats["peak_bytes"] / 1024,
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parks", type=int, default=10)
+    parser.add_argument("--sites", type=int, default=300)
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--nights", type=int, default=2)
+    parser.add_argument("--weekends-only", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this file.")
+    parser.add_argument(
+        "--compare", help="Compare against results from an earlier run."
+    )
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = run(args)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
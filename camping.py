@@ -3,18 +3,38 @@
 
 import json
 import logging
+import os
 import sys
 from collections import defaultdict
-from datetime import datetime, timedelta
-from itertools import count, groupby
-
-from dateutil import rrule
+from datetime import date, datetime, timedelta
 
+from clients.metadata_store import MetadataStore
+from clients.rate_limiter import DEFAULT_RATES, RateLimiter
 from clients.recreation_client import RecreationClient
+from clients.response_cache import ResponseCache
 from enums.date_format import DateFormat
 from enums.emoji import Emoji
-from utils import formatter
+from utils.availability import (
+    AvailabilityMatrix,
+    SiteBitmaps,
+    as_date,
+    date_ranges,
+    iter_bits,
+    parse_date,
+    run_starts,
+)
+from utils.availability_index import AvailabilityIndex
+from utils.calendar_mask import calendar_mask
 from utils.camping_argparser import CampingArgumentParser
+from utils.fetcher import RequestLimiter, fetch_all, fetch_each
+from utils.history import HistoryStore
+from utils.metrics import Metrics
+from utils.planner import month_starts, months_ahead, plan_months
+from utils.scheduler import PollScheduler
+from utils.singleflight import Memo
+from utils.site_index import SiteFilter
+from utils.snapshot import SnapshotStore
+from utils.workers import chunks, map_in_processes
 
 LOG = logging.getLogger(__name__)
 log_formatter = logging.Formatter(
@@ -24,9 +44,12 @@ sh = logging.StreamHandler()
 sh.setFormatter(log_formatter)
 LOG.addHandler(sh)
 
+# Friday and Saturday nights.
+WEEKEND_DAYS = (4, 5)
+
 
 def get_park_information(
-    park_id, start_date, end_date, campsite_type=None, campsite_ids=(), excluded_site_ids=[]
+    park_id, start_date, end_date, campsite_type=None, campsite_ids=(), excluded_site_ids=[], nights=None, weekends_only=False, site_filter=None, calendar=None,
 ):
     """
     This function consumes the user intent, collects the necessary information
@@ -37,63 +60,208 @@ def get_park_information(
     The only API to get availability information is the `month?` query param
     on the availability endpoint. You must query with the first of the month.
     This means if `start_date` and `end_date` cross a month boundary, we must
-    hit the endpoint multiple times.
+    hit the endpoint multiple times. Months that can't hold a stay of
+    `nights` nights (on weekends, with `weekends_only`) that isn't already
+    past are skipped, see `plan_months`. A `calendar` (see `get_calendar`)
+    replaces `nights` and `weekends_only` there.
 
-    The output of this function looks like this:
+    The output of this function is a `SiteBitmaps`, which looks like this:
 
-    {"<campsite_id>": [<date>, <date>]}
+    {"<campsite_id>": <bitmask>}
 
-    Where the values are a list of ISO 8601 date strings representing dates
-    where the campsite is available.
+    Where bit i of the bitmask is set if the campsite is available on the
+    night of `origin + i days`, `origin` being the first day of the first
+    month.
 
     Notably, the output doesn't tell you which sites are available. The rest of
     the script doesn't need to know this to determine whether sites are available.
     """
 
-    # Get each first of the month for months in the range we care about.
-    start_of_month = datetime(start_date.year, start_date.month, 1)
-    months = list(
-        rrule.rrule(rrule.MONTHLY, dtstart=start_of_month, until=end_date)
+    site_filter = SiteFilter.build(
+        campsite_type, campsite_ids, excluded_site_ids, site_filter
+    )
+    months = get_planned_months(
+        start_date, end_date, nights, weekends_only, calendar
+    )
+    api_data = fetch_months(park_id, months, site_filter=site_filter)
+    with RecreationClient.metrics.timer("stage", stage="collapse"):
+        return collapse_park_information(
+            api_data,
+            origin=get_months(start_date, end_date)[0],
+            site_filter=site_filter,
+            index=RecreationClient.site_index(park_id),
+        )
+
+
+def get_months(start_date, end_date):
+    """
+    Returns the first of each month in the range we care about.
+    """
+    return month_starts(start_date, end_date)
+
+
+def get_planned_months(
+    start_date, end_date, nights=None, weekends_only=False, calendar=None
+):
+    """
+    The months worth fetching for a search, nearest to today first.
+    """
+    return plan_months(
+        start_date,
+        end_date,
+        nights,
+        WEEKEND_DAYS if weekends_only else None,
+        today=date.today(),
+        calendar=calendar,
+    )
+
+
+def night_weekdays(weekends_only=False, weekdays=()):
+    """
+    The days whose nights a search can use, as a tuple, or None for every
+    day. With both `weekends_only` and `weekdays`, only the weekend nights
+    among `weekdays`.
+    """
+    night_days = set(weekdays) if weekdays else None
+    if weekends_only:
+        night_days = set(WEEKEND_DAYS) & (
+            night_days if night_days is not None else set(WEEKEND_DAYS)
+        )
+    return tuple(sorted(night_days)) if night_days is not None else None
+
+
+def get_calendar(
+    start_date, end_date, nights=None, weekends_only=False, weekdays=(), check_in_days=(), must_include=(),
+):
+    """
+    The `CalendarMask` of a search, built once and shared by every park it
+    checks. See `night_weekdays` for `weekends_only` and `weekdays`.
+    """
+    return calendar_mask(
+        start_date,
+        end_date,
+        nights,
+        night_weekdays(weekends_only, weekdays),
+        tuple(sorted(set(check_in_days))) or None,
+        tuple(sorted(set(must_include))) or None,
+    )
+
+
+def search_calendar(search):
+    """
+    `get_calendar` for a search, i.e. `args` or one of --queries.
+    --incremental reports every night that changes, whatever --nights and
+    the check-in constraints are.
+    """
+    if getattr(search, "incremental", False):
+        return get_calendar(
+            search.start_date,
+            search.end_date,
+            1,
+            search.weekends_only,
+            search.weekdays,
+        )
+    return get_calendar(
+        search.start_date, search.end_date, search.nights, search.weekends_only, search.weekdays, search.check_in_days, search.must_include,
     )
 
-    # Get data for each month.
+
+def fetch_months(
+    park_id, months, campsite_type=None, campsite_ids=(), excluded_site_ids=(), site_filter=None,
+):
+    """
+    Gets the availability data for each month. The months are fetched
+    concurrently, but `fetch_all` hands them back in order. The filters are
+    passed on so each month comes back with sites we don't want dropped or
+    emptied, see `filter_month`.
+    """
     api_data = []
-    for month_date in months:
-        api_data.append(RecreationClient.get_availability(park_id, month_date))
+    results = fetch_all(
+        lambda month_date: RecreationClient.get_availability(
+            park_id,
+            month_date,
+            campsite_type,
+            campsite_ids,
+            excluded_site_ids,
+            site_filter,
+        ),
+        months,
+        max_workers=RecreationClient.limiter.max_in_flight,
+    )
+    for result in results:
+        if result.error is not None:
+            raise result.error
+        api_data.append(result.value)
+    return api_data
 
-    # Collapse the data into the described output format.
-    # Filter by campsite_type if necessary.
-    data = {}
+
+def collapse_park_information(
+    api_data, campsite_type=None, campsite_ids=(), excluded_site_ids=[], origin=None, site_filter=None, index=None,
+):
+    """
+    Collapses the month payloads from the API into the format described in
+    `get_park_information`, filtering by campsite_type (and the rest of
+    `site_filter`) if necessary.
+
+    `origin` is the day bit 0 of each site's bitmask refers to. It must not
+    be after the first day of the earliest month, and defaults to exactly
+    that. `index` is the park's `SiteIndex`, if it has one.
+    """
+    site_filter = SiteFilter.build(
+        campsite_type, campsite_ids, excluded_site_ids, site_filter
+    )
+    origin = as_date(origin) if origin else _first_month(api_data)
+    origin_ordinal = origin.toordinal()
+    # The bit for each date string we've seen. Every site in a month has the
+    # same dates, so each one is only parsed once.
+    bit_by_date = {}
+    # Whether each site is wanted, from the index or worked out the first
+    # month it's in.
+    wanted_by_site = {}
+    if index is not None and site_filter:
+        wanted_by_site = dict(index.resolve(site_filter))
+    data = SiteBitmaps(origin)
 
     for month_data in api_data:
         for campsite_id, campsite_data in month_data["campsites"].items():
-            if campsite_id in excluded_site_ids:
+            if site_filter.excludes(campsite_id):
                 continue
-            available = []
-            a = data.setdefault(campsite_id, [])
+            mask = data.setdefault(campsite_id, 0)
+
+            wanted = wanted_by_site.get(campsite_id)
+            if wanted is None:
+                wanted = wanted_by_site[campsite_id] = site_filter.wants(
+                    campsite_data
+                )
+            if not wanted:
+                continue
+
             for date, availability_value in campsite_data[
                 "availabilities"
             ].items():
                 if availability_value != "Available":
                     continue
+                bit = bit_by_date.get(date)
+                if bit is None:
+                    bit = bit_by_date[date] = 1 << (
+                        parse_date(date).toordinal() - origin_ordinal
+                    )
+                mask |= bit
+            data[campsite_id] = mask
 
-                if (
-                    campsite_type
-                    and campsite_type != campsite_data["campsite_type"]
-                ):
-                    continue
+    return data
 
-                if (
-                    len(campsite_ids) > 0
-                    and int(campsite_data["campsite_id"]) not in campsite_ids
-                ):
-                    continue
 
-                available.append(date)
-            if available:
-                a += available
+def _first_month(api_data):
+    months = []
+    for month_data in api_data:
+        for campsite_data in month_data["campsites"].values():
+            for date in campsite_data["availabilities"]:
+                months.append(parse_date(date[:7] + "-01"))
+                break
+            break
+    return min(months) if months else datetime.now().date()
 
-    return data
 
 def is_weekend(date):
     weekday = date.weekday()
@@ -102,49 +270,39 @@ def is_weekend(date):
 
 
 def get_num_available_sites(
-    park_information, start_date, end_date, nights=None, weekends_only=False,
+    park_information, start_date, end_date, nights=None, weekends_only=False, calendar=None,
 ):
+    """
+    `park_information` is the output of `get_park_information`. For
+    convenience it can also be {<campsite_id>: [<ISO 8601 date string>, ...]}.
+
+    A `calendar` (see `get_calendar`) replaces `start_date`, `end_date`,
+    `nights` and `weekends_only`, e.g. to only count stays starting on a
+    Friday or including a Saturday night.
+    """
+    if not isinstance(park_information, SiteBitmaps):
+        park_information = SiteBitmaps.from_date_lists(park_information)
+    if calendar is None:
+        calendar = get_calendar(start_date, end_date, nights, weekends_only)
     maximum = len(park_information)
+    origin = park_information.origin
 
     num_available = 0
-    num_days = (end_date - start_date).days
-    dates = [end_date - timedelta(days=i) for i in range(1, num_days + 1)]
-    if weekends_only:
-        dates = filter(is_weekend, dates)
-    dates = set(
-        formatter.format_date(
-            i, format_string=DateFormat.ISO_DATE_FORMAT_RESPONSE.value
-        )
-        for i in dates
-    )
+    first = (calendar.start - origin).days
 
-    if nights not in range(1, num_days + 1):
-        nights = num_days
-        LOG.debug("Setting number of nights to {}.".format(nights))
+    # Every site's window in one matrix, so finding every site's valid starts
+    # is a single pass, whatever the calendar asks for.
+    matrix = AvailabilityMatrix.from_bitmaps(
+        park_information, first, first + calendar.num_days
+    )
+    starts_matrix = calendar.matrix_starts(matrix)
 
     available_dates_by_campsite_id = defaultdict(list)
-    for site, availabilities in park_information.items():
-        # List of dates that are in the desired range for this site.
-        desired_available = []
-
-        for date in availabilities:
-            if date not in dates:
-                continue
-            desired_available.append(date)
-
-        if not desired_available:
-            continue
-
-        appropriate_consecutive_ranges = consecutive_nights(
-            desired_available, nights
-        )
+    for site, starts in matrix.rows(starts_matrix):
+        num_available += 1
+        LOG.debug("Available site {}: {}".format(num_available, site))
 
-        if appropriate_consecutive_ranges:
-            num_available += 1
-            LOG.debug("Available site {}: {}".format(num_available, site))
-
-        for r in appropriate_consecutive_ranges:
-            start, end = r
+        for start, end in calendar.ranges(starts):
             available_dates_by_campsite_id[int(site)].append(
                 {"start": start, "end": end}
             )
@@ -152,6 +310,24 @@ def get_num_available_sites(
     return num_available, maximum, available_dates_by_campsite_id
 
 
+def _date_labels(origin, length):
+    # `date.isoformat` is the same as DateFormat.INPUT_DATE_FORMAT, but a lot
+    # quicker than strftime.
+    return [
+        (origin + timedelta(days=offset)).isoformat()
+        for offset in range(length)
+    ]
+
+
+def _ranges_from_starts(origin, starts, nights, labels=None):
+    if labels is None:
+        labels = _date_labels(origin, starts.bit_length() + nights)
+    return [
+        (labels[offset], labels[offset + nights])
+        for offset in iter_bits(starts)
+    ]
+
+
 def consecutive_nights(available, nights):
     """
     Returns a list of dates from which you can start that have
@@ -160,116 +336,284 @@ def consecutive_nights(available, nights):
     If there is one or more entries in this list, there is at least one
     date range for this site that is available.
     """
-    ordinal_dates = [
-        datetime.strptime(
-            dstr, DateFormat.ISO_DATE_FORMAT_RESPONSE.value
-        ).toordinal()
-        for dstr in available
-    ]
-    c = count()
-
-    consecutive_ranges = list(
-        list(g) for _, g in groupby(ordinal_dates, lambda x: x - next(c))
-    )
-
-    long_enough_consecutive_ranges = []
-    for r in consecutive_ranges:
-        # Skip ranges that are too short.
-        if len(r) < nights:
-            continue
-        for start_index in range(0, len(r) - nights + 1):
-            start_nice = formatter.format_date(
-                datetime.fromordinal(r[start_index]),
-                format_string=DateFormat.INPUT_DATE_FORMAT.value,
-            )
-            end_nice = formatter.format_date(
-                datetime.fromordinal(r[start_index + nights - 1] + 1),
-                format_string=DateFormat.INPUT_DATE_FORMAT.value,
-            )
-            long_enough_consecutive_ranges.append((start_nice, end_nice))
-
-    return long_enough_consecutive_ranges
+    bitmaps = SiteBitmaps.from_date_lists({"site": available})
+    starts = run_starts(bitmaps["site"], nights)
+    return _ranges_from_starts(bitmaps.origin, starts, nights)
 
 
 def check_park(
     park_id, start_date, end_date, campsite_type, campsite_ids=(), nights=None, weekends_only=False, excluded_site_ids=[],
 ):
     park_information = get_park_information(
-        park_id, start_date, end_date, campsite_type, campsite_ids, excluded_site_ids=excluded_site_ids,
+        park_id, start_date, end_date, campsite_type, campsite_ids, excluded_site_ids=excluded_site_ids, nights=nights, weekends_only=weekends_only,
     )
-    LOG.debug(
-        "Information for park {}: {}".format(
-            park_id, json.dumps(park_information, indent=2)
-        )
+    return summarize_park(
+        park_id, park_information, start_date, end_date, nights, weekends_only
     )
+
+
+def summarize_park(
+    park_id, park_information, start_date, end_date, nights=None, weekends_only=False, calendar=None,
+):
+    if LOG.isEnabledFor(logging.DEBUG):
+        LOG.debug(
+            "Information for park {}: {}".format(
+                park_id, json.dumps(park_information.to_date_lists(), indent=2)
+            )
+        )
     park_name = RecreationClient.get_park_name(park_id)
-    current, maximum, availabilities_filtered = get_num_available_sites(
-        park_information, start_date, end_date, nights=nights, weekends_only=weekends_only,
-    )
+    with RecreationClient.metrics.timer("stage", stage="evaluate"):
+        current, maximum, availabilities_filtered = get_num_available_sites(
+            park_information, start_date, end_date, nights=nights, weekends_only=weekends_only, calendar=calendar,
+        )
     return current, maximum, availabilities_filtered, park_name
 
 
+def summarize_changes(
+    park_id, park_information, snapshots, start_date, end_date, weekends_only=False, calendar=None, park_name=None,
+):
+    """
+    Like `summarize_park`, but only describes what changed since the last
+    snapshot of the park in `snapshots`: the nights that opened up and the
+    nights that were taken, as date ranges by site. Only the nights the
+    `calendar` allows count, if given. The park's name is looked up unless
+    `park_name` is given.
+    """
+    if calendar is None:
+        calendar = get_calendar(start_date, end_date, weekends_only=weekends_only)
+    origin = park_information.origin
+    window = calendar.allowed << (calendar.start - origin).days
+
+    if park_name is None:
+        park_name = RecreationClient.get_park_name(park_id)
+    with RecreationClient.metrics.timer("stage", stage="evaluate"):
+        opened, closed = snapshots.diff(park_id, park_information, window)
+        return (
+            _ranges_by_site(origin, opened),
+            _ranges_by_site(origin, closed),
+            park_name,
+        )
+
+
+def _ranges_by_site(origin, masks):
+    return {
+        int(site): date_ranges(origin, masks[site])
+        for site in sorted(masks, key=int)
+    }
+
+
+def evaluate_park(park_id, park_information, snapshots=None, park_name=None):
+    if snapshots is None:
+        return summarize_park(
+            park_id,
+            park_information,
+            args.start_date,
+            args.end_date,
+            nights=args.nights,
+            weekends_only=args.weekends_only,
+            calendar=search_calendar(args),
+        )
+    return summarize_changes(
+        park_id,
+        park_information,
+        snapshots,
+        args.start_date,
+        args.end_date,
+        weekends_only=args.weekends_only,
+        calendar=search_calendar(args),
+        park_name=park_name,
+    )
+
+
 def generate_human_output(
     info_by_park_id, start_date, end_date, gen_campsite_info=False
 ):
     out = []
     has_availabilities = False
     for park_id, info in info_by_park_id.items():
-        current, maximum, available_dates_by_site_id, park_name = info
-        if current:
-            emoji = Emoji.SUCCESS.value
-            has_availabilities = True
-        else:
-            emoji = Emoji.FAILURE.value
-
-        out.append(
-            "{emoji} {park_name} ({park_id}): {current} site(s) available out of {maximum} site(s)".format(
-                emoji=emoji,
-                park_name=park_name,
-                park_id=park_id,
-                current=current,
-                maximum=maximum,
-            )
+        park_out, park_has_availabilities = generate_park_human_output(
+            park_id, info, gen_campsite_info
         )
+        out.extend(park_out)
+        has_availabilities = has_availabilities or park_has_availabilities
+
+    out.insert(0, availability_header(has_availabilities, start_date, end_date))
+    return "\n".join(out), has_availabilities
+
 
-        # Displays campsite ID and availability dates.
-        if gen_campsite_info and available_dates_by_site_id:
-            for site_id, dates in available_dates_by_site_id.items():
+def generate_park_human_output(park_id, info, gen_campsite_info=False):
+    """
+    The lines about a single park in `generate_human_output`.
+    """
+    out = []
+    current, maximum, available_dates_by_site_id, park_name = info
+    if current:
+        emoji = Emoji.SUCCESS.value
+    else:
+        emoji = Emoji.FAILURE.value
+
+    out.append(
+        "{emoji} {park_name} ({park_id}): {current} site(s) available out of {maximum} site(s)".format(
+            emoji=emoji,
+            park_name=park_name,
+            park_id=park_id,
+            current=current,
+            maximum=maximum,
+        )
+    )
+
+    # Displays campsite ID and availability dates.
+    if gen_campsite_info and available_dates_by_site_id:
+        for site_id, dates in available_dates_by_site_id.items():
+            out.append(
+                "  * Site {site_id} is available on the following dates:".format(
+                    site_id=site_id
+                )
+            )
+            for date in dates:
                 out.append(
-                    "  * Site {site_id} is available on the following dates:".format(
-                        site_id=site_id
+                    "    * {start} -> {end}".format(
+                        start=date["start"], end=date["end"]
                     )
                 )
-                for date in dates:
-                    out.append(
-                        "    * {start} -> {end}".format(
-                            start=date["start"], end=date["end"]
-                        )
-                    )
+    return out, bool(current)
 
+
+def availability_header(has_availabilities, start_date, end_date):
     if has_availabilities:
-        out.insert(
-            0,
-            "there are campsites available from {start} to {end}!!!".format(
-                start=start_date.strftime(DateFormat.INPUT_DATE_FORMAT.value),
-                end=end_date.strftime(DateFormat.INPUT_DATE_FORMAT.value),
-            ),
+        return "there are campsites available from {start} to {end}!!!".format(
+            start=start_date.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+            end=end_date.strftime(DateFormat.INPUT_DATE_FORMAT.value),
         )
-    else:
-        out.insert(0, "There are no campsites available :(")
-    return "\n".join(out), has_availabilities
+    return "There are no campsites available :("
 
 
 def generate_json_output(info_by_park_id):
-    availabilities_by_park_id = {}
+    parks = {}
     has_availabilities = False
     for park_id, info in info_by_park_id.items():
-        current, _, available_dates_by_site_id, _ = info
-        if current:
+        park = park_json(info)
+        if park["current"]:
             has_availabilities = True
-            availabilities_by_park_id[park_id] = available_dates_by_site_id
+            parks[park_id] = park
+
+    return json.dumps(parks), has_availabilities
+
+
+def generate_park_json_output(park_id, info):
+    """
+    A single park as one line of JSON, for --stream.
+    """
+    park = park_json(info)
+    return json.dumps({"park_id": park_id, **park}), bool(park["current"])
+
+
+def park_json(info):
+    """
+    What the JSON output says about a park, with or without --stream.
+    """
+    current, maximum, available_dates_by_site_id, park_name = info
+    return {
+        "park_name": park_name,
+        "current": current,
+        "maximum": maximum,
+        "availabilities": available_dates_by_site_id,
+    }
+
+
+def generate_human_changes_output(changes_by_park_id):
+    out = []
+    has_openings = False
+    for park_id, changes in changes_by_park_id.items():
+        park_out, park_has_openings = generate_park_human_changes_output(
+            park_id, changes
+        )
+        out.extend(park_out)
+        has_openings = has_openings or park_has_openings
+
+    out.insert(0, changes_header(has_openings))
+    return "\n".join(out), has_openings
+
+
+def generate_park_human_changes_output(park_id, changes):
+    """
+    The lines about a single park in `generate_human_changes_output`, none
+    if nothing changed.
+    """
+    out = []
+    opened, closed, park_name = changes
+    if not opened and not closed:
+        return out, False
+    if opened:
+        emoji = Emoji.SUCCESS.value
+    else:
+        emoji = Emoji.FAILURE.value
+
+    out.append(
+        "{emoji} {park_name} ({park_id}): {opened} site(s) opened, {closed} site(s) closed".format(
+            emoji=emoji,
+            park_name=park_name,
+            park_id=park_id,
+            opened=len(opened),
+            closed=len(closed),
+        )
+    )
+    for sign, verb, changes in (("+", "opened", opened), ("-", "closed", closed)):
+        for site_id, dates in changes.items():
+            for date in dates:
+                out.append(
+                    "  {sign} Site {site_id} {verb}: {start} -> {end}".format(
+                        sign=sign,
+                        site_id=site_id,
+                        verb=verb,
+                        start=date["start"],
+                        end=date["end"],
+                    )
+                )
+    return out, bool(opened)
+
+
+def changes_header(has_openings):
+    if has_openings:
+        return "there are newly available campsites!!!"
+    return "There are no newly available campsites :("
 
-    return json.dumps(availabilities_by_park_id), has_availabilities
+
+def generate_json_changes_output(changes_by_park_id):
+    changes = {}
+    has_openings = False
+    for park_id, (opened, closed, park_name) in changes_by_park_id.items():
+        if opened:
+            has_openings = True
+        if opened or closed:
+            changes[park_id] = {
+                "park_name": park_name,
+                "opened": opened,
+                "closed": closed,
+            }
+
+    return json.dumps(changes), has_openings
+
+
+def generate_park_json_changes_output(park_id, changes):
+    """
+    A single park's changes as one line of JSON, for --stream. Nothing if
+    nothing changed.
+    """
+    opened, closed, park_name = changes
+    if not opened and not closed:
+        return None, False
+    return (
+        json.dumps(
+            {
+                "park_id": park_id,
+                "park_name": park_name,
+                "opened": opened,
+                "closed": closed,
+            }
+        ),
+        bool(opened),
+    )
 
 
 def remove_comments(lines: list[str]) -> list[str]:
@@ -286,39 +630,565 @@ def remove_comments(lines: list[str]) -> list[str]:
     return new_lines
 
 
+def read_exclusion_file(path):
+    with open(path, "r") as f:
+        excluded_site_ids = f.readlines()
+        excluded_site_ids = [l.strip() for l in excluded_site_ids]
+        return set(remove_comments(excluded_site_ids))
+
+
+def get_site_filter(search, excluded_site_ids=()):
+    """
+    The `SiteFilter` for a search, i.e. `args` or one of --queries, and the
+    sites in its exclusion file.
+    """
+    return SiteFilter(
+        campsite_types=[search.campsite_type] if search.campsite_type else (),
+        loops=search.loops,
+        reserve_types=search.reserve_types,
+        types_of_use=search.types_of_use,
+        capacity_ratings=search.capacity_ratings,
+        campsite_ids=search.campsite_ids,
+        excluded_site_ids=excluded_site_ids,
+        people=search.people,
+    )
+
+
+def configure_client(processes=1):
+    """
+    Sets up `RecreationClient` from the arguments. With several `processes`
+    each sets up its own client, so the rate limits are split between them.
+    The parent process doesn't send requests of its own while they run.
+    """
+    RecreationClient.BASE_URL = args.base_url.rstrip("/")
+    RecreationClient.limiter = RequestLimiter(
+        max_in_flight=args.max_concurrency, max_per_host=args.max_per_host
+    )
+    # There's never more than `max_per_host` connections in use at once, so
+    # there's no point keeping more than that open.
+    RecreationClient.configure_session(pool_maxsize=args.max_per_host)
+    rates = dict(DEFAULT_RATES)
+    rates.update(args.rate_limits)
+    RecreationClient.rate_limiter = RateLimiter(
+        {endpoint: rate / processes for endpoint, rate in rates.items()}
+    )
+    RecreationClient.max_retries = args.max_retries
+    RecreationClient.timeout = (args.connect_timeout, args.read_timeout)
+    if args.memo_ttl > 0:
+        RecreationClient.memo = Memo(args.memo_ttl, args.memo_size)
+    if args.cache_dir:
+        RecreationClient.cache = ResponseCache(
+            args.cache_dir, max_bytes=args.cache_max_bytes
+        )
+    if args.metadata_file:
+        RecreationClient.metadata = MetadataStore(args.metadata_file)
+    if args.history_db:
+        RecreationClient.history = HistoryStore(args.history_db)
+    if args.availability_index:
+        RecreationClient.availability_index = AvailabilityIndex(
+            args.availability_index
+        )
+    RecreationClient.offline = args.offline
+    if args.profile or args.metrics_file:
+        RecreationClient.metrics = Metrics()
+
+
+def save_client_state():
+    """
+    Writes out whatever the client has learnt that's kept between runs.
+    """
+    if RecreationClient.metadata is not None:
+        RecreationClient.metadata.save()
+    if RecreationClient.availability_index is not None:
+        RecreationClient.availability_index.save()
+
+
+def close_client():
+    """
+    Waits for anything still being written in the background, and saves
+    park names that were still being refreshed at the last save.
+    """
+    if RecreationClient.metadata is not None:
+        RecreationClient.metadata.wait_for_refreshes()
+        RecreationClient.metadata.save()
+    if RecreationClient.history is not None:
+        RecreationClient.history.close()
+        RecreationClient.history = None
+
+
+def write_metrics():
+    """
+    Writes everything recorded so far to --metrics-file, replacing the file
+    in one go so a scraper never sees it half written.
+    """
+    metrics = RecreationClient.metrics
+    if not args.metrics_file or not metrics.enabled:
+        return
+    if args.metrics_format == "json":
+        content = metrics.to_json()
+    else:
+        content = metrics.to_prometheus()
+    tmp_path = args.metrics_file + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, args.metrics_file)
+
+
+def report_metrics():
+    write_metrics()
+    if args.profile and RecreationClient.metrics.enabled:
+        print(RecreationClient.metrics.summary(), file=sys.stderr)
+
+
+def generate_output(info_by_park_id, json_output=False):
+    with RecreationClient.metrics.timer("stage", stage="output"):
+        return _generate_output(info_by_park_id, json_output)
+
+
+def _generate_output(info_by_park_id, json_output=False):
+    if args.incremental:
+        if json_output:
+            return generate_json_changes_output(info_by_park_id)
+        return generate_human_changes_output(info_by_park_id)
+    if json_output:
+        return generate_json_output(info_by_park_id)
+    return generate_human_output(
+        info_by_park_id,
+        args.start_date,
+        args.end_date,
+        args.show_campsite_info,
+    )
+
+
+def generate_park_output(park_id, info, json_output=False):
+    """
+    One park's part of `generate_output`, printed as soon as the park is
+    checked with --stream. The output is None if there's nothing to say.
+    """
+    with RecreationClient.metrics.timer("stage", stage="output"):
+        if args.incremental:
+            if json_output:
+                return generate_park_json_changes_output(park_id, info)
+            lines, has_openings = generate_park_human_changes_output(
+                park_id, info
+            )
+            return "\n".join(lines) or None, has_openings
+        if json_output:
+            return generate_park_json_output(park_id, info)
+        lines, has_availabilities = generate_park_human_output(
+            park_id, info, args.show_campsite_info
+        )
+        return "\n".join(lines), has_availabilities
+
+
+def generate_summary_output(has_availabilities, num_parks, json_output=False):
+    """
+    The last line printed with --stream. For JSON it's told apart from the
+    parks by having no "park_id".
+    """
+    if json_output:
+        return json.dumps(
+            {
+                "summary": {
+                    "has_availabilities": has_availabilities,
+                    "parks": num_parks,
+                }
+            }
+        )
+    if args.incremental:
+        return changes_header(has_availabilities)
+    return availability_header(
+        has_availabilities, args.start_date, args.end_date
+    )
+
+
 def main(parks, json_output=False):
     excluded_site_ids = []
-
     if args.exclusion_file:
-        with open(args.exclusion_file, "r") as f:
-            excluded_site_ids = f.readlines()
-            excluded_site_ids = [l.strip() for l in excluded_site_ids]
-            excluded_site_ids = remove_comments(excluded_site_ids)
+        excluded_site_ids = read_exclusion_file(args.exclusion_file)
+    site_filter = get_site_filter(args, excluded_site_ids)
+
+    configure_client(processes=args.processes)
+    snapshots = None
+    if args.incremental:
+        snapshots = SnapshotStore(args.snapshot_file)
+
+    # Results come in as each park is done, in no particular order.
+    if args.processes > 1:
+        results = check_parks_in_processes(parks, site_filter, snapshots)
+    else:
+
+        def check(park_id):
+            park_information = get_park_information(
+                park_id,
+                args.start_date,
+                args.end_date,
+                site_filter=site_filter,
+                calendar=search_calendar(args),
+            )
+            return evaluate_park(park_id, park_information, snapshots)
+
+        results = fetch_each(
+            check,
+            parks,
+            max_workers=args.max_concurrency,
+        )
 
     info_by_park_id = {}
-    for park_id in parks:
-        info_by_park_id[park_id] = check_park(
+    has_availabilities = False
+    num_parks = 0
+    for result in results:
+        if result.error is not None:
+            LOG.error(
+                "Something went wrong checking park {}: {}".format(
+                    result.item, result.error
+                )
+            )
+            continue
+        if args.stream:
+            # Printed straight away and not kept, so memory doesn't grow
+            # with the number of parks.
+            output, park_has_availabilities = generate_park_output(
+                result.item, result.value, json_output
+            )
+            if output is not None:
+                print(output, flush=True)
+            has_availabilities = has_availabilities or park_has_availabilities
+            num_parks += 1
+        else:
+            info_by_park_id[result.item] = result.value
+
+    save_client_state()
+    if snapshots is not None:
+        snapshots.save()
+
+    if args.stream:
+        print(generate_summary_output(has_availabilities, num_parks, json_output))
+        return has_availabilities
+
+    # Back in the order the parks were given.
+    info_by_park_id = {
+        park_id: info_by_park_id[park_id]
+        for park_id in parks
+        if park_id in info_by_park_id
+    }
+    output, has_availabilities = generate_output(info_by_park_id, json_output)
+    print(output)
+    return has_availabilities
+
+
+def check_parks_in_processes(parks, site_filter, snapshots=None):
+    """
+    Like the `fetch_each` in `main`, but spreads the parks over --processes
+    worker processes so evaluating them isn't held up by the GIL. Each
+    worker has its own client and connection pool, and checks a batch of
+    parks at a time with threads as usual.
+
+    Each batch's results are yielded as soon as it's done, and whatever
+    the workers learnt about park names, what went in their availability
+    index and their metrics is merged in here. Snapshots stay in this
+    process: with --incremental the workers send back the park information
+    and name, and it is diffed here, so the parent sends no requests.
+    """
+    # Enough batches for every worker to have one, but none bigger than the
+    # number of parks a worker checks at once.
+    batch_size = max(min(args.max_concurrency, -(-len(parks) // args.processes)), 1)
+    batches = chunks(parks, batch_size)
+    for _, (
+        results,
+        metadata_changes,
+        index_changes,
+        metrics_state,
+    ) in map_in_processes(
+        _check_batch,
+        batches,
+        args.processes,
+        initializer=_init_worker,
+        initargs=(args, site_filter),
+    ):
+        if RecreationClient.metadata is not None:
+            RecreationClient.metadata.merge(metadata_changes)
+        if RecreationClient.availability_index is not None:
+            RecreationClient.availability_index.merge(index_changes)
+        RecreationClient.metrics.merge(metrics_state)
+        if snapshots is not None:
+            results = [_diff_result(r, snapshots) for r in results]
+        yield from results
+
+
+def _diff_result(result, snapshots):
+    """
+    Turns a worker's (park information, park name) result into its changes,
+    keeping any error to that one park like `fetch_each` does.
+    """
+    if result.error is not None:
+        return result
+    park_information, park_name = result.value
+    try:
+        return result._replace(
+            value=evaluate_park(
+                result.item, park_information, snapshots, park_name=park_name
+            )
+        )
+    except Exception as e:
+        return result._replace(error=e)
+
+
+# Set in each worker process by `_init_worker`.
+_worker_site_filter = None
+
+
+def _init_worker(worker_args, site_filter):
+    global args, _worker_site_filter
+    args = worker_args
+    _worker_site_filter = site_filter
+    # Also drops any session inherited from the parent, so each worker opens
+    # its own connections.
+    configure_client(processes=args.processes)
+
+
+def _check_batch(park_ids):
+    def check(park_id):
+        park_information = get_park_information(
             park_id,
             args.start_date,
             args.end_date,
-            args.campsite_type,
-            args.campsite_ids,
-            nights=args.nights,
-            weekends_only=args.weekends_only,
-            excluded_site_ids=excluded_site_ids,
+            site_filter=_worker_site_filter,
+            calendar=search_calendar(args),
         )
+        if args.incremental:
+            # Diffed in the parent, which doesn't send requests of its own.
+            return park_information, RecreationClient.get_park_name(park_id)
+        return evaluate_park(park_id, park_information)
 
-    if json_output:
-        output, has_availabilities = generate_json_output(info_by_park_id)
-    else:
-        output, has_availabilities = generate_human_output(
-            info_by_park_id,
-            args.start_date,
-            args.end_date,
-            args.show_campsite_info,
+    # Not every exception survives pickling, so send back just the message,
+    # which is all `main` logs anyway.
+    results = [
+        r if r.error is None else r._replace(error=RuntimeError(str(r.error)))
+        for r in fetch_all(check, park_ids, max_workers=args.max_concurrency)
+    ]
+    metadata_changes = {}
+    if RecreationClient.metadata is not None:
+        RecreationClient.metadata.wait_for_refreshes()
+        metadata_changes = RecreationClient.metadata.take_changes()
+    index_changes = {}
+    if RecreationClient.availability_index is not None:
+        index_changes = RecreationClient.availability_index.take_changes()
+    # Workers exit without waiting for background threads, so don't leave
+    # anything in the queue.
+    if RecreationClient.history is not None:
+        RecreationClient.history.flush()
+    return (
+        results,
+        metadata_changes,
+        index_changes,
+        RecreationClient.metrics.drain(),
+    )
+
+
+def read_queries(path):
+    parser = CampingArgumentParser()
+    with open(path, "r") as f:
+        lines = remove_comments([l.strip() for l in f.readlines()])
+    return [parser.parse_query(line) for line in lines]
+
+
+def run_queries(queries, json_output=False):
+    """
+    Runs several searches at once. Every (park, month) any of the searches
+    needs is fetched exactly once, then each search is evaluated against the
+    shared data. Each search's output is printed in turn, preceded by the
+    search itself for human output. JSON output is one line per search.
+    """
+    configure_client()
+
+    calendars = [search_calendar(query) for query in queries]
+    months_by_query = [
+        get_planned_months(query.start_date, query.end_date, calendar=calendar)
+        for query, calendar in zip(queries, calendars)
+    ]
+    needed = {}
+    for query, months in zip(queries, months_by_query):
+        for park_id in query.parks:
+            for month_date in months:
+                needed[(park_id, month_date)] = None
+    LOG.debug(
+        "{} queries need {} park-months".format(len(queries), len(needed))
+    )
+
+    # Every park's nearest months first.
+    today = date.today()
+    month_data = {}
+    results = fetch_all(
+        lambda key: RecreationClient.get_availability(*key),
+        sorted(needed, key=lambda key: abs(months_ahead(today, key[1]))),
+        max_workers=args.max_concurrency,
+    )
+    for result in results:
+        if result.error is not None:
+            LOG.error(
+                "Something went wrong fetching park {} for {}: {}".format(
+                    result.item[0], result.item[1], result.error
+                )
+            )
+            continue
+        month_data[result.item] = result.value
+
+    exclusions = {}
+    any_availabilities = False
+    for query, calendar, months in zip(queries, calendars, months_by_query):
+        excluded_site_ids = []
+        if query.exclusion_file:
+            if query.exclusion_file not in exclusions:
+                exclusions[query.exclusion_file] = read_exclusion_file(
+                    query.exclusion_file
+                )
+            excluded_site_ids = exclusions[query.exclusion_file]
+        site_filter = get_site_filter(query, excluded_site_ids)
+
+        origin = get_months(query.start_date, query.end_date)[0]
+        info_by_park_id = {}
+        for park_id in query.parks:
+            keys = [(park_id, month_date) for month_date in months]
+            if not all(key in month_data for key in keys):
+                continue
+            with RecreationClient.metrics.timer("stage", stage="collapse"):
+                park_information = collapse_park_information(
+                    [month_data[key] for key in keys],
+                    origin=origin,
+                    site_filter=site_filter,
+                    index=RecreationClient.site_index(park_id),
+                )
+            try:
+                info_by_park_id[park_id] = summarize_park(
+                    park_id,
+                    park_information,
+                    query.start_date,
+                    query.end_date,
+                    nights=query.nights,
+                    weekends_only=query.weekends_only,
+                    calendar=calendar,
+                )
+            except Exception as e:
+                LOG.error(
+                    "Something went wrong checking park {}: {}".format(
+                        park_id, e
+                    )
+                )
+
+        with RecreationClient.metrics.timer("stage", stage="output"):
+            if json_output:
+                output, has_availabilities = generate_json_output(
+                    info_by_park_id
+                )
+            else:
+                output, has_availabilities = generate_human_output(
+                    info_by_park_id,
+                    query.start_date,
+                    query.end_date,
+                    query.show_campsite_info,
+                )
+                output = "Search: {}\n{}\n".format(query.query, output)
+        any_availabilities = any_availabilities or has_availabilities
+        print(output)
+
+    save_client_state()
+    return any_availabilities
+
+
+def watch(parks, json_output=False, cycles=None):
+    """
+    Keeps polling `parks` until interrupted (or for `cycles` rounds),
+    printing the results each time something is polled. Each (park, month)
+    is polled on its own schedule, see `PollScheduler`. The client, its
+    connections and caches are set up once and reused by every cycle.
+
+    With --incremental only the parks polled in a cycle are re-evaluated,
+    and only what changed in them is printed.
+    """
+    excluded_site_ids = []
+    if args.exclusion_file:
+        excluded_site_ids = read_exclusion_file(args.exclusion_file)
+    site_filter = get_site_filter(args, excluded_site_ids)
+
+    configure_client()
+    # The scheduler decides when each month is fetched again.
+    RecreationClient.memo = None
+    snapshots = None
+    if args.incremental:
+        snapshots = SnapshotStore(args.snapshot_file)
+
+    scheduler = PollScheduler(
+        poll_interval=args.poll_interval,
+        park_intervals=dict(args.park_intervals),
+        month_intervals=args.month_intervals,
+        jitter=args.jitter,
+    )
+    # Planned once, so months that pass while watching are still polled.
+    months = get_planned_months(
+        args.start_date, args.end_date, calendar=search_calendar(args)
+    )
+    if not months:
+        LOG.warning("No stay in the given dates can still be booked")
+        return
+    origin = get_months(args.start_date, args.end_date)[0]
+    for park_id in parks:
+        for month_date in months:
+            scheduler.add(park_id, month_date)
+
+    month_data = {}
+    cycle = 0
+    while cycles is None or cycle < cycles:
+        cycle += 1
+        due = scheduler.wait()
+        results = fetch_all(
+            lambda key: RecreationClient.get_availability(*key),
+            due,
+            max_workers=args.max_concurrency,
         )
-    print(output)
-    return has_availabilities
+        for result in results:
+            if result.error is not None:
+                LOG.error(
+                    "Something went wrong polling park {} for {}: {}".format(
+                        result.item[0], result.item[1], result.error
+                    )
+                )
+                continue
+            month_data[result.item] = result.value
+
+        polled = set(park_id for park_id, _ in due)
+        info_by_park_id = {}
+        for park_id in parks:
+            if snapshots is not None and park_id not in polled:
+                continue
+            keys = [(park_id, month_date) for month_date in months]
+            if not all(key in month_data for key in keys):
+                continue
+            with RecreationClient.metrics.timer("stage", stage="collapse"):
+                park_information = collapse_park_information(
+                    [month_data[key] for key in keys],
+                    origin=origin,
+                    site_filter=site_filter,
+                    index=RecreationClient.site_index(park_id),
+                )
+            try:
+                info_by_park_id[park_id] = evaluate_park(
+                    park_id, park_information, snapshots
+                )
+            except Exception as e:
+                LOG.error(
+                    "Something went wrong checking park {}: {}".format(
+                        park_id, e
+                    )
+                )
+
+        save_client_state()
+        if snapshots is not None:
+            snapshots.save()
+
+        output, _ = generate_output(info_by_park_id, json_output)
+        print(output, flush=True)
+        write_metrics()
 
 
 if __name__ == "__main__":
@@ -328,4 +1198,16 @@ if __name__ == "__main__":
     if args.debug:
         LOG.setLevel(logging.DEBUG)
 
-    main(args.parks, json_output=args.json_output)
+    try:
+        if args.queries:
+            run_queries(read_queries(args.queries), json_output=args.json_output)
+        elif args.watch:
+            try:
+                watch(args.parks, json_output=args.json_output)
+            except KeyboardInterrupt:
+                pass
+        else:
+            main(args.parks, json_output=args.json_output)
+    finally:
+        close_client()
+        report_metrics()
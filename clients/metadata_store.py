@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+# Facility names and site lists almost never change.
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+# How long `wait_for_refreshes` waits for refreshes still in flight.
+DEFAULT_REFRESH_WAIT = 5
+
+
+class MetadataStore:
+    """
+    A local JSON file of campground metadata, i.e. the facility name of each
+    park.
+
+    The file is read once when the store is created and written back with
+    `save`. Lookups are served from memory. Entries older than `ttl` are
+    still served, but trigger a refresh on a background thread so nothing
+    ever waits on it. If the refresh fails (e.g. we are offline) the cached
+    value simply stays in use. Call `wait_for_refreshes` before the last
+    `save` so refreshes that finish near the end aren't lost.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, now=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.now = now
+        self._lock = threading.Lock()
+        # {<park_id>: <thread>}, for the refreshes in flight.
+        self._refreshing = {}
+        # Parks changed since the last `take_changes`, and since the last
+        # `save`.
+        self._changed = set()
+        self._unsaved = False
+        self._parks = {}
+        try:
+            with open(path) as f:
+                self._parks = json.load(f)
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            LOG.warning("Ignoring unreadable metadata file {}: {}".format(path, e))
+
+    def get(self, park_id):
+        with self._lock:
+            return self._parks.get(str(park_id))
+
+    def park_name(self, park_id, fetch):
+        """
+        Returns the facility name of `park_id`, only calling `fetch(park_id)`
+        synchronously if we have never seen the park before.
+        """
+        entry = self.get(park_id) or {}
+        name = entry.get("facility_name")
+        if name is None:
+            name = fetch(park_id)
+            self._set_name(park_id, name)
+        elif self.now() - entry.get("refreshed_at", 0) > self.ttl:
+            self._refresh_in_background(park_id, fetch)
+        return name
+
+    def _set_name(self, park_id, name):
+        with self._lock:
+            entry = self._parks.setdefault(str(park_id), {})
+            entry["facility_name"] = name
+            entry["refreshed_at"] = self.now()
+            self._mark_changed(park_id)
+
+    def _mark_changed(self, park_id):
+        # Called with the lock held.
+        self._changed.add(str(park_id))
+        self._unsaved = True
+
+    def take_changes(self):
+        """
+        Returns {<park_id>: <entry>} for every park changed since the last
+        call, e.g. so a worker process can hand what it learnt to the parent
+        to `merge` and save, rather than every process writing the file.
+        """
+        with self._lock:
+            changes = {
+                park_id: json.loads(json.dumps(self._parks[park_id]))
+                for park_id in self._changed
+            }
+            self._changed = set()
+        return changes
+
+    def merge(self, changes):
+        with self._lock:
+            for park_id, entry in changes.items():
+                self._parks[park_id] = entry
+                self._mark_changed(park_id)
+
+    def _refresh_in_background(self, park_id, fetch):
+        def refresh():
+            try:
+                self._set_name(park_id, fetch(park_id))
+            except Exception as e:
+                LOG.debug(
+                    "Couldn't refresh metadata for {}, keeping the cached "
+                    "copy: {}".format(park_id, e)
+                )
+            finally:
+                with self._lock:
+                    self._refreshing.pop(park_id, None)
+
+        with self._lock:
+            if park_id in self._refreshing:
+                return
+            thread = self._refreshing[park_id] = threading.Thread(
+                target=refresh, daemon=True
+            )
+        thread.start()
+
+    def wait_for_refreshes(self, timeout=DEFAULT_REFRESH_WAIT):
+        """
+        Waits up to `timeout` seconds in all for the background refreshes
+        in flight to finish.
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+
+    def save(self):
+        with self._lock:
+            if not self._unsaved:
+                return
+            data = json.dumps(self._parks, indent=2, sort_keys=True)
+            self._unsaved = False
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,71 @@
+import json
+
+from utils.site_index import SiteFilter
+
+AVAILABLE = "Available"
+
+
+def parse_month(body):
+    """
+    Parses an availability month payload straight from the response bytes,
+    cutting it down while the JSON is being decoded rather than afterwards.
+
+    `json` builds each object bottom up and hands it to `object_pairs_hook`
+    before building its parent, so each availabilities object is cut down
+    to its "Available" dates as soon as it is parsed. The other dates are
+    never put in a dict.
+
+    Every site is kept: the month is shared by every search that needs it
+    (see `RecreationClient.get_availability`), which each apply their own
+    filters with `filter_month`.
+
+    Decoding the bytes directly also saves making a str copy of the whole
+    body first, like `requests.Response.json` does.
+    """
+
+    def hook(pairs):
+        if not pairs:
+            return {}
+        first_key, first_value = pairs[0]
+        # {"2020-07-03T00:00:00Z": "Available", ...}
+        if isinstance(first_value, str) and first_key.endswith("Z"):
+            return {date: value for date, value in pairs if value == AVAILABLE}
+        return dict(pairs)
+
+    return json.loads(body, object_pairs_hook=hook)
+
+
+def filter_month(
+    month, campsite_type=None, campsite_ids=(), excluded_site_ids=(), site_filter=None, index=None,
+):
+    """
+    Filters a month from `parse_month`: sites in `excluded_site_ids` are
+    dropped, and sites not matching `campsite_type` / `campsite_ids` /
+    `site_filter` keep their details but lose their dates. They still count
+    towards the number of sites in the park, like in
+    `collapse_park_information`.
+
+    Given the park's `SiteIndex`, the filter is resolved into a set of sites
+    once, and only sites the index hasn't seen are checked one by one. The
+    month passed in is left as it is, so it can be shared.
+    """
+    site_filter = SiteFilter.build(
+        campsite_type, campsite_ids, excluded_site_ids, site_filter
+    )
+    if not site_filter:
+        return month
+    resolved = {}
+    if index is not None:
+        resolved = index.resolve(site_filter)
+
+    campsites = {}
+    for campsite_id, campsite_data in month["campsites"].items():
+        if site_filter.excludes(campsite_id):
+            continue
+        wanted = resolved.get(campsite_id)
+        if wanted is None:
+            wanted = site_filter.wants(campsite_data)
+        if not wanted:
+            campsite_data = dict(campsite_data, availabilities={})
+        campsites[campsite_id] = campsite_data
+    return dict(month, campsites=campsites)
@@ -0,0 +1,105 @@
+import logging
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+AVAILABILITY_ENDPOINT = "availability"
+CAMPGROUND_ENDPOINT = "campground"
+
+# Requests per second for each endpoint.
+DEFAULT_RATES = {AVAILABILITY_ENDPOINT: 5.0, CAMPGROUND_ENDPOINT: 5.0}
+
+# When the server pushes back the rate is halved, down to this fraction of
+# the configured rate. Every successful request then wins back a little.
+MIN_RATE_FRACTION = 0.05
+RECOVERY_FRACTION = 0.05
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts of up to
+    `burst` requests.
+
+    The rate adapts to the server: `penalize` halves it (and can pause the
+    bucket entirely, e.g. for a Retry-After), and `reward` grows it back
+    towards the configured rate a little at a time.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.max_rate = rate
+        self.min_rate = rate * MIN_RATE_FRACTION
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self._updated:
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+
+    def acquire(self):
+        """
+        Takes a token, sleeping until one is available. Tokens are handed out
+        in order, so a thread that has to wait doesn't hold up the lock.
+        """
+        with self._lock:
+            now = self.clock()
+            if now < self._paused_until:
+                # Nothing accrues while paused.
+                self._updated = self._paused_until
+            self._refill(now)
+            self._tokens -= 1
+            wait = max(self._paused_until - now, 0)
+            if self._tokens < 0:
+                wait = max(wait, self._updated - now - self._tokens / self.rate)
+        if wait > 0:
+            self.sleep(wait)
+
+    def penalize(self, pause=None):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            if pause:
+                self._paused_until = max(
+                    self._paused_until, self.clock() + pause
+                )
+            LOG.debug("Backing off to {:.2f} requests/s".format(self.rate))
+
+    def reward(self):
+        with self._lock:
+            self.rate = min(
+                self.max_rate, self.rate + self.max_rate * RECOVERY_FRACTION
+            )
+
+
+class RateLimiter:
+    """
+    A `TokenBucket` per endpoint, shared by every request the client makes.
+    """
+
+    def __init__(self, rates=None, clock=time.monotonic, sleep=time.sleep):
+        self.rates = dict(DEFAULT_RATES)
+        self.rates.update(rates or {})
+        self._buckets = {
+            endpoint: TokenBucket(rate, clock=clock, sleep=sleep)
+            for endpoint, rate in self.rates.items()
+        }
+
+    def bucket(self, endpoint):
+        return self._buckets[endpoint]
+
+    def acquire(self, endpoint):
+        self._buckets[endpoint].acquire()
+
+    def penalize(self, endpoint, pause=None):
+        self._buckets[endpoint].penalize(pause)
+
+    def reward(self, endpoint):
+        self._buckets[endpoint].reward()
@@ -1,43 +1,486 @@
 import logging
+import random
+import threading
+import time
 
-import requests
-import user_agent 
-
+from clients.payload_parser import filter_month, parse_month
+from clients.rate_limiter import (
+    AVAILABILITY_ENDPOINT,
+    CAMPGROUND_ENDPOINT,
+    RateLimiter,
+)
 from utils import formatter
+from utils.fetcher import RequestLimiter
+from utils.metrics import Metrics
+from utils.singleflight import SingleFlight
+from utils.site_index import SiteIndex
 
 LOG = logging.getLogger(__name__)
 
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 4
+
+DEFAULT_MAX_RETRIES = 3
+# Seconds to wait for a connection, and then for each read from it, before
+# the request counts as failed and is retried.
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 30
+# Statuses worth retrying. 429 and 503 also mean we should slow down.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+BACKOFF_STATUSES = (429, 503)
+# Never wait longer than this for a single retry, whatever the server asks.
+MAX_RETRY_DELAY = 120
+
+# How long months are kept in memory for, and how many of them.
+DEFAULT_MEMO_TTL = 60
+DEFAULT_MEMO_SIZE = 256
+
+# With `offline`, answering from a month fetched longer ago than this is
+# warned about. It's as long as the response cache keeps any month.
+OFFLINE_STALE_AFTER = 6 * 60 * 60
+
 
 class RecreationClient:
 
+    # Can be pointed somewhere else, e.g. `benchmarks.fake_server`. The
+    # endpoints are relative to it.
     BASE_URL = "https://www.recreation.gov"
-    AVAILABILITY_ENDPOINT = (
-        BASE_URL + "/api/camps/availability/campground/{park_id}/month"
-    )
-    MAIN_PAGE_ENDPOINT = BASE_URL + "/api/camps/campgrounds/{park_id}"
+    AVAILABILITY_ENDPOINT = "/api/camps/availability/campground/{park_id}/month"
+    MAIN_PAGE_ENDPOINT = "/api/camps/campgrounds/{park_id}"
+
+    # Generated on first use, see `get_headers`.
+    headers = None
+
+    # Shared by every thread, see `RequestLimiter`.
+    limiter = RequestLimiter()
+
+    # One keep-alive session for the whole process, created on first use.
+    # `pool_connections` is the number of hosts to keep pools for and
+    # `pool_maxsize` the number of connections kept open to each host.
+    pool_connections = DEFAULT_POOL_CONNECTIONS
+    pool_maxsize = DEFAULT_POOL_MAXSIZE
+    _session = None
+    _session_lock = threading.Lock()
+
+    # Shared by every thread, see `RateLimiter`.
+    rate_limiter = RateLimiter()
+
+    # Retries use exponential backoff with full jitter: the nth retry waits a
+    # random time of up to `backoff_base * 2 ** n` seconds, capped at
+    # `backoff_cap`, or longer if the server sent a Retry-After.
+    max_retries = DEFAULT_MAX_RETRIES
+    # (connect, read) timeouts, as `requests` takes them.
+    timeout = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)
+    backoff_base = 1.0
+    backoff_cap = 30.0
+
+    # Optional `ResponseCache` for availability months.
+    cache = None
+
+    # Optional `MetadataStore` for park names.
+    metadata = None
+
+    # Optional `HistoryStore` every month fetched is recorded in.
+    history = None
+
+    # Callers asking for the same month at once share one fetch, and the
+    # optional `Memo` keeps months for the next callers, see
+    # `get_availability`.
+    flight = SingleFlight()
+    memo = None
+
+    # Optional `AvailabilityIndex` every month fetched is recorded in. With
+    # `offline` set, months and park names come from it instead, and no
+    # requests are sent.
+    availability_index = None
+    offline = False
+
+    # A `SiteIndex` of the sites seen at each park, so filters are resolved
+    # once per park rather than checked for every site of every month.
+    site_indexes = {}
+    _site_indexes_lock = threading.Lock()
+
+    # Request and stage timings, see `Metrics`. Disabled unless asked for.
+    metrics = Metrics(enabled=False)
+
+    @classmethod
+    def get_availability(
+        cls, park_id, month_date, campsite_type=None, campsite_ids=(), excluded_site_ids=(), site_filter=None,
+    ):
+        """
+        Returns the availability payload for the month, with only the
+        "Available" dates of each site, filtered like `filter_month`.
+
+        Callers asking for a month that's already being fetched share that
+        fetch, and with a `memo` a month is only fetched again once it has
+        expired from it, whatever each caller is filtering on.
+        """
+        key = (str(park_id), month_date)
+        month = cls._memoized_month(key)
+        if month is None:
+            month = cls.flight.do(key, cls._load_month, park_id, month_date)
+        return cls._filter_month(
+            park_id, month, campsite_type, campsite_ids, excluded_site_ids, site_filter
+        )
+
+    @classmethod
+    async def get_availability_async(
+        cls, park_id, month_date, campsite_type=None, campsite_ids=(), excluded_site_ids=(), site_filter=None,
+    ):
+        """
+        `get_availability` for asyncio code. Fetches happen in the event
+        loop's default executor and are shared with other coroutines, and
+        with threads calling `get_availability`, see `SingleFlight.do_async`.
+        """
+        key = (str(park_id), month_date)
+        month = cls._memoized_month(key)
+        if month is None:
+            month = await cls.flight.do_async(
+                key, cls._load_month, park_id, month_date
+            )
+        return cls._filter_month(
+            park_id, month, campsite_type, campsite_ids, excluded_site_ids, site_filter
+        )
+
+    @classmethod
+    def _memoized_month(cls, key):
+        if cls.memo is None:
+            return None
+        month = cls.memo.get(key)
+        cls.metrics.count(
+            "memo_lookups", result="miss" if month is None else "hit"
+        )
+        return month
+
+    @classmethod
+    def _load_month(cls, park_id, month_date):
+        """
+        Fetches and parses a month without any filters, for everyone waiting
+        on it. Everything that keeps months (the history, the availability
+        index, the park's `SiteIndex` and the memo) gets it here, once per
+        fetch.
+        """
+        if cls.offline:
+            month = cls.availability_index.month(park_id, month_date)
+            if month is None:
+                raise LookupError(
+                    "{:%Y-%m} of park {} isn't in the availability index".format(
+                        month_date, park_id
+                    )
+                )
+            cls._warn_if_stale(park_id, month_date)
+        else:
+            with cls.metrics.timer("stage", stage="fetch"):
+                body = cls._fetch_availability(park_id, month_date)
+            with cls.metrics.timer("stage", stage="parse"):
+                month = parse_month(body)
+            if cls.history is not None:
+                cls.history.record_month(park_id, month_date, month["campsites"])
+            if cls.availability_index is not None:
+                cls.availability_index.record_month(
+                    park_id, month_date, month["campsites"]
+                )
+        cls.site_index(park_id).update(month["campsites"])
+        if cls.memo is not None:
+            cls.memo.put((str(park_id), month_date), month)
+        return month
+
+    @classmethod
+    def _warn_if_stale(cls, park_id, month_date):
+        index = cls.availability_index
+        fetched_at = index.fetched_at(park_id, month_date)
+        if fetched_at is None:
+            return
+        age = index.now() - fetched_at
+        if age > OFFLINE_STALE_AFTER:
+            LOG.warning(
+                "{:%Y-%m} of park {} was fetched {:.1f} hours ago".format(
+                    month_date, park_id, age / 3600
+                )
+            )
+
+    @classmethod
+    def _filter_month(
+        cls, park_id, month, campsite_type=None, campsite_ids=(), excluded_site_ids=(), site_filter=None,
+    ):
+        with cls.metrics.timer("stage", stage="filter"):
+            return filter_month(
+                month,
+                campsite_type,
+                campsite_ids,
+                excluded_site_ids,
+                site_filter,
+                cls.site_index(park_id),
+            )
+
+    @classmethod
+    def site_index(cls, park_id):
+        with cls._site_indexes_lock:
+            index = cls.site_indexes.get(str(park_id))
+            if index is None:
+                index = cls.site_indexes[str(park_id)] = SiteIndex()
+            return index
 
-    headers = {"User-Agent": user_agent.generate_user_agent() }
-    
     @classmethod
-    def get_availability(cls, park_id, month_date):
+    def _fetch_availability(cls, park_id, month_date):
+        """
+        Returns the raw body of the availability response for the month,
+        from the cache if we can.
+        """
         params = {"start_date": formatter.format_date(month_date)}
         LOG.debug(
             "Querying for {} with these params: {}".format(park_id, params)
         )
-        url = cls.AVAILABILITY_ENDPOINT.format(park_id=park_id)
-        resp = cls._send_request(url, params)
-        return resp
+        url = cls.BASE_URL + cls.AVAILABILITY_ENDPOINT.format(park_id=park_id)
+        if cls.cache is None:
+            resp = cls._get(url, params, AVAILABILITY_ENDPOINT)
+            cls._check_response(resp, url)
+            return resp.content
+
+        entry = cls.cache.get(park_id, month_date)
+        if entry is not None and entry.is_fresh(cls.cache.now()):
+            LOG.debug("Cache hit for {} {}".format(park_id, params))
+            cls.metrics.count("cache_lookups", result="hit")
+            return entry.body
+
+        import requests
+
+        headers = entry.conditional_headers() if entry is not None else {}
+        try:
+            resp = cls._get(url, params, AVAILABILITY_ENDPOINT, headers)
+        except requests.RequestException as e:
+            if entry is None:
+                raise
+            cls.metrics.count("cache_lookups", result="stale")
+            # Offline, a stale answer is better than no answer.
+            LOG.warning(
+                "Using stale cached data for {} {}: {}".format(
+                    park_id, params, e
+                )
+            )
+            return entry.body
+        if resp.status_code == 304 and entry is not None:
+            LOG.debug("Cache revalidated for {} {}".format(park_id, params))
+            cls.metrics.count("cache_lookups", result="revalidated")
+            cls.cache.refresh(park_id, month_date, entry)
+            return entry.body
+
+        cls.metrics.count("cache_lookups", result="miss")
+        cls._check_response(resp, url)
+        cls.cache.put(
+            park_id,
+            month_date,
+            resp.content,
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+        )
+        return resp.content
 
     @classmethod
     def get_park_name(cls, park_id):
+        if cls.offline:
+            return cls._get_indexed_park_name(park_id)
+        if cls.metadata is not None:
+            return cls.metadata.park_name(park_id, cls._fetch_park_name)
+        return cls._fetch_park_name(park_id)
+
+    @classmethod
+    def _get_indexed_park_name(cls, park_id):
+        """
+        `get_park_name` without sending a request, for `offline`.
+        """
+        name = cls.availability_index.park_name(park_id)
+        if name is None and cls.metadata is not None:
+            name = (cls.metadata.get(park_id) or {}).get("facility_name")
+        if name is None:
+            name = "park {}".format(park_id)
+        return name
+
+    @classmethod
+    def _fetch_park_name(cls, park_id):
+        name = cls._request_park_name(park_id)
+        if cls.availability_index is not None:
+            cls.availability_index.record_park_name(park_id, name)
+        return name
+
+    @classmethod
+    def _request_park_name(cls, park_id):
         resp = cls._send_request(
-            cls.MAIN_PAGE_ENDPOINT.format(park_id=park_id), {}
+            cls.BASE_URL + cls.MAIN_PAGE_ENDPOINT.format(park_id=park_id),
+            {},
+            CAMPGROUND_ENDPOINT,
         )
         return resp["campground"]["facility_name"]
 
     @classmethod
-    def _send_request(cls, url, params):
-        resp = requests.get(url, params=params, headers=cls.headers)
+    def get_headers(cls):
+        """
+        The headers every request is sent with. Generating a User-Agent
+        means importing `user_agent`, so it's put off until the first
+        request and then kept for the rest of the process.
+        """
+        if cls.headers is None:
+            import user_agent
+
+            cls.headers = {"User-Agent": user_agent.generate_user_agent()}
+        return cls.headers
+
+    @classmethod
+    def configure_session(
+        cls,
+        pool_connections=DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=DEFAULT_POOL_MAXSIZE,
+    ):
+        """
+        Sets the connection pool sizes, dropping any existing session so the
+        next request opens a new one with the new sizes.
+        """
+        with cls._session_lock:
+            cls.pool_connections = pool_connections
+            cls.pool_maxsize = pool_maxsize
+            if cls._session is not None:
+                cls._session.close()
+                cls._session = None
+
+    @classmethod
+    def _get_session(cls):
+        with cls._session_lock:
+            if cls._session is None:
+                # requests takes longer to import than the rest of the script
+                # put together, so it's only imported once we need it.
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=cls.pool_connections,
+                    pool_maxsize=cls.pool_maxsize,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(cls.get_headers())
+                session.headers["Accept-Encoding"] = "gzip, deflate"
+                cls._session = session
+            return cls._session
+
+    @classmethod
+    def _send_request(cls, url, params, endpoint):
+        resp = cls._get(url, params, endpoint)
+        cls._check_response(resp, url)
+        return resp.json()
+
+    @classmethod
+    def _get(cls, url, params, endpoint, headers=None):
+        """
+        Sends a GET, retrying connection errors and `RETRY_STATUSES`. If we
+        run out of retries the last response (or error) is returned (or
+        raised) as is.
+        """
+        import requests
+
+        session = cls._get_session()
+        metrics = cls.metrics
+        for attempt in range(cls.max_retries + 1):
+            with metrics.timer("rate_limit_wait", endpoint=endpoint):
+                cls.rate_limiter.acquire(endpoint)
+            try:
+                with cls.limiter.acquire(url):
+                    with metrics.timer("http_request", endpoint=endpoint):
+                        resp = session.get(
+                            url, params=params, headers=headers, timeout=cls.timeout
+                        )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.count(
+                    "http_errors", endpoint=endpoint, error=type(e).__name__
+                )
+                if attempt == cls.max_retries:
+                    raise
+                reason = repr(e)
+                delay = cls._backoff(attempt)
+            else:
+                cls._record_response(endpoint, resp)
+                if resp.status_code not in RETRY_STATUSES:
+                    cls.rate_limiter.reward(endpoint)
+                    return resp
+                retry_after = cls._retry_after(resp)
+                if resp.status_code in BACKOFF_STATUSES:
+                    cls.rate_limiter.penalize(endpoint, retry_after)
+                if attempt == cls.max_retries:
+                    return resp
+                reason = "{} code".format(resp.status_code)
+                delay = max(retry_after or 0, cls._backoff(attempt))
+            metrics.count("http_retries", endpoint=endpoint)
+            LOG.warning(
+                "Retrying {} in {:.1f}s after {} (attempt {} of {})".format(
+                    url, delay, reason, attempt + 1, cls.max_retries
+                )
+            )
+            time.sleep(delay)
+
+    @classmethod
+    def _record_response(cls, endpoint, resp):
+        """
+        `elapsed` runs until the headers are parsed, so it's the server's
+        latency plus connecting (DNS, TCP and TLS) if no pooled connection
+        was free. The rest of `http_request` is reading the body.
+        """
+        metrics = cls.metrics
+        if not metrics.enabled:
+            return
+        metrics.count("http_responses", endpoint=endpoint, status=resp.status_code)
+        metrics.count(
+            "http_response_bytes", cls._bytes_received(resp), endpoint=endpoint
+        )
+        metrics.observe(
+            "http_time_to_headers", resp.elapsed.total_seconds(), endpoint=endpoint
+        )
+
+    @staticmethod
+    def _bytes_received(resp):
+        """
+        The size of the body as it came over the wire, i.e. still gzipped
+        if it was. urllib3 counts what it read, and Content-Length says the
+        same if it's there. `resp.content` is only the fallback, as it's
+        after decompression.
+        """
+        raw_tell = getattr(resp.raw, "tell", None)
+        if raw_tell is not None:
+            try:
+                return raw_tell()
+            except (OSError, ValueError):
+                pass
+        length = resp.headers.get("Content-Length", "")
+        if length.isdigit():
+            return int(length)
+        return len(resp.content)
+
+    @classmethod
+    def _backoff(cls, attempt):
+        return random.uniform(
+            0, min(cls.backoff_cap, cls.backoff_base * 2 ** attempt)
+        )
+
+    @staticmethod
+    def _retry_after(resp):
+        """
+        Reads Retry-After, which is either a number of seconds or a date.
+        """
+        value = resp.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            from email.utils import parsedate_to_datetime
+
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(max(seconds, 0), MAX_RETRY_DELAY)
+
+    @staticmethod
+    def _check_response(resp, url):
         if resp.status_code != 200:
             raise RuntimeError(
                 "failedRequest",
@@ -45,4 +488,3 @@ class RecreationClient:
                     status_code=resp.status_code, url=url, resp_text=resp.text
                 ),
             )
-        return resp.json()
@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+# How long (in seconds) an entry stays fresh, indexed by how many months ahead
+# of today the month is. Months further out than this use the last value.
+# Near months are where cancellations show up, so we check them more often.
+DEFAULT_TTLS = (5 * 60, 15 * 60, 60 * 60, 6 * 60 * 60)
+
+BODY_SUFFIX = ".json"
+META_SUFFIX = ".meta"
+
+
+class CacheEntry:
+    def __init__(self, body, stored_at, ttl, etag=None, last_modified=None):
+        self.body = body
+        self.stored_at = stored_at
+        self.ttl = ttl
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def is_fresh(self, now):
+        return now < self.stored_at + self.ttl
+
+    def conditional_headers(self):
+        """
+        Headers that let the server answer 304 Not Modified instead of
+        sending the whole month again.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    An on-disk cache of availability month payloads, keyed by park and month.
+
+    Each entry is two files in `directory`: the raw response body, and a small
+    JSON file with when it was stored, how long it is fresh for and the
+    validators (ETag / Last-Modified) the server sent with it. Reading an
+    entry bumps the body's mtime, and once the bodies add up to more than
+    `max_bytes` the least recently used ones are deleted.
+    """
+
+    def __init__(
+        self, directory, max_bytes=DEFAULT_MAX_BYTES, ttls=DEFAULT_TTLS, now=time.time
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.now = now
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, park_id, month_date, suffix):
+        name = "{}-{:04d}-{:02d}{}".format(
+            park_id, month_date.year, month_date.month, suffix
+        )
+        return os.path.join(self.directory, name)
+
+    def ttl_for(self, month_date):
+        today = date.fromtimestamp(self.now())
+        months_ahead = (month_date.year - today.year) * 12 + (
+            month_date.month - today.month
+        )
+        index = min(max(months_ahead, 0), len(self.ttls) - 1)
+        return self.ttls[index]
+
+    def get(self, park_id, month_date):
+        body_path = self._path(park_id, month_date, BODY_SUFFIX)
+        try:
+            with open(self._path(park_id, month_date, META_SUFFIX)) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+            # Mark as recently used for eviction. If another process evicted
+            # the entry in the meantime it's a miss.
+            os.utime(body_path)
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(
+            body,
+            meta["stored_at"],
+            meta["ttl"],
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+        )
+
+    def put(self, park_id, month_date, body, etag=None, last_modified=None):
+        body_path = self._path(park_id, month_date, BODY_SUFFIX)
+        meta = {
+            "stored_at": self.now(),
+            "ttl": self.ttl_for(month_date),
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+        with self._lock:
+            total = self._current_total_bytes()
+            try:
+                total -= os.path.getsize(body_path)
+            except OSError:
+                pass
+            self._write(body_path, body)
+            self._write(
+                self._path(park_id, month_date, META_SUFFIX),
+                json.dumps(meta).encode("utf-8"),
+            )
+            self._total_bytes = total + len(body)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def refresh(self, park_id, month_date, entry):
+        """
+        Restarts the TTL of an entry the server told us hasn't changed.
+        """
+        self.put(
+            park_id,
+            month_date,
+            entry.body,
+            etag=entry.etag,
+            last_modified=entry.last_modified,
+        )
+
+    @staticmethod
+    def _write(path, data):
+        # Write then rename so a concurrent reader never sees half a file.
+        tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _bodies(self):
+        return [
+            e
+            for e in os.scandir(self.directory)
+            if e.is_file() and e.name.endswith(BODY_SUFFIX)
+        ]
+
+    def _current_total_bytes(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(e.stat().st_size for e in self._bodies())
+        return self._total_bytes
+
+    def _evict(self):
+        bodies = sorted(self._bodies(), key=lambda e: e.stat().st_mtime)
+        for body in bodies:
+            if self._total_bytes <= self.max_bytes:
+                break
+            LOG.debug("Evicting {} from the cache".format(body.name))
+            self._total_bytes -= body.stat().st_size
+            meta_path = body.path[: -len(BODY_SUFFIX)] + META_SUFFIX
+            for path in (body.path, meta_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Answers questions about the availability history recorded by
+`camping.py --history-db`, e.g.:
+
+    python history.py --history-db history.sqlite openings --park 232448
+    python history.py --history-db history.sqlite changes --park 232448 --site 123
+    python history.py --history-db history.sqlite compact --older-than-days 30
+"""
+import argparse
+import sys
+import time
+
+from utils.camping_argparser import CampingArgumentParser
+from utils.history import HistoryStore
+
+SECONDS_PER_DAY = 24 * 60 * 60
+TypeConverter = CampingArgumentParser.TypeConverter
+
+
+def openings(store, args):
+    by_site = store.openings_by_site(args.park, args.start_date, args.end_date)
+    if not by_site:
+        print("No openings recorded for park {}".format(args.park))
+        return
+    print("Nights that opened up, by site:")
+    for site_id, count in by_site.items():
+        print("  {}: {}".format(site_id, count))
+    print("Nights that opened up, by hour of the day:")
+    for hour, count in store.openings_by_hour(
+        args.park, args.start_date, args.end_date
+    ).items():
+        print("  {:02d}:00: {}".format(hour, count))
+
+
+def changes(store, args):
+    for site_id, date, seen_at, available in store.changes(
+        args.park, args.site, args.start_date, args.end_date
+    ):
+        print(
+            "{} site {} {} {}".format(
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(seen_at)),
+                site_id,
+                date,
+                "opened" if available else "taken",
+            )
+        )
+
+
+def compact(store, args):
+    store.compact(time.time() - args.older_than_days * SECONDS_PER_DAY)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--history-db", required=True)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, fn in (("openings", openings), ("changes", changes)):
+        subparser = subparsers.add_parser(name)
+        subparser.set_defaults(fn=fn)
+        subparser.add_argument("--park", type=int, required=True)
+        subparser.add_argument("--start-date", type=TypeConverter.date)
+        subparser.add_argument(
+            "--end-date",
+            type=TypeConverter.date,
+            help="Only nights before this date",
+        )
+        if name == "changes":
+            subparser.add_argument("--site", type=int)
+
+    subparser = subparsers.add_parser("compact")
+    subparser.set_defaults(fn=compact)
+    subparser.add_argument(
+        "--older-than-days",
+        type=float,
+        default=30,
+        help="Drop polls and superseded snapshots older than this, keeping every change",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    store = HistoryStore(args.history_db)
+    try:
+        args.fn(store, args)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,87 +1,347 @@
 # -*- coding: utf-8 -*-
+"""
+Sends a notification when `camping.py` finds campsites, e.g.:
+
+    python camping.py --json-output ... | python notifier.py @banool1
+
+Reads the JSON results of `camping.py` (including --stream's one park per
+line, and --incremental's openings) from stdin. Each site and date range
+is only notified once per recipient until it expires from --state-file,
+and everything new goes out in one message per recipient. With camping.py's
+errors piped in too (2>&1), parks it couldn't check are reported as well.
+"""
+import argparse
 import json
+import logging
+import os
 import random
 import sys
 import time
-from hashlib import md5
-from os import isatty
-
-import twitter
+from collections import OrderedDict, namedtuple
 
 from enums.emoji import Emoji
+from utils.fetcher import fetch_all
+
+LOG = logging.getLogger(__name__)
 
 MAX_TWEET_LENGTH = 279
-DELAY_FILE_TEMPLATE = "next_{}.txt"
-DELAY_TIME = 1800
 CREDENTIALS_FILE = "twitter_credentials.json"
+DEFAULT_STATE_FILE = "notifier_state.json"
+DEFAULT_EXPIRY = 1800
+BROKEN_KEY = "broken"
+BROKEN_MESSAGE = "I'm broken! Please help :'("
+# How camping.py's log lines about parks it couldn't check start.
+ERROR_MARKER = "Something went wrong"
+# Date ranges listed per park, so one busy park can't fill the whole tweet.
+MAX_RANGES_PER_PARK = 3
 
+# One site available (or newly opened) from `start` to `end`.
+Hit = namedtuple("Hit", ["park_id", "park_name", "site_id", "start", "end"])
 
-def _create_tweet(tweet, tc):
-    tweet = tweet[:MAX_TWEET_LENGTH]
-    api = twitter.Api(
-        consumer_key=tc["consumer_key"],
-        consumer_secret=tc["consumer_secret"],
-        access_token_key=tc["access_token_key"],
-        access_token_secret=tc["access_token_secret"],
-    )
-    resp = api.PostUpdate(tweet)
-    # api.CreateFavorite(resp)
-    print("The following was tweeted: ")
-    print()
-    print(tweet)
 
+class TwitterBackend:
+    """
+    Tweets at the recipient.
+    """
 
-def main(args, stdin):
-    with open(CREDENTIALS_FILE) as f:
-        tc = json.load(f)
+    def __init__(self, credentials_file=CREDENTIALS_FILE):
+        import twitter
+
+        with open(credentials_file) as f:
+            tc = json.load(f)
+        self.api = twitter.Api(
+            consumer_key=tc["consumer_key"],
+            consumer_secret=tc["consumer_secret"],
+            access_token_key=tc["access_token_key"],
+            access_token_secret=tc["access_token_secret"],
+        )
+
+    def send(self, recipient, message):
+        tweet = "@{}!!! {}".format(recipient, message)
+        tweet += "\n" + "🏕" * random.randint(5, 20)  # To avoid duplicate tweets.
+        tweet = tweet[:MAX_TWEET_LENGTH]
+        self.api.PostUpdate(tweet)
+        print("The following was tweeted: ")
+        print()
+        print(tweet)
+
+
+class StdoutBackend:
+    """
+    Prints the messages instead of sending them, for trying things out and
+    for tests.
+    """
+
+    def __init__(self, credentials_file=None, stream=None):
+        self.stream = stream
+
+    def send(self, recipient, message):
+        print(
+            "To {}:\n{}".format(recipient, message),
+            file=self.stream or sys.stdout,
+            flush=True,
+        )
 
-    # Janky simple argument parsing.
-    if len(args) != 2:
-        print("Please provide the user you want to tweet at!")
-        sys.exit(1)
 
-    user = args[1].replace("@", "")
+BACKENDS = {
+    "twitter": TwitterBackend,
+    "stdout": StdoutBackend,
+}
 
-    first_line = next(stdin)
-    first_line_hash = md5(first_line.encode("utf-8")).hexdigest()
 
-    delay_file = DELAY_FILE_TEMPLATE.format(first_line_hash)
-    try:
-        with open(delay_file, "r") as f:
-            call_time = int(f.read().rstrip())
-    except:
-        call_time = 0
+class NotifierState:
+    """
+    What each recipient has already been told about, as
+    {<recipient>: {<key>: <expiry time>}}, kept in a JSON file. Expired keys
+    are dropped when the state is loaded and saved, so the file only grows
+    with what's currently available.
+    """
 
-    if call_time + random.randint(DELAY_TIME - 30, DELAY_TIME + 30) > int(
-        time.time()
-    ):
-        print("It is too soon to tweet again")
-        sys.exit(0)
+    def __init__(self, path, expiry=DEFAULT_EXPIRY, now=time.time):
+        self.path = path
+        self.expiry = expiry
+        self.now = now
+        self._sent = {}
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._sent = json.load(f)
+            except ValueError:
+                LOG.warning("Ignoring corrupt notifier state {}".format(path))
+        self._expire()
 
-    if "Something went wrong" in first_line:
-        _create_tweet("{}, I'm broken! Please help :'(".format(user), tc)
-        sys.exit()
+    def _expire(self):
+        now = self.now()
+        self._sent = {
+            recipient: {
+                key: expires for key, expires in sent.items() if expires > now
+            }
+            for recipient, sent in self._sent.items()
+        }
 
-    available_site_strings = generate_availability_strings(stdin)
+    def is_new(self, recipient, key):
+        expires = self._sent.get(recipient, {}).get(key)
+        return expires is None or expires <= self.now()
 
-    if available_site_strings:
-        tweet = generate_tweet_str(available_site_strings, first_line, user)
-        _create_tweet(tweet, tc)
-        with open(delay_file, "w") as f:
-            f.write(str(int(time.time())))
-        sys.exit(0)
+    def mark(self, recipient, keys):
+        expires = self.now() + self.expiry
+        sent = self._sent.setdefault(recipient, {})
+        for key in keys:
+            sent[key] = expires
+
+    def save(self):
+        if self.path is None:
+            return
+        self._expire()
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, "w") as f:
+            json.dump({r: sent for r, sent in self._sent.items() if sent}, f)
+        os.replace(tmp_path, self.path)
+
+
+def parse_results(lines):
+    """
+    The hits in `camping.py --json-output` results, whether one JSON object
+    or one park per line (--stream). Returns None if the input isn't JSON.
+    """
+    hits = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            result = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(result, dict):
+            return None
+        if "summary" in result:
+            continue
+        if "park_id" in result:
+            hits.extend(
+                _park_hits(result["park_id"], result.get("park_name"), result)
+            )
+            continue
+        for park_id, park in result.items():
+            hits.extend(_park_hits(park_id, park.get("park_name"), park))
+    return hits
+
+
+def _park_hits(park_id, park_name, park):
+    if "opened" in park:
+        ranges_by_site_id = park["opened"]
     else:
-        print("No campsites available, not tweeting 😞")
+        ranges_by_site_id = park.get("availabilities", park)
+    for site_id, ranges in ranges_by_site_id.items():
+        for r in ranges:
+            yield Hit(str(park_id), park_name, str(site_id), r["start"], r["end"])
+
+
+def hit_key(hit):
+    return "{}:{}:{}:{}".format(hit.park_id, hit.site_id, hit.start, hit.end)
+
+
+def generate_hit_strings(hits):
+    """
+    One line per park, in the order the parks first appear, with the
+    distinct date ranges available there, earliest first and at most
+    `MAX_RANGES_PER_PARK` of them.
+    """
+    sites_by_park = OrderedDict()
+    ranges_by_park = {}
+    for hit in hits:
+        park = (hit.park_id, hit.park_name)
+        sites_by_park.setdefault(park, set()).add(hit.site_id)
+        ranges_by_park.setdefault(park, set()).add((hit.start, hit.end))
+    strings = []
+    for park, site_ids in sites_by_park.items():
+        park_id, park_name = park
+        if park_name is None:
+            park_name_and_id = "park {}".format(park_id)
+        else:
+            park_name_and_id = "{} ({})".format(park_name, park_id)
+        strings.append(
+            "{} site(s) available in {}: {}".format(
+                len(site_ids),
+                park_name_and_id,
+                _format_ranges(sorted(ranges_by_park[park])),
+            )
+        )
+    return strings
+
+
+def _format_ranges(ranges):
+    shown = ", ".join(
+        "{} -> {}".format(start, end) for start, end in ranges[:MAX_RANGES_PER_PARK]
+    )
+    if len(ranges) > MAX_RANGES_PER_PARK:
+        shown += " and {} more".format(len(ranges) - MAX_RANGES_PER_PARK)
+    return shown
+
+
+def generate_message(available_site_strings, header=None):
+    """
+    `header` is camping.py's line saying which dates were searched, when
+    there is one.
+    """
+    message = "{} 🏕🏕🏕\n".format(header or "there are campsites available!!!")
+    message += "\n".join(available_site_strings)
+    return message
+
+
+def pending_messages(lines, recipients, state):
+    """
+    {<recipient>: (<message>, <keys it covers>)} for every recipient with
+    something new to be told.
+    """
+    header = None
+    keyed = []
+    failed = [line for line in lines if ERROR_MARKER in line]
+    lines = [line for line in lines if ERROR_MARKER not in line]
+    # camping.py always prints something unless it fell over.
+    if failed or not any(line.strip() for line in lines):
+        keyed.append((BROKEN_KEY, None))
+    if any(line.strip() for line in lines):
+        hits = parse_results(lines)
+        if hits is None:
+            header = find_header(lines)
+            # The human output of camping.py has no site IDs, so parks are
+            # only told apart by their number of sites.
+            keyed.extend((s, s) for s in generate_availability_strings(lines))
+        else:
+            keyed.extend((hit_key(hit), hit) for hit in hits)
+
+    messages = {}
+    for recipient in recipients:
+        new = [(key, item) for key, item in keyed if state.is_new(recipient, key)]
+        if not new:
+            continue
+        keys = [key for key, _ in new]
+        items = [item for key, item in new if key != BROKEN_KEY]
+        if not items:
+            message = BROKEN_MESSAGE
+        elif isinstance(items[0], Hit):
+            message = generate_message(generate_hit_strings(items))
+        else:
+            message = generate_message(items, header)
+        if items and BROKEN_KEY in keys:
+            message += "\n" + BROKEN_MESSAGE
+        messages[recipient] = (message, keys)
+    return messages
+
+
+def notify(backend, messages, state):
+    """
+    Sends every message at once, and marks what was sent to each recipient
+    that it reached. Returns the number of messages sent.
+    """
+    results = fetch_all(
+        lambda recipient: backend.send(recipient, messages[recipient][0]),
+        list(messages),
+        max_workers=len(messages),
+    )
+    sent = 0
+    for result in results:
+        if result.error is not None:
+            LOG.error(
+                "Couldn't notify {}: {}".format(result.item, result.error)
+            )
+            continue
+        state.mark(result.item, messages[result.item][1])
+        sent += 1
+    state.save()
+    return sent
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "recipients", nargs="+", help="Who to notify, e.g. a Twitter @user"
+    )
+    parser.add_argument(
+        "--backend", choices=sorted(BACKENDS), default="twitter"
+    )
+    parser.add_argument("--credentials-file", default=CREDENTIALS_FILE)
+    parser.add_argument(
+        "--state-file",
+        default=DEFAULT_STATE_FILE,
+        help="Where to remember what each recipient has been told",
+    )
+    parser.add_argument(
+        "--expiry",
+        type=int,
+        default=DEFAULT_EXPIRY,
+        help="Seconds before the same site and dates are notified again",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv, stdin):
+    args = parse_args(argv)
+    recipients = [r.replace("@", "") for r in args.recipients]
+    state = NotifierState(args.state_file, args.expiry)
+
+    messages = pending_messages(list(stdin), recipients, state)
+    if not messages:
+        print("No new campsites available, not notifying 😞")
         sys.exit(1)
 
+    backend = BACKENDS[args.backend](args.credentials_file)
+    if not notify(backend, messages, state):
+        sys.exit(1)
+    sys.exit(0)
+
 
-def generate_tweet_str(available_site_strings, first_line, user):
-    tweet = "@{}!!! ".format(user)
-    tweet += first_line.rstrip()
-    tweet += " 🏕🏕🏕\n"
-    tweet += "\n".join(available_site_strings)
-    tweet += "\n" + "🏕" * random.randint(5, 20)  # To avoid duplicate tweets.
-    return tweet
+def find_header(lines):
+    """
+    The "there are campsites available from X to Y!!!" line of camping.py's
+    human output, if it's there.
+    """
+    for line in lines:
+        line = line.strip()
+        if line.lower().startswith("there are campsites available from"):
+            return line
+    return None
 
 
 def generate_availability_strings(stdin):
@@ -99,4 +359,4 @@ def generate_availability_strings(stdin):
 
 
 if __name__ == "__main__":
-    main(sys.argv, sys.stdin)
+    main(sys.argv[1:], sys.stdin)
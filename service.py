@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+A long-running local HTTP service answering availability queries as JSON,
+so scripts can share one client instead of each running `camping.py`, e.g.:
+
+    python service.py --port 8080 --cache-dir ~/.cache/campsite-checker
+    curl 'http://127.0.0.1:8080/check?park_id=232448&start_date=2030-07-20&end_date=2030-07-23'
+
+Every query goes through the same connection pool, response cache and rate
+limiter. Identical queries that come in while one is being worked out wait
+for it rather than fetching again, and results are kept for --result-ttl
+seconds. Different queries needing the same month share its fetch too,
+see `RecreationClient.get_availability`.
+
+- `/check` checks one park like `camping.py` does: `park_id`, `start_date`,
+  `end_date`, and optionally `nights`, `weekends_only`, `weekdays`,
+  `check_in_days`, `must_include`, `campsite_type`,
+  `campsite_ids`, `excluded_site_ids`, `loops`, `reserve_types`,
+  `types_of_use`, `capacity_ratings` and `people`. Lists are given
+  comma-separated or repeated. The answer is a --stream line of
+  `camping.py --json-output`.
+- `/search` takes the same parameters, with `parks` instead of `park_id`
+  (every park if left out), and answers from whatever has been fetched so
+  far without sending any requests, see `AvailabilityIndex.search`.
+- `/health` says how busy the service is.
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from camping import (
+    get_calendar,
+    get_park_information,
+    night_weekdays,
+    summarize_park,
+)
+from clients.metadata_store import MetadataStore
+from clients.recreation_client import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MEMO_SIZE,
+    DEFAULT_MEMO_TTL,
+    DEFAULT_READ_TIMEOUT,
+    RecreationClient,
+)
+from clients.response_cache import DEFAULT_MAX_BYTES, ResponseCache
+from utils.availability_index import AvailabilityIndex
+from utils.calendar_mask import parse_weekday
+from utils.camping_argparser import DEFAULT_BASE_URL, CampingArgumentParser
+from utils.fetcher import DEFAULT_MAX_IN_FLIGHT, DEFAULT_MAX_PER_HOST, RequestLimiter
+from utils.singleflight import Memo, SingleFlight
+from utils.site_index import SiteFilter
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8080
+DEFAULT_RESULT_TTL = 60
+DEFAULT_MAX_RESULTS = 10000
+DEFAULT_SAVE_INTERVAL = 300
+TypeConverter = CampingArgumentParser.TypeConverter
+
+# The parts of a query that aren't the parks.
+Query = namedtuple(
+    "Query",
+    [
+        "start_date",
+        "end_date",
+        "nights",
+        "weekends_only",
+        "weekdays",
+        "check_in_days",
+        "must_include",
+        "site_filter",
+    ],
+)
+
+
+class QueryError(ValueError):
+    """
+    A query that can't be answered as asked, sent back as a 400.
+    """
+
+
+def parse_query(params):
+    """
+    The `Query` in the parameters of a request, as given by `parse_qs`.
+    """
+    try:
+        start_date = TypeConverter.date(_value(params, "start_date", required=True))
+        end_date = TypeConverter.date(_value(params, "end_date", required=True))
+        nights = _value(params, "nights")
+        if nights is not None:
+            nights = TypeConverter.positive_int(nights)
+        people = _value(params, "people")
+        if people is not None:
+            people = TypeConverter.positive_int(people)
+        weekdays, check_in_days, must_include = (
+            tuple(sorted(set(parse_weekday(v) for v in _values(params, name))))
+            for name in ("weekdays", "check_in_days", "must_include")
+        )
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        raise QueryError(str(e))
+    if end_date <= start_date:
+        raise QueryError("end_date must be after start_date")
+
+    campsite_type = _value(params, "campsite_type")
+    site_filter = SiteFilter(
+        campsite_types=[campsite_type] if campsite_type else (),
+        loops=_values(params, "loops"),
+        reserve_types=_values(params, "reserve_types"),
+        types_of_use=_values(params, "types_of_use"),
+        capacity_ratings=_values(params, "capacity_ratings"),
+        campsite_ids=_values(params, "campsite_ids"),
+        excluded_site_ids=_values(params, "excluded_site_ids"),
+        people=people,
+    )
+    weekends_only = _value(params, "weekends_only", "") in ("1", "true", "yes")
+    return Query(
+        start_date,
+        end_date,
+        nights,
+        weekends_only,
+        weekdays,
+        check_in_days,
+        must_include,
+        site_filter,
+    )
+
+
+def parse_parks(params, name):
+    try:
+        return [int(p) for p in _values(params, name)]
+    except ValueError:
+        raise QueryError("Not a valid list of park IDs: {}".format(params[name]))
+
+
+def _value(params, name, default=None, required=False):
+    values = params.get(name)
+    if not values:
+        if required:
+            raise QueryError("{} is required".format(name))
+        return default
+    return values[-1]
+
+
+def _values(params, name):
+    return [v for value in params.get(name, ()) for v in value.split(",") if v]
+
+
+class QueryService:
+    """
+    Answers queries with the shared `RecreationClient`. Each distinct query
+    is worked out once at a time (see `SingleFlight`) and its result kept in
+    a `Memo`.
+    """
+
+    def __init__(
+        self, result_ttl=DEFAULT_RESULT_TTL, max_results=DEFAULT_MAX_RESULTS, now=time.monotonic
+    ):
+        self.results = Memo(result_ttl, max_results, now)
+        self.flight = SingleFlight()
+
+    def check(self, park_id, query):
+        return self._memoized(("check", park_id, query), self._check, park_id, query)
+
+    def _check(self, park_id, query):
+        calendar = get_calendar(
+            query.start_date,
+            query.end_date,
+            query.nights,
+            query.weekends_only,
+            query.weekdays,
+            query.check_in_days,
+            query.must_include,
+        )
+        park_information = get_park_information(
+            park_id,
+            query.start_date,
+            query.end_date,
+            site_filter=query.site_filter,
+            calendar=calendar,
+        )
+        current, maximum, availabilities, park_name = summarize_park(
+            park_id,
+            park_information,
+            query.start_date,
+            query.end_date,
+            calendar=calendar,
+        )
+        return {
+            "park_id": park_id,
+            "park_name": park_name,
+            "current": current,
+            "maximum": maximum,
+            "availabilities": availabilities,
+        }
+
+    def search(self, park_ids, query):
+        index = RecreationClient.availability_index
+        if index is None:
+            raise QueryError("There's no availability index to search")
+        return index.search(
+            query.start_date,
+            query.end_date,
+            nights=query.nights,
+            park_ids=park_ids or None,
+            site_filter=query.site_filter,
+            weekdays=night_weekdays(query.weekends_only, query.weekdays),
+            check_in_days=query.check_in_days,
+            must_include=query.must_include,
+        )
+
+    def health(self):
+        return {
+            "status": "ok",
+            "in_flight": self.flight.in_flight(),
+            "results": len(self.results),
+        }
+
+    def _memoized(self, key, fn, *args):
+        result = self.results.get(key)
+        if result is None:
+            result = self.flight.do(key, self._remember, key, fn, args)
+        return result
+
+    def _remember(self, key, fn, args):
+        result = fn(*args)
+        self.results.put(key, result)
+        return result
+
+
+class QueryServer:
+    """
+    Serves a `QueryService` over HTTP, a thread per connection.
+    """
+
+    def __init__(self, service, host="127.0.0.1", port=DEFAULT_PORT):
+        self.service = service
+        self._server = ThreadingHTTPServer((host, port), _handler_for(service))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _handler_for(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # See `benchmarks.fake_server`.
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = parse_qs(url.query)
+            try:
+                if url.path == "/check":
+                    park_ids = parse_parks(params, "park_id")
+                    if len(park_ids) != 1:
+                        raise QueryError("One park_id is required")
+                    result = service.check(park_ids[0], parse_query(params))
+                elif url.path == "/search":
+                    result = service.search(
+                        parse_parks(params, "parks"), parse_query(params)
+                    )
+                elif url.path == "/health":
+                    result = service.health()
+                else:
+                    return self._send(404, {"error": "Not found"})
+            except QueryError as e:
+                return self._send(400, {"error": str(e)})
+            except Exception as e:
+                LOG.error("Something went wrong answering {}: {}".format(self.path, e))
+                return self._send(502, {"error": str(e)})
+            self._send(200, result)
+
+        def _send(self, status, result):
+            body = json.dumps(result).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            LOG.debug(format % args)
+
+    return Handler
+
+
+def configure_client(args):
+    """
+    Sets up the `RecreationClient` every query shares.
+    """
+    RecreationClient.BASE_URL = args.base_url.rstrip("/")
+    RecreationClient.limiter = RequestLimiter(
+        max_in_flight=args.max_concurrency, max_per_host=args.max_per_host
+    )
+    RecreationClient.configure_session(pool_maxsize=args.max_per_host)
+    RecreationClient.timeout = (args.connect_timeout, args.read_timeout)
+    # Queries for different parks, dates or filters often need the same
+    # months.
+    RecreationClient.memo = Memo(args.memo_ttl, args.memo_size)
+    if args.cache_dir:
+        RecreationClient.cache = ResponseCache(
+            args.cache_dir, max_bytes=args.cache_max_bytes
+        )
+    if args.metadata_file:
+        RecreationClient.metadata = MetadataStore(args.metadata_file)
+    # Always kept, for /search, but only saved if there's a file for it.
+    RecreationClient.availability_index = AvailabilityIndex(args.availability_index)
+    RecreationClient.offline = args.offline
+
+
+def save_client_state():
+    if RecreationClient.metadata is not None:
+        RecreationClient.metadata.save()
+    RecreationClient.availability_index.save()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument(
+        "--max-concurrency",
+        type=TypeConverter.positive_int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+    )
+    parser.add_argument(
+        "--max-per-host",
+        type=TypeConverter.positive_int,
+        default=DEFAULT_MAX_PER_HOST,
+    )
+    parser.add_argument(
+        "--connect-timeout",
+        type=TypeConverter.positive_float,
+        default=DEFAULT_CONNECT_TIMEOUT,
+        help="Seconds to wait for a connection to recreation.gov",
+    )
+    parser.add_argument(
+        "--read-timeout",
+        type=TypeConverter.positive_float,
+        default=DEFAULT_READ_TIMEOUT,
+        help="Seconds to wait for recreation.gov to send anything",
+    )
+    parser.add_argument("--cache-dir")
+    parser.add_argument(
+        "--cache-max-bytes",
+        type=TypeConverter.positive_int,
+        default=DEFAULT_MAX_BYTES,
+    )
+    parser.add_argument(
+        "--memo-ttl",
+        type=TypeConverter.positive_int,
+        default=DEFAULT_MEMO_TTL,
+        help="Seconds to keep each month fetched in memory for",
+    )
+    parser.add_argument(
+        "--memo-size",
+        type=TypeConverter.positive_int,
+        default=DEFAULT_MEMO_SIZE,
+        help="Most months to keep in memory at once",
+    )
+    parser.add_argument("--metadata-file")
+    parser.add_argument("--availability-index")
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Answer /check from --availability-index without sending requests",
+    )
+    parser.add_argument(
+        "--result-ttl",
+        type=TypeConverter.positive_int,
+        default=DEFAULT_RESULT_TTL,
+        help="Seconds to keep each query's result for",
+    )
+    parser.add_argument(
+        "--max-results",
+        type=TypeConverter.positive_int,
+        default=DEFAULT_MAX_RESULTS,
+        help="Most query results to keep at once",
+    )
+    parser.add_argument(
+        "--save-interval",
+        type=TypeConverter.positive_int,
+        default=DEFAULT_SAVE_INTERVAL,
+        help="Seconds between saves of --metadata-file and --availability-index",
+    )
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args(argv)
+    if args.offline and not args.availability_index:
+        parser.error("--offline can only be used with --availability-index")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    configure_client(args)
+
+    server = QueryServer(
+        QueryService(args.result_ttl, args.max_results), args.host, args.port
+    ).start()
+    print("Serving on {}".format(server.base_url), flush=True)
+    try:
+        while True:
+            time.sleep(args.save_interval)
+            save_client_state()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        if RecreationClient.metadata is not None:
+            RecreationClient.metadata.wait_for_refreshes()
+        save_client_state()
+
+
+if __name__ == "__main__":
+    main()
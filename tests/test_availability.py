@@ -0,0 +1,114 @@
+import unittest
+from datetime import date
+
+from utils.availability import (
+    AvailabilityMatrix,
+    SiteBitmaps,
+    date_ranges,
+    iter_bits,
+    parse_date,
+    range_mask,
+    run_cover,
+    run_starts,
+    run_touches,
+    weekday_mask,
+)
+
+
+class TestAvailability(unittest.TestCase):
+    def testParseDate_ApiDateString(self):
+        self.assertEqual(parse_date("2022-06-22T00:00:00Z"), date(2022, 6, 22))
+
+    def testFromDateLists_SetsBitsFromOrigin(self):
+        bitmaps = SiteBitmaps.from_date_lists(
+            {
+                "1": [],
+                "2": ["2022-06-22T00:00:00Z", "2022-06-24T00:00:00Z"],
+            }
+        )
+
+        self.assertEqual(bitmaps.origin, date(2022, 6, 22))
+        self.assertEqual(bitmaps, {"1": 0, "2": 0b101})
+        self.assertEqual(
+            bitmaps.to_date_lists(), {"1": [], "2": ["2022-06-22", "2022-06-24"]}
+        )
+
+    def testRangeMask(self):
+        self.assertEqual(range_mask(2, 5), 0b11100)
+        self.assertEqual(range_mask(-2, 2), 0b11)
+        self.assertEqual(range_mask(3, 3), 0)
+
+    def testWeekdayMask_FridaysAndSaturdays(self):
+        # 2022-06-22 is a Wednesday.
+        mask = weekday_mask(date(2022, 6, 22), 14, (4, 5))
+        self.assertEqual(list(iter_bits(mask)), [2, 3, 9, 10])
+
+    def testRunStarts_OnlyStartsWithEnoughConsecutiveNights(self):
+        mask = 0b0111101110
+        self.assertEqual(list(iter_bits(run_starts(mask, 1))), [1, 2, 3, 5, 6, 7, 8])
+        self.assertEqual(list(iter_bits(run_starts(mask, 3))), [1, 5, 6])
+        self.assertEqual(list(iter_bits(run_starts(mask, 4))), [5])
+        self.assertEqual(run_starts(mask, 5), 0)
+
+    def testRunCover_UndoesRunStartsForLongEnoughRuns(self):
+        mask = 0b0111101110
+        self.assertEqual(run_cover(run_starts(mask, 3), 3), 0b0111101110)
+        self.assertEqual(run_cover(run_starts(mask, 4), 4), 0b0111100000)
+        self.assertEqual(run_cover(0, 4), 0)
+
+    def testRunTouches_StartsOfStaysIncludingANight(self):
+        mask = 0b0100010000
+        self.assertEqual(run_touches(mask, 1), mask)
+        self.assertEqual(list(iter_bits(run_touches(mask, 3))), [2, 3, 4, 6, 7, 8])
+        self.assertEqual(run_touches(0, 3), 0)
+
+    def testDateRanges_OneRangePerRun(self):
+        self.assertEqual(
+            date_ranges(date(2022, 6, 1), 0b1101110),
+            [
+                {"start": "2022-06-02", "end": "2022-06-05"},
+                {"start": "2022-06-06", "end": "2022-06-08"},
+            ],
+        )
+
+
+class TestAvailabilityMatrix(unittest.TestCase):
+    def setUp(self):
+        self.bitmaps = SiteBitmaps(
+            date(2022, 6, 1),
+            {
+                # Free the whole window, so a run would bleed into the next
+                # site if rows weren't kept apart.
+                "1": 0b1111111111,
+                "2": 0b0000000111,
+                "3": 0b0111000000,
+            },
+        )
+
+    def testStartOffsets_AllSitesAtOnce(self):
+        matrix = AvailabilityMatrix.from_bitmaps(self.bitmaps, 0, 8)
+
+        self.assertEqual(
+            matrix.start_offsets(3),
+            {"1": [0, 1, 2, 3, 4, 5], "2": [0]},
+        )
+
+    def testStartOffsets_WindowAndAllowedNights(self):
+        matrix = AvailabilityMatrix.from_bitmaps(self.bitmaps, 2, 9)
+
+        self.assertEqual(
+            matrix.start_offsets(2, allowed=0b1110111),
+            {"1": [0, 1, 4, 5], "3": [4, 5]},
+        )
+
+    def testFromBitmaps_WindowBeforeOrigin(self):
+        matrix = AvailabilityMatrix.from_bitmaps(self.bitmaps, -2, 3)
+
+        self.assertEqual(
+            dict(matrix.rows(matrix.packed)),
+            {"1": 0b11100, "2": 0b11100},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,275 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from benchmarks.fake_server import FakeRecreationServer
+from clients.rate_limiter import RateLimiter
+from clients import recreation_client
+from clients.recreation_client import RecreationClient
+from utils import availability_index
+from utils.availability_index import AvailabilityIndex
+from utils.site_index import SiteFilter
+
+JUNE = datetime(2022, 6, 1)
+JULY = datetime(2022, 7, 1)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def month(month_date, sites, loop="A"):
+    return {
+        site_id: {
+            "availabilities": {
+                "{:04d}-{:02d}-{:02d}T00:00:00Z".format(
+                    month_date.year, month_date.month, day
+                ): "Available"
+                for day in days
+            },
+            "campsite_id": site_id,
+            "campsite_type": "STANDARD NONELECTRIC",
+            "loop": loop,
+            "max_num_people": 6,
+            "min_num_people": 1,
+        }
+        for site_id, days in sites.items()
+    }
+
+
+def stays(*ranges):
+    return [{"start": start, "end": end} for start, end in ranges]
+
+
+class TestAvailabilityIndex(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "index.json")
+        self.clock = FakeClock()
+        self.index = AvailabilityIndex(self.path, now=self.clock)
+        self.index.record_month(1, JUNE, month(JUNE, {"10": [2, 3, 4], "11": [3]}))
+        self.index.record_month(2, JUNE, month(JUNE, {"20": [10, 11]}, loop="B"))
+
+    def testSearch_FindsStaysAcrossParks(self):
+        self.assertEqual(
+            self.index.search(JUNE, datetime(2022, 6, 30), nights=2),
+            {
+                "1": {
+                    "10": stays(
+                        ("2022-06-02", "2022-06-04"), ("2022-06-03", "2022-06-05")
+                    )
+                },
+                "2": {"20": stays(("2022-06-10", "2022-06-12"))},
+            },
+        )
+
+    def testSearch_ParksAndSiteFilter(self):
+        self.assertEqual(
+            self.index.search(JUNE, datetime(2022, 6, 30), nights=1, park_ids=[1]),
+            {
+                "1": {
+                    "10": stays(
+                        ("2022-06-02", "2022-06-03"),
+                        ("2022-06-03", "2022-06-04"),
+                        ("2022-06-04", "2022-06-05"),
+                    ),
+                    "11": stays(("2022-06-03", "2022-06-04")),
+                }
+            },
+        )
+        self.assertEqual(
+            self.index.search(
+                JUNE, datetime(2022, 6, 30), nights=2, site_filter=SiteFilter(loops=["B"])
+            ),
+            {"2": {"20": stays(("2022-06-10", "2022-06-12"))}},
+        )
+
+    def testSearch_UpdatedByEachMonthRecorded(self):
+        end_date = datetime(2022, 6, 30)
+        self.assertNotIn("3", self.index.search(JUNE, end_date, nights=2))
+
+        self.index.record_month(3, JUNE, month(JUNE, {"30": [20, 21]}))
+        self.index.record_month(2, JUNE, month(JUNE, {"20": []}, loop="B"))
+
+        self.assertEqual(
+            self.index.search(JUNE, end_date, nights=2),
+            {
+                "1": {
+                    "10": stays(
+                        ("2022-06-02", "2022-06-04"), ("2022-06-03", "2022-06-05")
+                    )
+                },
+                "3": {"30": stays(("2022-06-20", "2022-06-22"))},
+            },
+        )
+
+    def testSearch_KeepsABoundedNumberOfResults(self):
+        with mock.patch.object(availability_index, "MAX_SEARCHES", 2):
+            index = AvailabilityIndex(now=self.clock)
+        index.record_month(1, JUNE, month(JUNE, {"10": [2, 3, 4]}))
+
+        for nights in (1, 2, 3):
+            index.search(JUNE, datetime(2022, 6, 30), nights=nights)
+
+        self.assertEqual(len(index._searches), 2)
+
+    def testSearch_MissingMonthsAreUnavailable(self):
+        self.index.record_month(2, JULY, month(JULY, {"20": [1]}, loop="B"))
+
+        self.assertEqual(
+            self.index.search(datetime(2022, 6, 29), datetime(2022, 7, 3), nights=3),
+            {},
+        )
+        self.index.record_month(1, JULY, month(JULY, {"10": [1, 2]}))
+        self.index.record_month(2, JUNE, month(JUNE, {"20": [29, 30]}, loop="B"))
+        self.assertEqual(
+            self.index.search(datetime(2022, 6, 29), datetime(2022, 7, 3), nights=3),
+            {"2": {"20": stays(("2022-06-29", "2022-07-02"))}},
+        )
+
+        # Park 3 hasn't got June, but still has stays in July.
+        self.index.record_month(3, JULY, month(JULY, {"30": [1, 2, 3]}))
+        self.assertEqual(
+            self.index.search(datetime(2022, 6, 29), datetime(2022, 7, 4), nights=2),
+            {
+                "1": {"10": stays(("2022-07-01", "2022-07-03"))},
+                "2": {
+                    "20": stays(
+                        ("2022-06-29", "2022-07-01"), ("2022-06-30", "2022-07-02")
+                    )
+                },
+                "3": {
+                    "30": stays(
+                        ("2022-07-01", "2022-07-03"), ("2022-07-02", "2022-07-04")
+                    )
+                },
+            },
+        )
+
+    def testSearch_PastMonthsNotNeeded(self):
+        # Park 3 was only fetched once June was over, like camping.py would.
+        self.index.record_month(3, JULY, month(JULY, {"30": [5, 6]}))
+        self.clock.now = datetime(2022, 7, 3).timestamp()
+
+        self.assertEqual(
+            self.index.search(JUNE, datetime(2022, 7, 31), nights=2, park_ids=[3]),
+            {"3": {"30": stays(("2022-07-05", "2022-07-07"))}},
+        )
+
+    def testSearch_SiteIdsAndExclusions(self):
+        self.assertEqual(
+            self.index.search(
+                JUNE,
+                datetime(2022, 6, 30),
+                nights=1,
+                site_filter=SiteFilter(
+                    campsite_ids=["10", "11"], excluded_site_ids=["11"]
+                ),
+            ),
+            {
+                "1": {
+                    "10": stays(
+                        ("2022-06-02", "2022-06-03"),
+                        ("2022-06-03", "2022-06-04"),
+                        ("2022-06-04", "2022-06-05"),
+                    )
+                }
+            },
+        )
+
+    def testMonth_AsParsed(self):
+        data = self.index.month(1, JUNE)
+
+        self.assertEqual(
+            data["campsites"]["10"]["availabilities"],
+            month(JUNE, {"10": [2, 3, 4]})["10"]["availabilities"],
+        )
+        self.assertEqual(data["campsites"]["11"]["loop"], "A")
+        self.assertIsNone(self.index.month(1, JULY))
+
+    def testSave_ReloadsEverything(self):
+        self.index.record_park_name(1, "Upper Pines")
+        self.index.save()
+
+        loaded = AvailabilityIndex(self.path, now=self.clock)
+
+        self.assertEqual(loaded.park_name(1), "Upper Pines")
+        self.assertEqual(loaded.fetched_at(2, JUNE), 1000.0)
+        self.assertEqual(
+            loaded.search(JUNE, datetime(2022, 6, 30), nights=2),
+            self.index.search(JUNE, datetime(2022, 6, 30), nights=2),
+        )
+
+    def testTakeChanges_MergedElsewhere(self):
+        merged = AvailabilityIndex()
+        merged.merge(self.index.take_changes())
+        self.assertEqual(self.index.take_changes(), {})
+
+        self.assertEqual(merged.month(2, JUNE), self.index.month(2, JUNE))
+
+
+class TestClientWithIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = AvailabilityIndex()
+
+        def restore():
+            RecreationClient.availability_index = None
+            RecreationClient.offline = False
+
+        self.addCleanup(restore)
+        RecreationClient.availability_index = self.index
+
+    def testClient_RecordsUnfilteredMonths(self):
+        server = FakeRecreationServer(sites=5)
+        self.addCleanup(server.stop)
+        base_url = RecreationClient.BASE_URL
+        RecreationClient.BASE_URL = server.start().base_url
+
+        def restore():
+            RecreationClient.BASE_URL = base_url
+            RecreationClient.rate_limiter = RateLimiter()
+            RecreationClient.configure_session()
+
+        self.addCleanup(restore)
+
+        site_id = sorted(RecreationClient.get_availability(1, JUNE)["campsites"])[0]
+        data = RecreationClient.get_availability(1, JUNE, campsite_ids=(site_id,))
+
+        indexed = self.index.month(1, JUNE)["campsites"]
+        self.assertEqual(len(indexed), 5)
+        self.assertEqual(
+            indexed[site_id]["availabilities"],
+            data["campsites"][site_id]["availabilities"],
+        )
+
+    def testOffline_AnswersFromIndex(self):
+        self.index.record_month(1, JUNE, month(JUNE, {"10": [2], "11": [3]}))
+        RecreationClient.offline = True
+
+        data = RecreationClient.get_availability(1, JUNE, excluded_site_ids=("11",))
+
+        self.assertEqual(list(data["campsites"]), ["10"])
+        self.assertEqual(RecreationClient.get_park_name(1), "park 1")
+        with self.assertRaises(LookupError):
+            RecreationClient.get_availability(1, JULY)
+
+    def testOffline_WarnsAboutStaleMonths(self):
+        clock = FakeClock()
+        self.index.now = clock
+        self.index.record_month(1, JUNE, month(JUNE, {"10": [2]}))
+        RecreationClient.offline = True
+        clock.now += recreation_client.OFFLINE_STALE_AFTER + 1
+
+        with self.assertLogs(recreation_client.LOG, "WARNING"):
+            RecreationClient.get_availability(1, JUNE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from datetime import datetime
+
+from utils.availability import AvailabilityMatrix, SiteBitmaps, range_mask
+from utils.calendar_mask import CalendarMask, calendar_mask, parse_weekday
+
+# A Monday, and two weeks later.
+START = datetime(2022, 6, 20)
+END = datetime(2022, 7, 4)
+EVERY_NIGHT = range_mask(0, 14)
+FRI, SAT = 4, 5
+
+
+class TestCalendarMask(unittest.TestCase):
+    def testCheckInDays_OnlyStartsOnThoseDays(self):
+        calendar = CalendarMask(START, END, nights=2, check_in_days=(FRI,))
+
+        self.assertEqual(
+            calendar.ranges(calendar.starts(EVERY_NIGHT)),
+            [("2022-06-24", "2022-06-26"), ("2022-07-01", "2022-07-03")],
+        )
+
+    def testMustInclude_StaysWithASaturdayNight(self):
+        calendar = CalendarMask(START, END, nights=2, must_include=(SAT,))
+
+        self.assertEqual(
+            calendar.ranges(calendar.starts(EVERY_NIGHT)),
+            [
+                ("2022-06-24", "2022-06-26"),
+                ("2022-06-25", "2022-06-27"),
+                ("2022-07-01", "2022-07-03"),
+                ("2022-07-02", "2022-07-04"),
+            ],
+        )
+        # Without the Saturday night itself, nothing does.
+        self.assertEqual(calendar.starts(EVERY_NIGHT & ~(1 << 5 | 1 << 12)), 0)
+
+    def testWeekdaysAndWindows_LimitTheNights(self):
+        self.assertEqual(CalendarMask(START, END, weekdays=()).allowed, 0)
+        self.assertEqual(
+            CalendarMask(START, END, weekdays=(FRI, SAT)).allowed,
+            0b11 << 4 | 0b11 << 11,
+        )
+
+        calendar = CalendarMask(
+            START, END, nights=2, windows=((datetime(2022, 6, 24), datetime(2022, 6, 27)),)
+        )
+        self.assertEqual(calendar.allowed, 0b111 << 4)
+        self.assertEqual(calendar.starts(EVERY_NIGHT), 0b11 << 4)
+        self.assertEqual(calendar.stay_nights(), 0b111 << 4)
+
+    def testMatrixStarts_SameAsEachSite(self):
+        calendar = CalendarMask(
+            START, END, nights=3, check_in_days=(FRI, SAT), must_include=(SAT,)
+        )
+        # From the first of the month, like `get_park_information`.
+        origin = datetime(2022, 6, 1)
+        first = (START - origin).days
+        bitmaps = SiteBitmaps(
+            origin.date(),
+            {
+                "1": EVERY_NIGHT << first,
+                "2": 0b1010111 << (first + 3),
+                "3": 0b11 << (first + 4),
+            },
+        )
+        matrix = AvailabilityMatrix.from_bitmaps(bitmaps, first, first + 14)
+
+        self.assertEqual(
+            dict(matrix.rows(calendar.matrix_starts(matrix))),
+            {
+                site: starts
+                for site, starts in (
+                    (site, calendar.starts(mask >> first))
+                    for site, mask in bitmaps.items()
+                )
+                if starts
+            },
+        )
+
+    def testCalendarMask_SharedPerSearch(self):
+        self.assertIs(
+            calendar_mask(START, END, 2, (FRI, SAT)),
+            calendar_mask(START, END, 2, (FRI, SAT)),
+        )
+
+    def testParseWeekday(self):
+        self.assertEqual(parse_weekday("sat"), SAT)
+        self.assertEqual(parse_weekday("Friday"), FRI)
+        self.assertEqual(parse_weekday("0"), 0)
+        for value in ("sa", "7", "someday"):
+            with self.assertRaises(ValueError):
+                parse_weekday(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
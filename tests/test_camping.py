@@ -1,9 +1,14 @@
+import json
 import unittest
+from datetime import date
 
 import camping
 from enums.date_format import DateFormat
 from enums.emoji import Emoji
+from utils.availability import SiteBitmaps
 from utils.camping_argparser import CampingArgumentParser
+from utils.fetcher import FetchResult
+from utils.snapshot import SnapshotStore
 
 
 class TestCamping(unittest.TestCase):
@@ -34,6 +39,153 @@ class TestCamping(unittest.TestCase):
         self.assertTrue(2 in available_dates_by_campsite_id)
         self.assertTrue(3 in available_dates_by_campsite_id)
 
+    def testGetNumAvailableSites_WeekendsOnlyWithNights(self):
+        park_info = {
+            # Thursday to Sunday night.
+            "1": [
+                "2022-06-23T00:00:00Z",
+                "2022-06-24T00:00:00Z",
+                "2022-06-25T00:00:00Z",
+                "2022-06-26T00:00:00Z",
+            ],
+            # Saturday night only.
+            "2": ["2022-06-25T00:00:00Z"],
+        }
+
+        current, maximum, available_dates_by_campsite_id = camping.get_num_available_sites(
+            park_info,
+            CampingArgumentParser.TypeConverter.date("2022-06-20"),
+            CampingArgumentParser.TypeConverter.date("2022-06-30"),
+            nights=2,
+            weekends_only=True,
+        )
+
+        self.assertEqual((current, maximum), (1, 2))
+        self.assertEqual(
+            available_dates_by_campsite_id,
+            {1: [{"start": "2022-06-24", "end": "2022-06-26"}]},
+        )
+
+    def testGetNumAvailableSites_CheckInDaysAndMustInclude(self):
+        # Thursday to Sunday night.
+        park_info = {
+            "1": [
+                "2022-06-23T00:00:00Z",
+                "2022-06-24T00:00:00Z",
+                "2022-06-25T00:00:00Z",
+                "2022-06-26T00:00:00Z",
+            ],
+        }
+        start_date = CampingArgumentParser.TypeConverter.date("2022-06-20")
+        end_date = CampingArgumentParser.TypeConverter.date("2022-06-30")
+
+        _, _, friday_check_in = camping.get_num_available_sites(
+            park_info,
+            start_date,
+            end_date,
+            calendar=camping.get_calendar(start_date, end_date, 2, check_in_days=(4,)),
+        )
+        _, _, with_sunday_night = camping.get_num_available_sites(
+            park_info,
+            start_date,
+            end_date,
+            calendar=camping.get_calendar(start_date, end_date, 2, must_include=(6,)),
+        )
+
+        self.assertEqual(
+            friday_check_in, {1: [{"start": "2022-06-24", "end": "2022-06-26"}]}
+        )
+        self.assertEqual(
+            with_sunday_night, {1: [{"start": "2022-06-25", "end": "2022-06-27"}]}
+        )
+
+    def testDiffResult_UsesWorkerParkNameAndKeepsErrorsPerPark(self):
+        camping.args = CampingArgumentParser().parse_args(
+            ["--start-date", "2022-06-20", "--end-date", "2022-06-30", "--parks", "1"]
+        )
+        self.addCleanup(delattr, camping, "args")
+        park_information = SiteBitmaps(date(2022, 6, 1), {"1": 0b1 << 22})
+        snapshots = SnapshotStore()
+
+        # Nothing to look the name up from, so it must come with the result.
+        result = camping._diff_result(
+            FetchResult(1, (park_information, "PARK"), None), snapshots
+        )
+        self.assertIsNone(result.error)
+        self.assertEqual(result.value[2], "PARK")
+
+        broken = camping._diff_result(FetchResult(2, (None, "PARK"), None), snapshots)
+        self.assertIsInstance(broken.error, Exception)
+
+        failed = FetchResult(3, None, RuntimeError("boom"))
+        self.assertIs(camping._diff_result(failed, snapshots), failed)
+
+    def testConsecutiveNights_ReturnsEveryValidStart(self):
+        available = [
+            "2022-06-22T00:00:00Z",
+            "2022-06-23T00:00:00Z",
+            "2022-06-24T00:00:00Z",
+            "2022-06-26T00:00:00Z",
+        ]
+
+        self.assertEqual(
+            camping.consecutive_nights(available, 2),
+            [("2022-06-22", "2022-06-24"), ("2022-06-23", "2022-06-25")],
+        )
+
+    def testCollapseParkInformation_FiltersAndKeepsMaximum(self):
+        def site(campsite_id, campsite_type, availabilities):
+            return {
+                "campsite_id": campsite_id,
+                "campsite_type": campsite_type,
+                "availabilities": availabilities,
+            }
+
+        month = {
+            "campsites": {
+                "10": site(
+                    "10",
+                    "STANDARD NONELECTRIC",
+                    {
+                        "2022-06-01T00:00:00Z": "Reserved",
+                        "2022-06-02T00:00:00Z": "Available",
+                    },
+                ),
+                "11": site(
+                    "11",
+                    "GROUP STANDARD NONELECTRIC",
+                    {"2022-06-02T00:00:00Z": "Available"},
+                ),
+                "12": site(
+                    "12",
+                    "STANDARD NONELECTRIC",
+                    {"2022-06-02T00:00:00Z": "Available"},
+                ),
+            }
+        }
+
+        park_info = camping.collapse_park_information(
+            [month],
+            campsite_type="STANDARD NONELECTRIC",
+            excluded_site_ids=["12"],
+        )
+
+        self.assertEqual(park_info.origin.isoformat(), "2022-06-01")
+        # Sites of the wrong type still count towards the maximum.
+        self.assertEqual(park_info, {"10": 0b10, "11": 0})
+
+    def testGetMonths_FirstOfEachMonthAcrossYear(self):
+        date = CampingArgumentParser.TypeConverter.date
+
+        self.assertEqual(
+            camping.get_months(date("2022-11-15"), date("2023-01-01")),
+            [date("2022-11-01"), date("2022-12-01"), date("2023-01-01")],
+        )
+        self.assertEqual(
+            camping.get_months(date("2022-06-22"), date("2022-06-23")),
+            [date("2022-06-01")],
+        )
+
     def testGenerateOutputToHuman_DefaultOutputWithAvailabilities(self):
         start_date = CampingArgumentParser.TypeConverter.date("2022-06-01")
         end_date = CampingArgumentParser.TypeConverter.date("2022-07-01")
@@ -181,6 +333,70 @@ class TestCamping(unittest.TestCase):
         )
         self.assertEqual(output, expected)
 
+    def testGenerateHumanChangesOutput_OnlyParksWithChanges(self):
+        changes_by_park_id = {
+            1: (
+                {18621: [{"start": "2022-06-22", "end": "2022-06-24"}]},
+                {18654: [{"start": "2022-06-25", "end": "2022-06-26"}]},
+                "SOME PARK",
+            ),
+            2: ({}, {}, "QUIET PARK"),
+        }
+
+        output, has_openings = camping.generate_human_changes_output(
+            changes_by_park_id
+        )
+
+        self.assertTrue(has_openings)
+        self.assertEqual(
+            output,
+            "\n".join(
+                [
+                    "there are newly available campsites!!!",
+                    "{} SOME PARK (1): 1 site(s) opened, 1 site(s) closed".format(
+                        Emoji.SUCCESS.value
+                    ),
+                    "  + Site 18621 opened: 2022-06-22 -> 2022-06-24",
+                    "  - Site 18654 closed: 2022-06-25 -> 2022-06-26",
+                ]
+            ),
+        )
+
+    def testGenerateParkJsonOutput_OneLinePerPark(self):
+        info = (
+            1,
+            2,
+            {18621: [{"start": "2022-06-22", "end": "2022-06-24"}]},
+            "SOME PARK",
+        )
+
+        output, has_availabilities = camping.generate_park_json_output(1, info)
+
+        self.assertTrue(has_availabilities)
+        self.assertNotIn("\n", output)
+        self.assertEqual(
+            json.loads(output),
+            {
+                "park_id": 1,
+                "park_name": "SOME PARK",
+                "current": 1,
+                "maximum": 2,
+                "availabilities": {
+                    "18621": [{"start": "2022-06-22", "end": "2022-06-24"}]
+                },
+            },
+        )
+
+    def testGenerateParkHumanChangesOutput_NothingIfNoChanges(self):
+        self.assertEqual(
+            camping.generate_park_human_changes_output(2, ({}, {}, "QUIET PARK")),
+            ([], False),
+        )
+        self.assertEqual(
+            camping.generate_park_json_changes_output(2, ({}, {}, "QUIET PARK")),
+            (None, False),
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
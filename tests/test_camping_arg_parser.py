@@ -1,3 +1,5 @@
+import io
+import sys
 import unittest
 
 from utils.camping_argparser import CampingArgumentParser
@@ -31,6 +33,172 @@ class TestCampingArgParser(unittest.TestCase):
         args.extend(self.end_date)
         CampingArgumentParser().parse_args(args)
 
+    def testStartDateRequiredWithoutQueries(self):
+        with self.assertRaises(SystemExit):
+            args = ["--parks", "333"]
+            args.extend(self.end_date)
+            CampingArgumentParser().parse_args(args)
+
+    def testQueriesNeedNoOtherArguments(self):
+        args = CampingArgumentParser().parse_args(["--queries", "queries.txt"])
+        self.assertEqual(args.queries, "queries.txt")
+
+    def testParseQuery_KeepsLineAndArguments(self):
+        line = "--start-date 2022-01-01 --end-date 2022-01-02 --parks 1 2 --nights 1"
+        query = CampingArgumentParser().parse_query(line)
+
+        self.assertEqual(query.parks, [1, 2])
+        self.assertEqual(query.nights, 1)
+        self.assertEqual(query.query, line)
+
+    def testSiteFilterArguments(self):
+        args = ["--loops", "A", "B", "--people", "6", "--reserve-types", "Site-Specific"]
+        args.extend(self.default_args)
+
+        parsed = CampingArgumentParser().parse_args(args)
+
+        self.assertEqual(parsed.loops, ["A", "B"])
+        self.assertEqual(parsed.people, 6)
+        self.assertEqual(parsed.reserve_types, ["Site-Specific"])
+        self.assertEqual(parsed.types_of_use, ())
+
+    def testShard_SplitsParksWithoutOverlap(self):
+        parks = [str(p) for p in range(100, 130)]
+        shards = [
+            CampingArgumentParser()
+            .parse_args(
+                self.start_date
+                + self.end_date
+                + ["--parks"]
+                + parks
+                + ["--shard", "{}/3".format(i)]
+            )
+            .parks
+            for i in range(3)
+        ]
+
+        self.assertEqual(
+            sorted(p for parks in shards for p in parks),
+            list(range(100, 130)),
+        )
+        self.assertTrue(all(shards))
+
+    def testShard_IndexMustBeLessThanCount(self):
+        with self.assertRaises(SystemExit):
+            CampingArgumentParser().parse_args(
+                self.default_args + ["--shard", "3/3"]
+            )
+
+    def testOffline_NeedsAvailabilityIndex(self):
+        with self.assertRaises(CampingArgumentParser.ArgumentCombinationError):
+            CampingArgumentParser().parse_args(self.default_args + ["--offline"])
+
+        args = CampingArgumentParser().parse_args(
+            self.default_args + ["--offline", "--availability-index", "index.json"]
+        )
+        self.assertTrue(args.offline)
+        self.assertEqual(args.availability_index, "index.json")
+
+    def testIncremental_NeedsSnapshotFileOutsideWatch(self):
+        with self.assertRaises(CampingArgumentParser.ArgumentCombinationError):
+            CampingArgumentParser().parse_args(self.default_args + ["--incremental"])
+
+        for extra in (["--snapshot-file", "snapshot.json"], ["--watch"]):
+            args = CampingArgumentParser().parse_args(
+                self.default_args + ["--incremental"] + extra
+            )
+            self.assertTrue(args.incremental)
+
+    def testParseQuery_IncrementalRejected(self):
+        line = "--start-date 2022-01-01 --end-date 2022-01-02 --parks 1 --incremental"
+        for extra in ("", " --snapshot-file snapshot.json"):
+            with self.assertRaises(CampingArgumentParser.ArgumentCombinationError):
+                CampingArgumentParser().parse_query(line + extra)
+
+    def testCalendarArguments_DaysOfTheWeek(self):
+        args = CampingArgumentParser().parse_args(
+            self.default_args
+            + ["--check-in-days", "fri", "Saturday", "--must-include", "5"]
+        )
+        self.assertEqual(args.check_in_days, [4, 5])
+        self.assertEqual(args.must_include, [5])
+        self.assertEqual(args.weekdays, ())
+
+        with self.assertRaises(SystemExit):
+            CampingArgumentParser().parse_args(
+                self.default_args + ["--weekdays", "someday"]
+            )
+
+    def testMaxRetries_MustNotBeNegative(self):
+        args = CampingArgumentParser().parse_args(
+            self.default_args + ["--max-retries", "0"]
+        )
+        self.assertEqual(args.max_retries, 0)
+
+        with self.assertRaises(SystemExit):
+            CampingArgumentParser().parse_args(
+                self.default_args + ["--max-retries", "-1"]
+            )
+
+    def testMemoTtl_MustNotBeNegative(self):
+        args = CampingArgumentParser().parse_args(
+            self.default_args + ["--memo-ttl", "0"]
+        )
+        self.assertEqual(args.memo_ttl, 0)
+
+        with self.assertRaises(SystemExit):
+            CampingArgumentParser().parse_args(
+                self.default_args + ["--memo-ttl", "-1"]
+            )
+
+    def testRateLimit_MustBeFiniteAndPositive(self):
+        args = CampingArgumentParser().parse_args(
+            self.default_args + ["--rate-limit", "availability=2.5"]
+        )
+        self.assertEqual(args.rate_limits, [("availability", 2.5)])
+
+        for rate in ("0", "-1", "nan", "inf"):
+            with self.assertRaises(SystemExit):
+                CampingArgumentParser().parse_args(
+                    self.default_args + ["--rate-limit", "availability=" + rate]
+                )
+
+    def testJitter_FractionBelowOne(self):
+        args = CampingArgumentParser().parse_args(
+            self.default_args + ["--jitter", "0.5"]
+        )
+        self.assertEqual(args.jitter, 0.5)
+
+        for jitter in ("-0.1", "1", "lots"):
+            with self.assertRaises(SystemExit):
+                CampingArgumentParser().parse_args(
+                    self.default_args + ["--jitter", jitter]
+                )
+
+    def testStdin_ParkIdsMustBeNumbers(self):
+        stdin = sys.stdin
+        self.addCleanup(setattr, sys, "stdin", stdin)
+        arguments = self.start_date + self.end_date + ["--stdin"]
+
+        sys.stdin = io.StringIO("111\n\n 222 \n")
+        self.assertEqual(
+            CampingArgumentParser().parse_args(arguments).parks, [111, 222]
+        )
+
+        sys.stdin = io.StringIO("111\nUpper Pines\n")
+        with self.assertRaises(SystemExit):
+            CampingArgumentParser().parse_args(arguments)
+
+    def testParseQuery_StdinRejectedWithoutReadingIt(self):
+        stdin = sys.stdin
+        self.addCleanup(setattr, sys, "stdin", stdin)
+        sys.stdin = io.StringIO("111\n")
+
+        for line in ("--start-date 2022-01-01 --end-date 2022-01-02 --stdin", "-"):
+            with self.assertRaises(CampingArgumentParser.ArgumentCombinationError):
+                CampingArgumentParser().parse_query(line)
+        self.assertEqual(sys.stdin.read(), "111\n")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from datetime import datetime
+
+import requests
+
+from benchmarks.fake_server import FakeRecreationServer
+from clients.rate_limiter import RateLimiter
+from clients.recreation_client import RecreationClient
+
+JUNE = datetime(2022, 6, 1)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFakeRecreationServer(unittest.TestCase):
+    def setUp(self):
+        self.base_url = RecreationClient.BASE_URL
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        RecreationClient.BASE_URL = self.base_url
+        RecreationClient.rate_limiter = RateLimiter()
+        RecreationClient.configure_session()
+
+    def _server(self, **kwargs):
+        server = FakeRecreationServer(sites=5, clock=self.clock, **kwargs)
+        self.addCleanup(server.stop)
+        RecreationClient.BASE_URL = server.start().base_url
+        return server
+
+    def testClient_FetchesMonthAndParkName(self):
+        server = self._server()
+
+        month = RecreationClient.get_availability(1, JUNE)
+
+        self.assertEqual(len(month["campsites"]), 5)
+        self.assertEqual(RecreationClient.get_park_name(1), "FAKE PARK 1")
+        self.assertEqual(
+            server.stats,
+            {("availability", 200): 1, ("campground", 200): 1},
+        )
+
+    def testEtag_NotModifiedUntilChurn(self):
+        server = self._server(churn=0.5, churn_interval=10)
+        url = server.base_url + RecreationClient.AVAILABILITY_ENDPOINT.format(
+            park_id=1
+        )
+        params = {"start_date": "2022-06-01T00:00:00.000Z"}
+
+        first = requests.get(url, params=params)
+        etag = first.headers["ETag"]
+        again = requests.get(url, params=params, headers={"If-None-Match": etag})
+        self.clock.now = 10
+        changed = requests.get(url, params=params, headers={"If-None-Match": etag})
+
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.json(), first.json())
+
+    def testMonthBody_KeepsOnlyTheCurrentEpoch(self):
+        server = self._server(churn=0.5, churn_interval=10)
+
+        for now in (0, 10, 20):
+            self.clock.now = now
+            server.month_body(1, JUNE)
+            server.month_body(2, JUNE)
+
+        self.assertEqual(len(server._bodies), 2)
+
+    def testThrottle_TooManyRequestsWithRetryAfter(self):
+        server = self._server(throttle_rate=1.0, retry_after=7)
+        url = server.base_url + RecreationClient.MAIN_PAGE_ENDPOINT.format(
+            park_id=1
+        )
+
+        resp = requests.get(url)
+
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp.headers["Retry-After"], "7")
+
+    def testRecorded_ServesSampleForEveryPark(self):
+        self._server(recorded="other/sample.json")
+
+        month = RecreationClient.get_availability(42, datetime(2020, 7, 1))
+
+        self.assertIn("10028633", month["campsites"])
+
+
+if __name__ == "__main__":
+    unittest.main()
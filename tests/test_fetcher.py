@@ -0,0 +1,66 @@
+import threading
+import time
+import unittest
+
+from utils.fetcher import RequestLimiter, fetch_all, fetch_each
+
+
+class TestFetcher(unittest.TestCase):
+    def testFetchAll_PreservesInputOrder(self):
+        def slow_echo(i):
+            # Later items finish first.
+            time.sleep((5 - i) * 0.01)
+            return i * 10
+
+        results = fetch_all(slow_echo, range(5), max_workers=5)
+
+        self.assertEqual([r.item for r in results], [0, 1, 2, 3, 4])
+        self.assertEqual([r.value for r in results], [0, 10, 20, 30, 40])
+
+    def testFetchAll_FailureDoesNotCancelOthers(self):
+        def maybe_fail(i):
+            if i == 2:
+                raise RuntimeError("boom")
+            return i
+
+        results = fetch_all(maybe_fail, range(4), max_workers=4)
+
+        self.assertEqual([r.value for r in results], [0, 1, None, 3])
+        self.assertIsInstance(results[2].error, RuntimeError)
+        self.assertTrue(all(r.error is None for i, r in enumerate(results) if i != 2))
+
+    def testFetchEach_YieldsInCompletionOrder(self):
+        def slow_echo(i):
+            # Later items finish first.
+            time.sleep((3 - i) * 0.05)
+            if i == 1:
+                raise RuntimeError("boom")
+            return i * 10
+
+        results = list(fetch_each(slow_echo, range(3), max_workers=3))
+
+        self.assertEqual([r.item for r in results], [2, 1, 0])
+        self.assertEqual([r.value for r in results], [20, None, 0])
+        self.assertIsInstance(results[1].error, RuntimeError)
+
+    def testRequestLimiter_CapsRequestsPerHost(self):
+        limiter = RequestLimiter(max_in_flight=10, max_per_host=2)
+        lock = threading.Lock()
+        in_flight = {"now": 0, "peak": 0}
+
+        def request(i):
+            with limiter.acquire("https://www.recreation.gov/api/{}".format(i)):
+                with lock:
+                    in_flight["now"] += 1
+                    in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+                time.sleep(0.02)
+                with lock:
+                    in_flight["now"] -= 1
+
+        fetch_all(request, range(8), max_workers=8)
+
+        self.assertEqual(in_flight["peak"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
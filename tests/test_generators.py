@@ -0,0 +1,38 @@
+import json
+import unittest
+from datetime import datetime
+
+from benchmarks.generators import generate_month, generate_parks, months_from
+from clients.payload_parser import parse_month
+
+
+class TestGenerators(unittest.TestCase):
+    def testMonthsFrom_AcrossYear(self):
+        self.assertEqual(
+            months_from(datetime(2022, 11, 15), 3),
+            [datetime(2022, 11, 1), datetime(2022, 12, 1), datetime(2023, 1, 1)],
+        )
+
+    def testGenerateMonth_Schema(self):
+        month = generate_month(7, datetime(2022, 2, 1), 5)
+        self.assertEqual(month["count"], 5)
+        self.assertEqual(len(month["campsites"]), 5)
+        for campsite_id, site in month["campsites"].items():
+            self.assertEqual(site["campsite_id"], campsite_id)
+            self.assertEqual(len(site["availabilities"]), 28)
+            self.assertIn("2022-02-01T00:00:00Z", site["availabilities"])
+
+    def testGenerateParks_Deterministic(self):
+        months = months_from(datetime(2022, 6, 1), 2)
+        self.assertEqual(
+            generate_parks(2, months, 10), generate_parks(2, months, 10)
+        )
+        self.assertNotEqual(
+            generate_parks(1, months, 10), generate_parks(1, months, 10, seed=1)
+        )
+
+    def testGenerateMonth_Density(self):
+        body = json.dumps(generate_month(1, datetime(2022, 6, 1), 3, 1.0))
+        parsed = parse_month(body.encode("utf-8"))
+        for site in parsed["campsites"].values():
+            self.assertEqual(len(site["availabilities"]), 30)
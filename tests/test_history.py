@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from benchmarks.fake_server import FakeRecreationServer
+from clients.rate_limiter import RateLimiter
+from clients.recreation_client import RecreationClient
+from utils.history import HistoryStore
+from utils.workers import map_in_processes
+
+JUNE = datetime(2022, 6, 1)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def month(sites):
+    return {
+        site_id: {
+            "availabilities": {
+                "2022-06-{:02d}T00:00:00Z".format(day): "Available" for day in days
+            }
+        }
+        for site_id, days in sites.items()
+    }
+
+
+# The store forked workers inherit, like `RecreationClient.history`.
+_inherited_store = None
+
+
+def _record_in_worker(site_id):
+    _inherited_store.record_month(1, JUNE, month({site_id: [1]}))
+    _inherited_store.close()
+
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "history.sqlite")
+        self.clock = FakeClock()
+        self.store = HistoryStore(self.path, now=self.clock)
+        self.addCleanup(self.store.close)
+
+    def _record(self, seen_at, sites):
+        self.clock.now = seen_at
+        self.store.record_month(1, JUNE, month(sites))
+        self.store.flush()
+
+    def testRecordMonth_RecordsChangesAfterFirstSighting(self):
+        self._record(1000, {"10": [1, 2], "11": [5]})
+        self._record(2000, {"10": [2, 3], "11": [5]})
+
+        self.assertEqual(
+            self.store.changes(1),
+            [(10, "2022-06-01", 2000, 0), (10, "2022-06-03", 2000, 1)],
+        )
+        self.assertEqual(self.store.changes(1, site_id=11), [])
+
+    def testOpeningsBySite_CountsNightsThatOpenedInRange(self):
+        self._record(1000, {"10": [], "11": []})
+        self._record(2000, {"10": [1, 2, 3], "11": [20]})
+
+        self.assertEqual(self.store.openings_by_site(1), {10: 3, 11: 1})
+        self.assertEqual(
+            self.store.openings_by_site(
+                1, start=datetime(2022, 6, 2), end=datetime(2022, 6, 20)
+            ),
+            {10: 2},
+        )
+
+    def testCompact_KeepsLatestSnapshotAndEveryChange(self):
+        self._record(1000, {"10": [1]})
+        self._record(2000, {"10": [2]})
+        self._record(3000, {"10": [3]})
+
+        self.store.compact(before=2500)
+
+        conn = self.store._conn
+        self.assertEqual(
+            conn.execute("SELECT seen_at FROM site_months ORDER BY seen_at").fetchall(),
+            [(2000,), (3000,)],
+        )
+        self.assertEqual(conn.execute("SELECT seen_at FROM polls").fetchall(), [(3000,)])
+        self.assertEqual(len(self.store.changes(1)), 4)
+
+    def testReopen_ComparesWithLastWrittenMasks(self):
+        self._record(1000, {"10": [1]})
+        self.store.close()
+        self.store = HistoryStore(self.path, now=self.clock)
+
+        self._record(2000, {"10": [1, 2]})
+
+        self.assertEqual(self.store.changes(1), [(10, "2022-06-02", 2000, 1)])
+
+    def testWriterSurvivesBadMonths(self):
+        with self.assertLogs("utils.history", "ERROR"):
+            self._record(1000, {"not a site id": [1]})
+        self._record(2000, {"10": [1]})
+        self._record(3000, {"10": [1, 2]})
+
+        self.assertEqual(self.store.changes(1), [(10, "2022-06-02", 3000, 1)])
+
+    def testForkedWorkers_OpenTheirOwnConnection(self):
+        global _inherited_store
+        _inherited_store = self.store
+
+        list(map_in_processes(_record_in_worker, ["10", "11"], 2))
+
+        self.assertIsNone(self.store._conn)
+        (sites,) = self.store._connection().execute(
+            "SELECT COUNT(*) FROM site_months"
+        ).fetchone()
+        self.assertEqual(sites, 2)
+
+    def testClient_RecordsUnfilteredMonths(self):
+        server = FakeRecreationServer(sites=5)
+        self.addCleanup(server.stop)
+        base_url = RecreationClient.BASE_URL
+        RecreationClient.BASE_URL = server.start().base_url
+        RecreationClient.history = self.store
+
+        def restore():
+            RecreationClient.BASE_URL = base_url
+            RecreationClient.history = None
+            RecreationClient.rate_limiter = RateLimiter()
+            RecreationClient.configure_session()
+
+        self.addCleanup(restore)
+
+        RecreationClient.get_availability(1, JUNE, campsite_ids=("1",))
+        self.store.flush()
+
+        (sites,) = self.store._conn.execute(
+            "SELECT COUNT(DISTINCT site_id) FROM site_months"
+        ).fetchone()
+        self.assertEqual(sites, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
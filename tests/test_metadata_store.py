@@ -0,0 +1,98 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from clients.metadata_store import MetadataStore
+
+
+class TestMetadataStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "metadata.json")
+        self.clock = 1000
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _store(self):
+        return MetadataStore(self.path, ttl=100, now=lambda: self.clock)
+
+    def testParkName_FetchesOnceThenServesFromFile(self):
+        fetched = []
+
+        def fetch(park_id):
+            fetched.append(park_id)
+            return "SOME PARK"
+
+        store = self._store()
+        self.assertEqual(store.park_name(1, fetch), "SOME PARK")
+        store.save()
+
+        store = self._store()
+        self.assertEqual(store.park_name(1, fetch), "SOME PARK")
+        self.assertEqual(fetched, [1])
+
+    def testParkName_StaleEntryRefreshedInBackground(self):
+        store = self._store()
+        store.park_name(1, lambda park_id: "OLD NAME")
+        self.clock += 101
+        refreshed = threading.Event()
+
+        def fetch(park_id):
+            refreshed.set()
+            return "NEW NAME"
+
+        # The stale name is returned straight away.
+        self.assertEqual(store.park_name(1, fetch), "OLD NAME")
+        self.assertTrue(refreshed.wait(5))
+        for thread in threading.enumerate():
+            if thread is not threading.current_thread() and thread.daemon:
+                thread.join(5)
+        self.assertEqual(store.park_name(1, fetch), "NEW NAME")
+
+    def testWaitForRefreshes_NameSavedAfterRefreshFinishes(self):
+        store = self._store()
+        store.park_name(1, lambda park_id: "OLD NAME")
+        self.clock += 101
+        release = threading.Event()
+
+        def fetch(park_id):
+            release.wait(5)
+            return "NEW NAME"
+
+        store.park_name(1, fetch)
+        threading.Timer(0.1, release.set).start()
+        store.wait_for_refreshes()
+        store.save()
+
+        self.assertEqual(self._store().get(1)["facility_name"], "NEW NAME")
+
+    def testParkName_OfflineKeepsCachedName(self):
+        store = self._store()
+        store.park_name(1, lambda park_id: "SOME PARK")
+        self.clock += 101
+
+        def offline(park_id):
+            raise ConnectionError("offline")
+
+        self.assertEqual(store.park_name(1, offline), "SOME PARK")
+
+    def testTakeChanges_MergedIntoAnotherStore(self):
+        worker = self._store()
+        worker.park_name(1, lambda park_id: "SOME PARK")
+        changes = worker.take_changes()
+        self.assertEqual(list(changes), ["1"])
+        self.assertEqual(worker.take_changes(), {})
+
+        parent = self._store()
+        parent.merge(changes)
+        parent.save()
+
+        self.assertEqual(
+            self._store().get(1)["facility_name"], "SOME PARK"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
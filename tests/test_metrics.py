@@ -0,0 +1,114 @@
+import json
+import unittest
+
+from utils.metrics import Metrics
+
+
+class FakeClock:
+    def __init__(self, *times):
+        self.times = list(times)
+
+    def __call__(self):
+        return self.times.pop(0)
+
+
+class TestMetrics(unittest.TestCase):
+    def testDisabled_RecordsNothing(self):
+        metrics = Metrics(enabled=False)
+
+        metrics.count("http_responses", status=200)
+        with metrics.timer("stage", stage="parse"):
+            pass
+
+        self.assertEqual(metrics.counters(), [])
+        self.assertEqual(metrics.timers(), [])
+        self.assertEqual(metrics.summary(), "")
+
+    def testCount_AddsUpByLabels(self):
+        metrics = Metrics()
+
+        metrics.count("http_responses", status=200)
+        metrics.count("http_responses", status=200)
+        metrics.count("http_responses", status=429)
+        metrics.count("http_response_bytes", 100)
+
+        self.assertEqual(
+            metrics.counters(),
+            [
+                (("http_response_bytes", ()), 100),
+                (("http_responses", (("status", "200"),)), 2),
+                (("http_responses", (("status", "429"),)), 1),
+            ],
+        )
+
+    def testTimer_RecordsCountTotalAndMax(self):
+        metrics = Metrics(clock=FakeClock(0.0, 0.5, 1.0, 3.0))
+
+        for _ in range(2):
+            with metrics.timer("stage", stage="fetch"):
+                pass
+
+        self.assertEqual(
+            metrics.timers(), [(("stage", (("stage", "fetch"),)), (2, 2.5, 2.0))]
+        )
+
+    def testToPrometheus(self):
+        metrics = Metrics()
+        metrics.count("cache_lookups", result="hit")
+        metrics.observe("stage", 0.25, stage="parse")
+
+        self.assertEqual(
+            metrics.to_prometheus(),
+            "# TYPE camping_cache_lookups_total counter\n"
+            'camping_cache_lookups_total{result="hit"} 1\n'
+            "# TYPE camping_stage_seconds summary\n"
+            'camping_stage_seconds_count{stage="parse"} 1\n'
+            'camping_stage_seconds_sum{stage="parse"} 0.250000\n',
+        )
+
+    def testToJson(self):
+        metrics = Metrics()
+        metrics.count("http_retries", endpoint="availability")
+        metrics.observe("stage", 0.25, stage="parse")
+
+        self.assertEqual(
+            json.loads(metrics.to_json()),
+            {
+                "counters": [
+                    {
+                        "name": "http_retries",
+                        "labels": {"endpoint": "availability"},
+                        "value": 1,
+                    }
+                ],
+                "timers": [
+                    {
+                        "name": "stage",
+                        "labels": {"stage": "parse"},
+                        "count": 1,
+                        "seconds": 0.25,
+                        "max_seconds": 0.25,
+                    }
+                ],
+            },
+        )
+
+    def testDrain_MergedIntoAnotherRegistry(self):
+        worker = Metrics()
+        worker.count("http_retries")
+        worker.observe("stage", 1.0, stage="parse")
+        parent = Metrics()
+        parent.count("http_retries")
+        parent.observe("stage", 3.0, stage="parse")
+
+        parent.merge(worker.drain())
+
+        self.assertEqual(worker.counters(), [])
+        self.assertEqual(parent.counters(), [(("http_retries", ()), 2)])
+        self.assertEqual(
+            parent.timers(), [(("stage", (("stage", "parse"),)), (2, 4.0, 3.0))]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,36 @@
+import io
+import json
+import os
+import tempfile
 import unittest
 
 import camping
 import notifier
 from utils.camping_argparser import CampingArgumentParser
 
+PARK_INFO = (
+    2,
+    3,
+    {
+        18621: [{"start": "2022-06-22", "end": "2022-06-23"}],
+        18654: [{"start": "2022-06-22", "end": "2022-06-24"}],
+    },
+    "SOME PARK",
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FailingBackend:
+    def send(self, recipient, message):
+        raise RuntimeError("no route to {}".format(recipient))
+
 
 class TestNotifier(unittest.TestCase):
 
@@ -66,6 +93,145 @@ class TestNotifier(unittest.TestCase):
         ]
         self.assertEqual(expected, availability_strings)
 
+    def testParseResults_StreamedLines(self):
+        line, _ = camping.generate_park_json_output(1000, PARK_INFO)
+        summary = camping.generate_summary_output(True, 1, json_output=True)
+
+        hits = notifier.parse_results([line + "\n", summary + "\n"])
+
+        self.assertEqual(
+            hits,
+            [
+                notifier.Hit("1000", "SOME PARK", "18621", "2022-06-22", "2022-06-23"),
+                notifier.Hit("1000", "SOME PARK", "18654", "2022-06-22", "2022-06-24"),
+            ],
+        )
+
+    def testParseResults_JsonOutputAndChanges(self):
+        output, _ = camping.generate_json_output({1000: PARK_INFO})
+        changes, _ = camping.generate_json_changes_output(
+            {2000: ({5: [{"start": "2022-07-01", "end": "2022-07-02"}]}, {}, "X")}
+        )
+
+        self.assertEqual(
+            notifier.parse_results([output]),
+            [
+                notifier.Hit("1000", "SOME PARK", "18621", "2022-06-22", "2022-06-23"),
+                notifier.Hit("1000", "SOME PARK", "18654", "2022-06-22", "2022-06-24"),
+            ],
+        )
+        self.assertEqual(
+            notifier.parse_results([changes]),
+            [notifier.Hit("2000", "X", "5", "2022-07-01", "2022-07-02")],
+        )
+        self.assertIsNone(notifier.parse_results(["There are no campsites :("]))
+
+    def testPendingMessages_OneMessagePerRecipientAndDeduped(self):
+        clock = FakeClock()
+        state = notifier.NotifierState(None, expiry=60, now=clock)
+        first, _ = camping.generate_park_json_output(1000, PARK_INFO)
+        second, _ = camping.generate_park_json_output(
+            2000, (1, 1, {7: [{"start": "2022-06-22", "end": "2022-06-23"}]}, "B")
+        )
+
+        messages = notifier.pending_messages([first, second], ["a", "b"], state)
+        self.assertEqual(sorted(messages), ["a", "b"])
+        message, keys = messages["a"]
+        self.assertIn("2 site(s) available in SOME PARK (1000)", message)
+        self.assertIn("1 site(s) available in B (2000)", message)
+        self.assertEqual(len(keys), 3)
+
+        state.mark("a", keys)
+        self.assertEqual(
+            sorted(notifier.pending_messages([first], ["a", "b"], state)), ["b"]
+        )
+        clock.now += 60
+        self.assertIn("a", notifier.pending_messages([first], ["a"], state))
+
+    def testGenerateHitStrings_ListsDateRangesPerPark(self):
+        hits = [
+            notifier.Hit("1", "A", str(site), "2022-06-{:02d}".format(day), "2022-06-30")
+            for site in (1, 2)
+            for day in (24, 20, 22, 23)
+        ]
+
+        self.assertEqual(
+            notifier.generate_hit_strings(hits),
+            [
+                "2 site(s) available in A (1): 2022-06-20 -> 2022-06-30, "
+                "2022-06-22 -> 2022-06-30, 2022-06-23 -> 2022-06-30 and 1 more"
+            ],
+        )
+
+    def testPendingMessages_HumanOutputKeepsSearchedDates(self):
+        output, _ = camping.generate_human_output(
+            {1000: PARK_INFO},
+            CampingArgumentParser.TypeConverter.date("2022-06-22"),
+            CampingArgumentParser.TypeConverter.date("2022-06-24"),
+        )
+
+        message, _ = notifier.pending_messages(
+            output.splitlines(), ["a"], notifier.NotifierState(None)
+        )["a"]
+
+        self.assertIn("available from 2022-06-22 to 2022-06-24", message)
+        self.assertIn("SOME PARK", message)
+
+    def testNotify_MarksOnlyRecipientsReached(self):
+        state = notifier.NotifierState(None, now=FakeClock())
+        line, _ = camping.generate_park_json_output(1000, PARK_INFO)
+        messages = notifier.pending_messages([line], ["a"], state)
+        stream = io.StringIO()
+
+        self.assertEqual(notifier.notify(FailingBackend(), messages, state), 0)
+        self.assertEqual(
+            notifier.notify(notifier.StdoutBackend(stream=stream), messages, state), 1
+        )
+
+        self.assertIn("To a:", stream.getvalue())
+        self.assertEqual(notifier.pending_messages([line], ["a"], state), {})
+
+    def testNotifierState_SavesOnlyUnexpiredKeys(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "state.json")
+        clock = FakeClock()
+        state = notifier.NotifierState(path, expiry=60, now=clock)
+        state.mark("a", ["old"])
+        clock.now += 30
+        state.mark("a", ["new"])
+        clock.now += 40
+
+        state.save()
+
+        with open(path) as f:
+            self.assertEqual(json.load(f), {"a": {"new": 1090.0}})
+        self.assertFalse(notifier.NotifierState(path, now=clock).is_new("a", "new"))
+
+    def testPendingMessages_EmptyInputIsBroken(self):
+        state = notifier.NotifierState(None)
+
+        messages = notifier.pending_messages([], ["a"], state)
+
+        self.assertEqual(messages["a"][1], [notifier.BROKEN_KEY])
+
+    def testPendingMessages_FailedParksAreBroken(self):
+        state = notifier.NotifierState(None)
+        line, _ = camping.generate_park_json_output(1000, PARK_INFO)
+        error = (
+            "2022-06-22 10:00:00,000 - 123 - ERROR - Something went wrong checking "
+            "park 2000: Connection refused"
+        )
+
+        message, keys = notifier.pending_messages([line, error], ["a"], state)["a"]
+        self.assertIn("SOME PARK (1000)", message)
+        self.assertIn(notifier.BROKEN_MESSAGE, message)
+        self.assertIn(notifier.BROKEN_KEY, keys)
+
+        message, keys = notifier.pending_messages([error], ["a"], state)["a"]
+        self.assertEqual(message, notifier.BROKEN_MESSAGE)
+        self.assertEqual(keys, [notifier.BROKEN_KEY])
+
 
 if __name__ == "__main__":
     unittest.main()
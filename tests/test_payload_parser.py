@@ -0,0 +1,74 @@
+import json
+import unittest
+
+from clients.payload_parser import filter_month, parse_month
+
+
+def site(campsite_id, campsite_type="STANDARD NONELECTRIC"):
+    return {
+        "availabilities": {
+            "2022-06-01T00:00:00Z": "Reserved",
+            "2022-06-02T00:00:00Z": "Available",
+            "2022-06-03T00:00:00Z": "Not Reservable",
+        },
+        "campsite_id": campsite_id,
+        "campsite_type": campsite_type,
+        "loop": "A",
+        "quantities": None,
+    }
+
+
+BODY = json.dumps(
+    {
+        "campsites": {
+            "10": site("10"),
+            "11": site("11", "GROUP STANDARD NONELECTRIC"),
+            "12": site("12"),
+        },
+        "count": 3,
+    }
+).encode("utf-8")
+
+
+class TestPayloadParser(unittest.TestCase):
+    def testParseMonth_KeepsOnlyAvailableDates(self):
+        data = parse_month(BODY)
+
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(
+            data["campsites"]["10"]["availabilities"],
+            {"2022-06-02T00:00:00Z": "Available"},
+        )
+        self.assertEqual(data["campsites"]["10"]["loop"], "A")
+
+    def testFilterMonth_DropsExcludedAndEmptiesUnwantedSites(self):
+        data = filter_month(
+            parse_month(BODY),
+            campsite_type="STANDARD NONELECTRIC",
+            excluded_site_ids=["12"],
+        )
+
+        self.assertEqual(sorted(data["campsites"]), ["10", "11"])
+        self.assertEqual(data["campsites"]["11"]["availabilities"], {})
+        self.assertEqual(
+            data["campsites"]["10"]["availabilities"],
+            {"2022-06-02T00:00:00Z": "Available"},
+        )
+
+    def testFilterMonth_CampsiteIds(self):
+        data = filter_month(parse_month(BODY), campsite_ids=[12])
+
+        self.assertEqual(data["campsites"]["10"]["availabilities"], {})
+        self.assertEqual(len(data["campsites"]["12"]["availabilities"]), 1)
+
+    def testFilterMonth_LeavesMonthAsItIs(self):
+        month = parse_month(BODY)
+
+        filter_month(month, excluded_site_ids=["12"], campsite_ids=[10])
+
+        self.assertEqual(month, parse_month(BODY))
+        self.assertIs(filter_month(month), month)
+
+
+if __name__ == "__main__":
+    unittest.main()
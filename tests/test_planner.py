@@ -0,0 +1,79 @@
+import unittest
+from datetime import date, datetime
+
+from utils.planner import months_ahead, needed_nights, plan_months
+
+WEEKEND_DAYS = (4, 5)
+
+
+def months(*numbers):
+    return [datetime(2022, n, 1) for n in numbers]
+
+
+class TestPlanner(unittest.TestCase):
+    def testPlanMonths_EveryMonthWithoutToday(self):
+        self.assertEqual(
+            plan_months(datetime(2022, 6, 20), datetime(2022, 8, 2), nights=2),
+            months(6, 7, 8),
+        )
+
+    def testPlanMonths_SkipsMonthsAlreadyPast(self):
+        self.assertEqual(
+            plan_months(
+                datetime(2022, 6, 10),
+                datetime(2022, 9, 1),
+                nights=1,
+                today=date(2022, 7, 15),
+            ),
+            months(7, 8),
+        )
+
+    def testPlanMonths_SkipsMonthsNoStayCanTouch(self):
+        # Mon 27 June to Mon 4 July: the only weekend is Fri 1 and Sat 2 July.
+        start, end = datetime(2022, 6, 27), datetime(2022, 7, 4)
+
+        self.assertEqual(plan_months(start, end, nights=2), months(6, 7))
+        self.assertEqual(
+            plan_months(start, end, nights=2, weekdays=WEEKEND_DAYS), months(7)
+        )
+        self.assertEqual(plan_months(start, end, nights=3, weekdays=WEEKEND_DAYS), [])
+
+    def testPlanMonths_WholeWindowStayPartlyPast(self):
+        self.assertEqual(
+            plan_months(
+                datetime(2022, 6, 25), datetime(2022, 7, 5), today=date(2022, 7, 2)
+            ),
+            [],
+        )
+
+    def testPlanMonths_NearestToTodayFirst(self):
+        self.assertEqual(
+            plan_months(
+                datetime(2022, 7, 1),
+                datetime(2022, 10, 1),
+                nights=1,
+                today=date(2022, 8, 1),
+            ),
+            # July 31st is kept in case the park is a day behind.
+            months(8, 7, 9),
+        )
+
+    def testNeededNights_OnlyNightsOfPossibleStays(self):
+        # Fri 1 July to Sun 10 July, weekends only: Fri, Sat and Fri, Sat.
+        needed = needed_nights(
+            datetime(2022, 7, 1), datetime(2022, 7, 10), nights=2, weekdays=WEEKEND_DAYS
+        )
+
+        self.assertEqual(needed, 0b110000011)
+        self.assertEqual(
+            needed_nights(datetime(2022, 7, 1), datetime(2022, 7, 9), nights=2),
+            0b11111111,
+        )
+
+    def testMonthsAhead(self):
+        self.assertEqual(months_ahead(date(2022, 11, 30), datetime(2023, 1, 1)), 2)
+        self.assertEqual(months_ahead(date(2022, 6, 1), datetime(2022, 5, 1)), -1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from clients.rate_limiter import CAMPGROUND_ENDPOINT, RateLimiter, TokenBucket
+from clients.recreation_client import RecreationClient
+from utils.metrics import Metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """
+    Answers each request with the next (status, headers) in `script`, then
+    200 with a campground once the script runs out. A status of None stalls
+    for a second before answering with a 200.
+    """
+
+    script = []
+    requests = 0
+
+    def do_GET(self):
+        ScriptedHandler.requests += 1
+        status, headers = self.script.pop(0) if self.script else (200, {})
+        if status is None:
+            time.sleep(1)
+            status = 200
+        body = json.dumps({"campground": {"facility_name": "FAKE PARK"}})
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTokenBucket(unittest.TestCase):
+    def testAcquire_WaitsForTokensBeyondBurst(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, burst=2, clock=clock, sleep=clock.sleep)
+
+        for _ in range(4):
+            bucket.acquire()
+
+        self.assertEqual(clock.slept, [0.5, 0.5])
+
+    def testPenalize_HalvesRateAndPauses(self):
+        clock = FakeClock()
+        bucket = TokenBucket(4, burst=1, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+
+        bucket.penalize(pause=3)
+        bucket.acquire()
+
+        self.assertEqual(bucket.rate, 2)
+        # The pause, then half a second for a token at the halved rate.
+        self.assertEqual(clock.slept, [3.5])
+
+    def testReward_RecoversTowardsConfiguredRate(self):
+        bucket = TokenBucket(4)
+        bucket.penalize()
+        bucket.penalize()
+        for _ in range(100):
+            bucket.reward()
+
+        self.assertEqual(bucket.rate, 4)
+
+
+class TestRecreationClientRetries(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = "http://127.0.0.1:{}/api/camps/campgrounds/1".format(
+            cls.server.server_address[1]
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        ScriptedHandler.requests = 0
+        self.backoff_base = RecreationClient.backoff_base
+        RecreationClient.backoff_base = 0.001
+        RecreationClient.rate_limiter = RateLimiter()
+
+    def tearDown(self):
+        RecreationClient.backoff_base = self.backoff_base
+        RecreationClient.rate_limiter = RateLimiter()
+
+    def testGet_RetriesServerErrorsThenSucceeds(self):
+        ScriptedHandler.script = [(503, {"Retry-After": "0"}), (500, {})]
+
+        resp = RecreationClient._send_request(self.url, {}, CAMPGROUND_ENDPOINT)
+
+        self.assertEqual(resp["campground"]["facility_name"], "FAKE PARK")
+        self.assertEqual(ScriptedHandler.requests, 3)
+
+    def testGet_TooManyRequestsSlowsTheEndpointDown(self):
+        ScriptedHandler.script = [(429, {"Retry-After": "0.01"})]
+        bucket = RecreationClient.rate_limiter.bucket(CAMPGROUND_ENDPOINT)
+
+        RecreationClient._send_request(self.url, {}, CAMPGROUND_ENDPOINT)
+
+        self.assertLess(bucket.rate, bucket.max_rate)
+
+    def testGet_RetriesStalledRequests(self):
+        ScriptedHandler.script = [(None, {})]
+        timeout = RecreationClient.timeout
+        RecreationClient.timeout = (1, 0.2)
+        self.addCleanup(setattr, RecreationClient, "timeout", timeout)
+
+        resp = RecreationClient._send_request(self.url, {}, CAMPGROUND_ENDPOINT)
+
+        self.assertEqual(resp["campground"]["facility_name"], "FAKE PARK")
+        self.assertEqual(ScriptedHandler.requests, 2)
+
+    def testGet_GivesUpAfterMaxRetries(self):
+        ScriptedHandler.script = [(500, {})] * (RecreationClient.max_retries + 1)
+
+        with self.assertRaises(RuntimeError):
+            RecreationClient._send_request(self.url, {}, CAMPGROUND_ENDPOINT)
+        self.assertEqual(
+            ScriptedHandler.requests, RecreationClient.max_retries + 1
+        )
+
+    def testGet_RecordsMetrics(self):
+        ScriptedHandler.script = [(503, {"Retry-After": "0"})]
+        RecreationClient.metrics = Metrics()
+        try:
+            RecreationClient._send_request(self.url, {}, CAMPGROUND_ENDPOINT)
+            counters = dict(RecreationClient.metrics.counters())
+        finally:
+            RecreationClient.metrics = Metrics(enabled=False)
+
+        labels = (("endpoint", CAMPGROUND_ENDPOINT),)
+        self.assertEqual(counters[("http_retries", labels)], 1)
+        self.assertEqual(
+            counters[("http_responses", labels + (("status", "503"),))], 1
+        )
+        self.assertEqual(
+            counters[("http_responses", labels + (("status", "200"),))], 1
+        )
+        self.assertGreater(counters[("http_response_bytes", labels)], 0)
+
+    def testRetryAfter_SecondsOrHttpDate(self):
+        class Resp:
+            def __init__(self, value):
+                self.headers = {"Retry-After": value}
+
+        self.assertEqual(RecreationClient._retry_after(Resp("7")), 7)
+        self.assertEqual(
+            RecreationClient._retry_after(Resp("Wed, 21 Oct 2015 07:28:00 GMT")),
+            0,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import unittest
+from datetime import datetime
+
+from benchmarks.fake_server import FakeRecreationServer
+from clients.rate_limiter import AVAILABILITY_ENDPOINT, RateLimiter
+from clients.recreation_client import RecreationClient
+from utils.fetcher import fetch_all
+from utils.metrics import Metrics
+from utils.singleflight import Memo
+from utils.site_index import SiteFilter
+
+JUNE = datetime(2030, 6, 1)
+
+
+class TestRecreationClient(unittest.TestCase):
+    def tearDown(self):
+        RecreationClient.configure_session()
+
+    def testGetSession_SharedAcrossCalls(self):
+        self.assertIs(
+            RecreationClient._get_session(), RecreationClient._get_session()
+        )
+
+    def testConfigureSession_ReplacesSessionWithNewPoolSize(self):
+        before = RecreationClient._get_session()
+        RecreationClient.configure_session(pool_maxsize=16)
+        after = RecreationClient._get_session()
+
+        self.assertIsNot(before, after)
+        adapter = after.get_adapter(RecreationClient.BASE_URL)
+        self.assertEqual(adapter._pool_maxsize, 16)
+        self.assertIn("gzip", after.headers["Accept-Encoding"])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestGetAvailability(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRecreationServer(sites=5, latency=0.2)
+        self.addCleanup(self.server.stop)
+        base_url = RecreationClient.BASE_URL
+        RecreationClient.BASE_URL = self.server.start().base_url
+
+        def restore():
+            RecreationClient.BASE_URL = base_url
+            RecreationClient.memo = None
+            RecreationClient.rate_limiter = RateLimiter()
+            RecreationClient.configure_session()
+
+        self.addCleanup(restore)
+
+    def requests_sent(self):
+        return self.server.stats.get(("availability", 200), 0)
+
+    def testSendRequest_CountsBytesReceived(self):
+        RecreationClient.metrics = Metrics()
+        self.addCleanup(
+            setattr, RecreationClient, "metrics", Metrics(enabled=False)
+        )
+        url = RecreationClient.BASE_URL + "/api/camps/availability/campground/1/month"
+
+        resp = RecreationClient._get(
+            url, {"start_date": "2030-06-01T00:00:00.000Z"}, AVAILABILITY_ENDPOINT
+        )
+
+        received = dict(RecreationClient.metrics.counters())[
+            ("http_response_bytes", (("endpoint", AVAILABILITY_ENDPOINT),))
+        ]
+        # The fake server gzips its responses.
+        self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+        self.assertEqual(received, int(resp.headers["Content-Length"]))
+        self.assertLess(received, len(resp.content))
+
+    def testConcurrentCallers_ShareOneFetch(self):
+        filters = [None, SiteFilter(excluded_site_ids=["1"]), SiteFilter(people=2)]
+        results = fetch_all(
+            lambda site_filter: RecreationClient.get_availability(
+                1, JUNE, site_filter=site_filter
+            ),
+            filters * 3,
+            max_workers=9,
+        )
+
+        self.assertTrue(all(r.error is None for r in results))
+        self.assertEqual(self.requests_sent(), 1)
+        self.assertEqual(len(results[0].value["campsites"]), 5)
+
+    def testMemo_KeepsMonthsUntilTheyExpire(self):
+        clock = FakeClock()
+        RecreationClient.memo = Memo(ttl=60, max_entries=10, now=clock)
+
+        first = RecreationClient.get_availability(1, JUNE)
+        second = RecreationClient.get_availability(1, JUNE)
+        self.assertEqual(self.requests_sent(), 1)
+        self.assertEqual(first, second)
+
+        clock.now += 60
+        RecreationClient.get_availability(1, JUNE)
+        self.assertEqual(self.requests_sent(), 2)
+
+    def testGetAvailabilityAsync_CoroutinesShareOneFetch(self):
+        async def fetch():
+            return await asyncio.gather(
+                *(RecreationClient.get_availability_async(1, JUNE) for _ in range(5)),
+                asyncio.get_running_loop().run_in_executor(
+                    None, RecreationClient.get_availability, 1, JUNE
+                ),
+            )
+
+        months = asyncio.run(fetch())
+
+        self.assertEqual(self.requests_sent(), 1)
+        self.assertTrue(all(month == months[0] for month in months))
+
+
+if __name__ == "__main__":
+    unittest.main()
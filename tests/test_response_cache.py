@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from clients.recreation_client import RecreationClient
+from clients.response_cache import ResponseCache
+
+JULY = datetime(2022, 7, 1)
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.text = body.decode("utf-8")
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = time.mktime(datetime(2022, 6, 15).timetuple())
+        self.cache = ResponseCache(
+            self.tmp.name, ttls=(60, 600, 3600), now=lambda: self.clock
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        RecreationClient.cache = None
+
+    def testTtlFor_ShorterForMonthsCloseToToday(self):
+        self.assertEqual(self.cache.ttl_for(datetime(2022, 6, 1)), 60)
+        self.assertEqual(self.cache.ttl_for(datetime(2022, 7, 1)), 600)
+        self.assertEqual(self.cache.ttl_for(datetime(2023, 1, 1)), 3600)
+
+    def testGet_ReturnsStoredEntryUntilItExpires(self):
+        self.cache.put(1, JULY, b'{"campsites": {}}', etag='"abc"')
+
+        entry = self.cache.get(1, JULY)
+        self.assertEqual(entry.body, b'{"campsites": {}}')
+        self.assertTrue(entry.is_fresh(self.clock))
+        self.assertFalse(entry.is_fresh(self.clock + 601))
+        self.assertEqual(entry.conditional_headers(), {"If-None-Match": '"abc"'})
+        self.assertIsNone(self.cache.get(2, JULY))
+
+    def testGet_EntryEvictedWhileReadingIsAMiss(self):
+        self.cache.put(1, JULY, b'{"campsites": {}}')
+
+        with mock.patch("os.utime", side_effect=FileNotFoundError):
+            self.assertIsNone(self.cache.get(1, JULY))
+
+    def testPut_EvictsLeastRecentlyUsedOverMaxBytes(self):
+        self.cache.max_bytes = 25
+        self.cache.put(1, JULY, b"x" * 10)
+        self.cache.put(2, JULY, b"x" * 10)
+        # Make park 1 the most recently used.
+        os.utime(self.cache._path(2, JULY, ".json"), (0, 0))
+        self.cache.get(1, JULY)
+
+        self.cache.put(3, JULY, b"x" * 10)
+
+        self.assertIsNotNone(self.cache.get(1, JULY))
+        self.assertIsNone(self.cache.get(2, JULY))
+        self.assertIsNotNone(self.cache.get(3, JULY))
+
+    def testGetAvailability_RevalidatesExpiredEntry(self):
+        RecreationClient.cache = self.cache
+        body = b'{"campsites": {"1": {}}}'
+        fresh = FakeResponse(200, body, {"ETag": '"v1"'})
+        not_modified = FakeResponse(304)
+
+        with mock.patch.object(
+            RecreationClient, "_get", side_effect=[fresh, not_modified]
+        ) as get:
+            first = RecreationClient.get_availability(1, JULY)
+            # Served from the cache without a request.
+            second = RecreationClient.get_availability(1, JULY)
+            self.clock += 601
+            third = RecreationClient.get_availability(1, JULY)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, third)
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(get.call_args[0][3], {"If-None-Match": '"v1"'})
+
+
+if __name__ == "__main__":
+    unittest.main()
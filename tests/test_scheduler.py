@@ -0,0 +1,78 @@
+import itertools
+import unittest
+from datetime import date, datetime
+
+from utils.scheduler import PollScheduler
+
+JUNE = datetime(2022, 6, 1)
+JULY = datetime(2022, 7, 1)
+DECEMBER = datetime(2022, 12, 1)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestPollScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def _scheduler(self, **kwargs):
+        kwargs.setdefault("jitter", 0)
+        return PollScheduler(
+            clock=self.clock,
+            sleep=self.clock.sleep,
+            today=lambda: date(2022, 6, 15),
+            **kwargs
+        )
+
+    def testIntervalFor_ParkThenMonthThenDefault(self):
+        scheduler = self._scheduler(
+            poll_interval=300,
+            park_intervals={2: 30},
+            month_intervals=(60, 120),
+        )
+
+        self.assertEqual(scheduler.interval_for(1, JUNE), 60)
+        self.assertEqual(scheduler.interval_for(1, JULY), 120)
+        self.assertEqual(scheduler.interval_for(1, DECEMBER), 120)
+        self.assertEqual(scheduler.interval_for(2, JUNE), 30)
+        self.assertEqual(self._scheduler().interval_for(1, JUNE), 300)
+
+    def testWait_PollsNearMonthsMoreOften(self):
+        scheduler = self._scheduler(month_intervals=(60, 180))
+        scheduler.add(1, JUNE)
+        scheduler.add(1, JULY)
+
+        polls = [scheduler.wait() for _ in range(4)]
+
+        self.assertEqual(polls[0], [(1, JUNE), (1, JULY)])
+        self.assertEqual(polls[1], [(1, JUNE)])
+        self.assertEqual(polls[2], [(1, JUNE)])
+        self.assertEqual(polls[3], [(1, JUNE), (1, JULY)])
+        self.assertEqual(self.clock.now, 180)
+
+    def testWait_JitterSpreadsPolls(self):
+        rolls = itertools.cycle([0.0, 1.0])
+        scheduler = self._scheduler(
+            poll_interval=100, jitter=0.1, rng=lambda: next(rolls)
+        )
+        scheduler.add(1, JUNE)
+        scheduler.add(2, JUNE)
+        scheduler.wait()
+
+        self.assertEqual(scheduler.wait(), [(1, JUNE)])
+        self.assertAlmostEqual(self.clock.now, 90)
+        self.assertEqual(scheduler.wait(), [(2, JUNE)])
+        self.assertAlmostEqual(self.clock.now, 110)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from datetime import datetime
+
+import requests
+
+from benchmarks.fake_server import FakeRecreationServer
+from clients.rate_limiter import RateLimiter
+from clients.recreation_client import RecreationClient
+from service import QueryError, QueryServer, QueryService, parse_query
+from utils.availability_index import AvailabilityIndex
+from utils.fetcher import fetch_all
+from utils.site_index import SiteFilter
+
+CHECK = "/check?park_id=1&start_date=2030-06-03&end_date=2030-06-07&nights=2"
+
+
+class TestParseQuery(unittest.TestCase):
+    def testParseQuery_DatesAndFilters(self):
+        query = parse_query(
+            {
+                "start_date": ["2030-06-03"],
+                "end_date": ["2030-06-07"],
+                "nights": ["2"],
+                "weekends_only": ["true"],
+                "loops": ["A,B", "C"],
+                "people": ["4"],
+            }
+        )
+
+        self.assertEqual(query.start_date, datetime(2030, 6, 3))
+        self.assertEqual(query.nights, 2)
+        self.assertTrue(query.weekends_only)
+        self.assertEqual(query.site_filter, SiteFilter(loops=["A", "B", "C"], people=4))
+
+    def testParseQuery_BadQueries(self):
+        for params in (
+            {"start_date": ["2030-06-03"]},
+            {"start_date": ["2030-06-03"], "end_date": ["June"]},
+            {"start_date": ["2030-06-03"], "end_date": ["2030-06-01"]},
+            {"start_date": ["2030-06-03"], "end_date": ["2030-06-07"], "nights": ["0"]},
+        ):
+            with self.assertRaises(QueryError):
+                parse_query(params)
+
+
+class TestQueryServer(unittest.TestCase):
+    def setUp(self):
+        upstream = FakeRecreationServer(sites=5, latency=0.2)
+        self.addCleanup(upstream.stop)
+        base_url = RecreationClient.BASE_URL
+        RecreationClient.BASE_URL = upstream.start().base_url
+        RecreationClient.availability_index = AvailabilityIndex()
+        self.upstream = upstream
+
+        def restore():
+            RecreationClient.BASE_URL = base_url
+            RecreationClient.availability_index = None
+            RecreationClient.rate_limiter = RateLimiter()
+            RecreationClient.configure_session()
+
+        self.addCleanup(restore)
+        server = QueryServer(QueryService(), port=0).start()
+        self.addCleanup(server.stop)
+        self.base_url = server.base_url
+
+    def testCheck_IdenticalQueriesFetchOnce(self):
+        results = fetch_all(
+            lambda _: requests.get(self.base_url + CHECK).json(),
+            range(10),
+            max_workers=10,
+        )
+        answers = [r.value for r in results]
+
+        self.assertEqual(answers[0]["park_name"], "FAKE PARK 1")
+        self.assertEqual(answers[0]["maximum"], 5)
+        self.assertTrue(all(answer == answers[0] for answer in answers))
+        self.assertEqual(
+            self.upstream.stats, {("availability", 200): 1, ("campground", 200): 1}
+        )
+
+    def testSearch_AnswersFromWhatWasFetched(self):
+        self.assertEqual(
+            requests.get(self.base_url + CHECK.replace("/check", "/search")).json(),
+            {},
+        )
+
+        check = requests.get(self.base_url + CHECK).json()
+        search = requests.get(self.base_url + CHECK.replace("/check", "/search")).json()
+
+        self.assertEqual(search.get("1", {}), check["availabilities"])
+
+    def testErrors(self):
+        resp = requests.get(self.base_url + "/check?park_id=1&start_date=2030-06-03")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("end_date", resp.json()["error"])
+        self.assertEqual(requests.get(self.base_url + "/nope").status_code, 404)
+        self.assertEqual(
+            requests.get(self.base_url + "/health").json()["status"], "ok"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import threading
+import time
+import unittest
+
+from utils.singleflight import Memo, SingleFlight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSingleFlight(unittest.TestCase):
+    def testDo_ConcurrentCallersShareOneCall(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow(value):
+            calls.append(value)
+            started.set()
+            release.wait(5)
+            return value * 2
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do("k", slow, 21)))
+            for _ in range(5)
+        ]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        # Long enough for the others to be waiting on the first call.
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(calls, [21])
+        self.assertEqual(results, [42] * 5)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def testDo_ErrorsAreShared(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise RuntimeError("nope")
+
+        with self.assertRaises(RuntimeError):
+            flight.do("k", fail)
+        # Nothing is kept once the call is done.
+        self.assertEqual(flight.do("k", lambda: 1), 1)
+
+
+class TestMemo(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.memo = Memo(ttl=60, max_entries=2, now=self.clock)
+
+    def testGet_ExpiresAfterTtl(self):
+        self.memo.put("a", 1)
+        self.clock.now += 59
+        self.assertEqual(self.memo.get("a"), 1)
+        self.clock.now += 1
+        self.assertIsNone(self.memo.get("a"))
+        self.assertEqual(len(self.memo), 0)
+
+    def testPut_EvictsLeastRecentlyUsed(self):
+        self.memo.put("a", 1)
+        self.memo.put("b", 2)
+        self.memo.get("a")
+        self.memo.put("c", 3)
+
+        self.assertEqual(self.memo.get("a"), 1)
+        self.assertIsNone(self.memo.get("b"))
+        self.assertEqual(self.memo.get("c"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
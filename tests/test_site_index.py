@@ -0,0 +1,130 @@
+import json
+import unittest
+from datetime import datetime
+
+from benchmarks.generators import generate_month
+from clients.payload_parser import filter_month, parse_month
+from utils.site_index import SiteFilter, SiteIndex
+
+
+def site(campsite_id, loop="A", max_num_people=6, reserve_type="Site-Specific"):
+    return {
+        "availabilities": {},
+        "campsite_id": campsite_id,
+        "campsite_reserve_type": reserve_type,
+        "campsite_type": "STANDARD NONELECTRIC",
+        "capacity_rating": "Single",
+        "loop": loop,
+        "max_num_people": max_num_people,
+        "min_num_people": 1,
+        "type_of_use": "Overnight",
+    }
+
+
+CAMPSITES = {
+    "1": site("1", loop="A", max_num_people=8),
+    "2": site("2", loop="B", max_num_people=4),
+    "3": site("3", loop="B", max_num_people=6, reserve_type="Non Site-Specific"),
+    "4": site("4", loop="C", max_num_people=12),
+}
+
+
+class TestSiteFilter(unittest.TestCase):
+    def testWants_EveryCriterionMustMatch(self):
+        site_filter = SiteFilter(
+            loops=["A", "B"], people=6, reserve_types=["Site-Specific"]
+        )
+
+        self.assertEqual(
+            [i for i, s in sorted(CAMPSITES.items()) if site_filter.wants(s)],
+            ["1"],
+        )
+
+    def testAnd_CombinesCriteria(self):
+        combined = SiteFilter(loops=["A", "B"], campsite_ids=[1, 2]) & SiteFilter(
+            loops=["B", "C"], excluded_site_ids=["2"], people=3
+        )
+
+        self.assertEqual(combined.allowed, {"loop": frozenset(["B"])})
+        self.assertEqual(combined.campsite_ids, frozenset(["1", "2"]))
+        self.assertTrue(combined.excludes("2"))
+        self.assertEqual(combined.people, 3)
+
+    def testAnd_DisjointCampsiteIdsMatchNothing(self):
+        combined = SiteFilter(campsite_ids=[1]) & SiteFilter(campsite_ids=[2])
+
+        self.assertTrue(combined.matches_nothing)
+        self.assertTrue(combined)
+        self.assertEqual(combined.allowed, {})
+        self.assertFalse(any(combined.wants(s) for s in CAMPSITES.values()))
+        self.assertEqual(SiteIndex(CAMPSITES).select(combined), frozenset())
+        self.assertTrue((combined & SiteFilter(loops=["A"])).matches_nothing)
+
+    def testBuild_FromOlderArguments(self):
+        self.assertFalse(SiteFilter.build())
+        self.assertEqual(
+            SiteFilter.build("STANDARD NONELECTRIC", [4], ["1"]),
+            SiteFilter(
+                campsite_types=["STANDARD NONELECTRIC"],
+                campsite_ids=["4"],
+                excluded_site_ids=[1],
+            ),
+        )
+
+
+class TestSiteIndex(unittest.TestCase):
+    def testSelect_SameAsCheckingEverySite(self):
+        campsites = generate_month(1, datetime(2022, 6, 1), 200)["campsites"]
+        index = SiteIndex(campsites)
+        site_filter = SiteFilter(
+            loops=["A", "B"],
+            people=6,
+            reserve_types=["Site-Specific"],
+            excluded_site_ids=list(campsites)[::5],
+        )
+
+        self.assertEqual(
+            index.select(site_filter),
+            {
+                campsite_id
+                for campsite_id, campsite_data in campsites.items()
+                if not site_filter.excludes(campsite_id)
+                and site_filter.wants(campsite_data)
+            },
+        )
+
+    def testResolve_UpdatedWhenNewSitesTurnUp(self):
+        index = SiteIndex({"1": CAMPSITES["1"]})
+        site_filter = SiteFilter(loops=["C"])
+
+        self.assertEqual(index.resolve(site_filter), {"1": False})
+        index.update(CAMPSITES)
+
+        self.assertEqual(index.select(site_filter), {"4"})
+
+    def testResolve_UpdatedWhenASiteChanges(self):
+        index = SiteIndex(CAMPSITES)
+        site_filter = SiteFilter(loops=["A"], people=8)
+        self.assertEqual(index.select(site_filter), {"1"})
+
+        index.update({"1": site("1", loop="A", max_num_people=4)})
+        index.update({"2": site("2", loop="A", max_num_people=8)})
+
+        self.assertEqual(index.select(site_filter), {"2"})
+        self.assertEqual(index.select(SiteFilter(loops=["B"])), {"3"})
+
+    def testFilterMonth_SameWithIndex(self):
+        month = generate_month(1, datetime(2022, 6, 1), 50)
+        parsed = parse_month(json.dumps(month).encode("utf-8"))
+        site_filter = SiteFilter(loops=["A"], people=8)
+        # Only some of the sites are known, the rest are checked one by one.
+        index = SiteIndex(dict(list(month["campsites"].items())[:25]))
+
+        self.assertEqual(
+            filter_month(parsed, site_filter=site_filter, index=index),
+            filter_month(parsed, site_filter=site_filter),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
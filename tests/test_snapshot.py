@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from utils.availability import SiteBitmaps
+from utils.snapshot import SnapshotStore
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def testDiff_FirstSnapshotIsAllOpened(self):
+        store = SnapshotStore()
+        bitmaps = SiteBitmaps(date(2022, 6, 1), {"1": 0b0110, "2": 0})
+
+        opened, closed = store.diff(1, bitmaps, 0b1111)
+
+        self.assertEqual(opened, {"1": 0b0110})
+        self.assertEqual(closed, {})
+
+    def testDiff_OnlyChangesInsideWindow(self):
+        store = SnapshotStore()
+        store.diff(1, SiteBitmaps(date(2022, 6, 1), {"1": 0b0011, "2": 0b1}), 0b1111)
+
+        opened, closed = store.diff(
+            1, SiteBitmaps(date(2022, 6, 1), {"1": 0b11100110, "2": 0b1}), 0b1111
+        )
+
+        self.assertEqual(opened, {"1": 0b0100})
+        self.assertEqual(closed, {"1": 0b0001})
+
+    def testDiff_AlignsSnapshotsWithDifferentOrigins(self):
+        store = SnapshotStore()
+        store.diff(1, SiteBitmaps(date(2022, 6, 2), {"1": 0b11}), 0b111)
+
+        # The same two nights, seen from a day earlier.
+        opened, closed = store.diff(
+            1, SiteBitmaps(date(2022, 6, 1), {"1": 0b110}), 0b111
+        )
+
+        self.assertEqual((opened, closed), ({}, {}))
+
+    def testSave_SnapshotsCarryOverBetweenRuns(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "snapshots.json")
+            store = SnapshotStore(path)
+            store.diff(1, SiteBitmaps(date(2022, 6, 1), {"1": 0b11}), 0b11)
+            store.save()
+
+            opened, closed = SnapshotStore(path).diff(
+                1, SiteBitmaps(date(2022, 6, 1), {"1": 0b10}), 0b11
+            )
+
+        self.assertEqual((opened, closed), ({}, {"1": 0b01}))
+
+
+if __name__ == "__main__":
+    unittest.main()
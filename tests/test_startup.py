@@ -0,0 +1,31 @@
+import unittest
+
+from benchmarks.bench_startup import LAZY_MODULES, import_times
+
+
+class TestStartup(unittest.TestCase):
+    def assertNothingLazyImported(self, times):
+        self.assertIn("utils.camping_argparser", times)
+        self.assertEqual(
+            [m for m in times if m.split(".")[0] in LAZY_MODULES], []
+        )
+
+    def testImportCamping_SkipsSlowImports(self):
+        self.assertNothingLazyImported(import_times())
+
+    def testHelp_SkipsSlowImports(self):
+        self.assertNothingLazyImported(import_times(["camping.py", "--help"]))
+
+    def testImportCamping_NoUserAgentGenerated(self):
+        times = import_times(
+            [
+                "-c",
+                "import camping; "
+                "assert camping.RecreationClient.headers is None",
+            ]
+        )
+        self.assertNothingLazyImported(times)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import os
+import unittest
+
+from utils.workers import chunks, map_in_processes, shard
+
+
+def _pid_and_sum(batch):
+    return os.getpid(), sum(batch)
+
+
+class TestWorkers(unittest.TestCase):
+    def testShard_StableAcrossRuns(self):
+        # A CRC, not `hash`, so every machine agrees.
+        self.assertEqual(shard([232448, 232450, 232447], 0, 2), [232448])
+
+    def testChunks(self):
+        self.assertEqual(chunks(range(5), 2), [[0, 1], [2, 3], [4]])
+
+    def testMapInProcesses_YieldsEveryBatchWithItsIndex(self):
+        batches = chunks(range(10), 3)
+
+        results = dict(map_in_processes(_pid_and_sum, batches, 2))
+
+        self.assertEqual(
+            [results[i][1] for i in range(len(batches))], [3, 12, 21, 9]
+        )
+        self.assertNotIn(os.getpid(), [pid for pid, _ in results.values()])
+
+
+if __name__ == "__main__":
+    unittest.main()
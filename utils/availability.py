@@ -0,0 +1,276 @@
+from datetime import date, timedelta
+
+
+class SiteBitmaps(dict):
+    """
+    Availability for every site in a park, as {<campsite_id>: <bitmask>}.
+
+    Bit i of a site's bitmask is set if the site is available on the night of
+    `origin + i days`. This makes filtering by date a bitwise AND and finding
+    runs of consecutive nights a handful of shifts, instead of parsing and
+    comparing date strings over and over.
+    """
+
+    def __init__(self, origin, masks=()):
+        super().__init__(masks)
+        self.origin = origin
+
+    @classmethod
+    def from_date_lists(cls, park_information):
+        """
+        Converts {<campsite_id>: [<ISO 8601 date string>, ...]} into bitmaps.
+        """
+        days = {
+            campsite_id: [parse_date(d) for d in dates]
+            for campsite_id, dates in park_information.items()
+        }
+        all_days = [d for ds in days.values() for d in ds]
+        origin = min(all_days) if all_days else date.today()
+        bitmaps = cls(origin)
+        for campsite_id, ds in days.items():
+            mask = 0
+            for d in ds:
+                mask |= 1 << (d - origin).days
+            bitmaps[campsite_id] = mask
+        return bitmaps
+
+    def to_date_lists(self):
+        return {
+            campsite_id: [
+                (self.origin + timedelta(days=offset)).isoformat()
+                for offset in iter_bits(mask)
+            ]
+            for campsite_id, mask in self.items()
+        }
+
+
+def as_date(d):
+    """
+    Drops the time from a datetime, leaving dates alone.
+    """
+    return date(d.year, d.month, d.day)
+
+
+def parse_date(date_string):
+    """
+    Parses the date out of an API date string such as
+    "2022-06-22T00:00:00Z". This is much quicker than `strptime`.
+    """
+    return date(
+        int(date_string[0:4]), int(date_string[5:7]), int(date_string[8:10])
+    )
+
+
+def month_mask(availabilities):
+    """
+    A bitmask of the "Available" nights in a site's availabilities for one
+    month, bit i being the night of day i + 1.
+    """
+    mask = 0
+    for date_string, value in availabilities.items():
+        if value == "Available":
+            mask |= 1 << (int(date_string[8:10]) - 1)
+    return mask
+
+
+def range_mask(first, last):
+    """
+    A bitmask with bits [first, last) set. Negative offsets are ignored.
+    """
+    first = max(first, 0)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def weekday_mask(origin, length, weekdays):
+    """
+    A bitmask of the first `length` days from `origin`, with the bits set for
+    days whose `weekday()` is in `weekdays`.
+    """
+    week = 0
+    for i in range(7):
+        if (origin.weekday() + i) % 7 in weekdays:
+            week |= 1 << i
+    mask = 0
+    for start in range(0, length, 7):
+        mask |= week << start
+    return mask & range_mask(0, length)
+
+
+def run_starts(mask, nights):
+    """
+    Returns a bitmask with bit i set if bits i to i + nights - 1 are all set
+    in `mask`, i.e. the offsets you could start a stay of `nights` nights on.
+
+    Each step doubles the length of the runs we know about, so this takes
+    log2(nights) shifts rather than `nights`.
+    """
+    result = mask
+    covered = 1
+    while covered < nights and result:
+        step = min(covered, nights - covered)
+        result &= result >> step
+        covered += step
+    return result
+
+
+def run_cover(starts, nights):
+    """
+    The opposite of `run_starts`: returns a bitmask of every night used by
+    a stay of `nights` nights starting on one of the offsets in `starts`.
+    """
+    result = starts
+    covered = 1
+    while covered < nights and result:
+        step = min(covered, nights - covered)
+        result |= result << step
+        covered += step
+    return result
+
+
+def run_touches(mask, nights):
+    """
+    Returns a bitmask with bit i set if any of bits i to i + nights - 1 is
+    set in `mask`, i.e. the offsets a stay of `nights` nights could start
+    on to include one of the nights in `mask`.
+    """
+    result = mask
+    covered = 1
+    while covered < nights and result:
+        step = min(covered, nights - covered)
+        result |= result >> step
+        covered += step
+    return result
+
+
+def iter_bits(mask):
+    """
+    Yields the offsets of the set bits in `mask`, lowest first.
+    """
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+class AvailabilityMatrix:
+    """
+    A sites x days matrix of availability over a window of `width` days,
+    packed into a single integer so that an operation on it applies to every
+    site at once.
+
+    Row r holds site `site_ids[r]` in bits [r * stride, r * stride + width),
+    where bit c of the row is the night of `window start + c days`. `stride`
+    leaves at least one always-clear bit between rows, so a run of nights can
+    never carry over from one site into the next. It's also a whole number of
+    bytes, so packing and unpacking rows is just slicing bytes.
+    """
+
+    def __init__(self, site_ids, packed, width):
+        self.site_ids = site_ids
+        self.packed = packed
+        self.width = width
+        self.stride = _stride_for(width)
+
+    @classmethod
+    def from_bitmaps(cls, bitmaps, first, last):
+        """
+        Takes the days [first, last) (as offsets from `bitmaps.origin`) of
+        every site in a `SiteBitmaps`.
+        """
+        width = max(last - first, 0)
+        row_mask = range_mask(0, width)
+        site_ids = list(bitmaps)
+        rows = [
+            (mask >> first if first >= 0 else mask << -first) & row_mask
+            for mask in bitmaps.values()
+        ]
+        return cls(site_ids, _pack(rows, _stride_for(width)), width)
+
+    def broadcast(self, row):
+        """
+        Repeats a single row for every site, e.g. to AND a mask of allowed
+        days into every site at once.
+        """
+        row_bytes = (row & range_mask(0, self.width)).to_bytes(
+            self.stride // 8, "little"
+        )
+        return int.from_bytes(row_bytes * len(self.site_ids), "little")
+
+    def run_starts(self, nights, allowed=None):
+        """
+        Returns a packed matrix of the same shape with a bit set for every
+        (site, day) you could start a stay of `nights` consecutive nights on.
+        `allowed` is an optional row of the nights that may be used.
+        """
+        packed = self.packed
+        if allowed is not None:
+            packed &= self.broadcast(allowed)
+        return run_starts(packed, nights)
+
+    def rows(self, packed):
+        """
+        Unpacks a matrix into (site_id, row) pairs, skipping empty rows.
+        """
+        row_bytes = self.stride // 8
+        data = packed.to_bytes(row_bytes * len(self.site_ids), "little")
+        for r, site_id in enumerate(self.site_ids):
+            row = int.from_bytes(
+                data[r * row_bytes : (r + 1) * row_bytes], "little"
+            )
+            if row:
+                yield site_id, row
+
+    def start_offsets(self, nights, allowed=None):
+        """
+        Returns {<site_id>: [<offset>, ...]} of every day (as an offset from
+        the window start) each site could start a stay of `nights` nights.
+        """
+        return {
+            site_id: list(iter_bits(row))
+            for site_id, row in self.rows(self.run_starts(nights, allowed))
+        }
+
+
+def _stride_for(width):
+    # At least one guard bit, rounded up to whole bytes.
+    return (width // 8 + 1) * 8
+
+
+def _pack(rows, stride):
+    row_bytes = stride // 8
+    return int.from_bytes(
+        b"".join(row.to_bytes(row_bytes, "little") for row in rows), "little"
+    )
+
+
+def runs(mask):
+    """
+    Yields (offset, length) for each run of consecutive set bits in `mask`,
+    lowest first.
+    """
+    offset = 0
+    while mask:
+        skip = (mask & -mask).bit_length() - 1
+        mask >>= skip
+        offset += skip
+        # Adding 1 to a run of ones carries all the way past it.
+        length = ((mask + 1) & -(mask + 1)).bit_length() - 1
+        yield offset, length
+        mask >>= length
+        offset += length
+
+
+def date_ranges(origin, mask):
+    """
+    Turns the nights set in `mask` into [{"start": ..., "end": ...}] date
+    ranges, where "end" is the morning you leave like everywhere else.
+    """
+    return [
+        {
+            "start": (origin + timedelta(days=offset)).isoformat(),
+            "end": (origin + timedelta(days=offset + length)).isoformat(),
+        }
+        for offset, length in runs(mask)
+    ]
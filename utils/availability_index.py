@@ -0,0 +1,346 @@
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date
+
+from utils.availability import (
+    AvailabilityMatrix,
+    SiteBitmaps,
+    as_date,
+    iter_bits,
+    month_mask,
+)
+from utils.calendar_mask import calendar_mask
+from utils.planner import month_starts, plan_months
+from utils.singleflight import Memo
+from utils.site_index import SiteIndex, site_attributes
+
+LOG = logging.getLogger(__name__)
+
+# How long, and how many of, the results of `search` are kept. They're
+# dropped whenever a month is recorded anyway.
+SEARCH_TTL = 5 * 60
+MAX_SEARCHES = 256
+
+
+class AvailabilityIndex:
+    """
+    The latest availability of every (park, month) fetched, so searches
+    like "any 2 nights in the next 60 days at these 100 parks" can be
+    answered from it in milliseconds, without going back to recreation.gov.
+
+    For each park it keeps the name, each site's details (for
+    `SiteFilter`s) and, for each month, when it was fetched and each
+    site's available nights as a bitmask (bit i is day i + 1). Recording
+    a month replaces what was there, so the index is always as fresh as
+    the last fetch.
+
+    If `path` is given the index is read from it when created and written
+    back with `save`, as JSON.
+    """
+
+    def __init__(self, path=None, now=time.time):
+        self.path = path
+        self.now = now
+        self._lock = threading.Lock()
+        # {<park_id>: {"name": <name>, "sites": {<site_id>: <details>},
+        #  "months": {"YYYY-MM": {"fetched_at": <time>,
+        #  "masks": {<site_id>: <mask>}}}}}
+        self._parks = {}
+        self._site_indexes = {}
+        # Results of `search`, until a month is recorded.
+        self._searches = Memo(SEARCH_TTL, MAX_SEARCHES)
+        # Parks changed since the last `take_changes`, and since the last
+        # `save`.
+        self._changed = set()
+        self._unsaved = False
+        if path is not None:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                parks = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            LOG.warning(
+                "Ignoring unreadable availability index {}: {}".format(self.path, e)
+            )
+            return
+        for park in parks.values():
+            for month in park["months"].values():
+                month["masks"] = {
+                    site_id: int(mask, 16) for site_id, mask in month["masks"].items()
+                }
+        self._parks = parks
+
+    def __contains__(self, park_id):
+        return str(park_id) in self._parks
+
+    def record_month(self, park_id, month_date, campsites):
+        """
+        Replaces the index's copy of a month with `campsites` (as parsed by
+        `parse_month`, without filters).
+        """
+        masks = {
+            campsite_id: month_mask(campsite_data["availabilities"])
+            for campsite_id, campsite_data in campsites.items()
+        }
+        with self._lock:
+            park = self._park(park_id)
+            sites = park["sites"]
+            changed = False
+            for campsite_id, campsite_data in campsites.items():
+                attributes = site_attributes(campsite_data)
+                if sites.get(campsite_id) != attributes:
+                    sites[campsite_id] = attributes
+                    changed = True
+            if changed:
+                self._site_indexes.pop(str(park_id), None)
+            park["months"][_month_key(month_date)] = {
+                "fetched_at": self.now(),
+                "masks": masks,
+            }
+            self._mark_changed(park_id)
+
+    def record_park_name(self, park_id, name):
+        with self._lock:
+            park = self._park(park_id)
+            if park.get("name") != name:
+                park["name"] = name
+                self._mark_changed(park_id)
+
+    def park_name(self, park_id):
+        with self._lock:
+            return self._parks.get(str(park_id), {}).get("name")
+
+    def _park(self, park_id):
+        # Called with the lock held.
+        return self._parks.setdefault(str(park_id), {"sites": {}, "months": {}})
+
+    def _mark_changed(self, park_id):
+        # Called with the lock held.
+        self._changed.add(str(park_id))
+        self._unsaved = True
+        self._searches.clear()
+
+    def fetched_at(self, park_id, month_date):
+        """
+        When the index's copy of a month was fetched, or None if it hasn't
+        got one.
+        """
+        with self._lock:
+            park = self._parks.get(str(park_id), {"months": {}})
+            month = park["months"].get(_month_key(month_date))
+            return None if month is None else month["fetched_at"]
+
+    def month(self, park_id, month_date):
+        """
+        The index's copy of a month, like `parse_month` would give for it
+        without filters (just the "Available" dates and the details sites
+        are filtered on), or None if it hasn't got one.
+        """
+        with self._lock:
+            park = self._parks.get(str(park_id), {"months": {}})
+            entry = park["months"].get(_month_key(month_date))
+            if entry is None:
+                return None
+            campsites = {}
+            for campsite_id, mask in entry["masks"].items():
+                campsite_data = dict(park["sites"].get(campsite_id, {}))
+                campsite_data["campsite_id"] = campsite_id
+                campsite_data["availabilities"] = {
+                    "{:04d}-{:02d}-{:02d}T00:00:00Z".format(
+                        month_date.year, month_date.month, bit + 1
+                    ): "Available"
+                    for bit in iter_bits(mask)
+                }
+                campsites[campsite_id] = campsite_data
+            return {"campsites": campsites}
+
+    def _park_bitmaps(self, park_id, months, origin, site_filter):
+        """
+        The park's `SiteBitmaps` from `origin` over `months`, like
+        `get_park_information` would give for them, except that months
+        that aren't in the index have nothing available. Returns None if
+        none of them are.
+        """
+        # Called with the lock held.
+        park = self._parks.get(park_id)
+        if park is None:
+            return None
+        entries = [(m, park["months"].get(_month_key(m))) for m in months]
+        entries = [(m, entry) for m, entry in entries if entry is not None]
+        if not entries:
+            return None
+        if len(entries) < len(months):
+            LOG.debug(
+                "Park {} only has {} of the {} months searched".format(
+                    park_id, len(entries), len(months)
+                )
+            )
+
+        resolved = {}
+        if site_filter:
+            site_index = self._site_indexes.get(park_id)
+            if site_index is None:
+                site_index = self._site_indexes[park_id] = SiteIndex(park["sites"])
+            resolved = site_index.resolve(site_filter)
+
+        bitmaps = SiteBitmaps(origin)
+        for month_date, entry in entries:
+            offset = (as_date(month_date) - origin).days
+            for campsite_id, mask in entry["masks"].items():
+                if site_filter and site_filter.excludes(campsite_id):
+                    continue
+                bits = bitmaps.setdefault(campsite_id, 0)
+                if resolved.get(campsite_id, True):
+                    bitmaps[campsite_id] = bits | (mask << offset)
+        return bitmaps
+
+    def search(
+        self,
+        start_date,
+        end_date,
+        nights=None,
+        park_ids=None,
+        site_filter=None,
+        weekdays=None,
+        check_in_days=None,
+        must_include=None,
+    ):
+        """
+        Every stay of `nights` consecutive nights from `start_date` to
+        `end_date` at the parks in the index, or just `park_ids`, with the
+        constraints of a `CalendarMask` (nights on `weekdays`, starting on
+        one of `check_in_days`, including a night on one of
+        `must_include`). Returns {<park_id>: {<site_id>: [{"start": ...,
+        "end": ...}, ...]}}, leaving out parks without any. Nights in
+        months that haven't been fetched for a park count as unavailable.
+
+        Every site of every park goes into one `AvailabilityMatrix`, so
+        the stays are all found in one pass. Results are kept for a while
+        (see `SEARCH_TTL` and `MAX_SEARCHES`), until the next month is
+        recorded.
+        """
+        calendar = calendar_mask(
+            start_date,
+            end_date,
+            nights,
+            None if weekdays is None else tuple(sorted(set(weekdays))),
+            _days(check_in_days),
+            _days(must_include),
+        )
+        if park_ids is not None:
+            park_ids = tuple(sorted(str(p) for p in park_ids))
+        key = (
+            start_date,
+            end_date,
+            calendar.nights,
+            calendar.allowed,
+            calendar.check_ins,
+            park_ids,
+            site_filter,
+        )
+        with self._lock:
+            result = self._searches.get(key)
+            if result is None:
+                result = self._search(
+                    start_date, end_date, calendar, park_ids, site_filter
+                )
+                self._searches.put(key, result)
+            return result
+
+    def _search(self, start_date, end_date, calendar, park_ids, site_filter):
+        # Called with the lock held.
+        origin = as_date(month_starts(start_date, end_date)[0])
+        months = plan_months(
+            start_date,
+            end_date,
+            today=date.fromtimestamp(self.now()),
+            calendar=calendar,
+        )
+        rows = SiteBitmaps(origin)
+        for park_id in park_ids or sorted(self._parks):
+            bitmaps = self._park_bitmaps(park_id, months, origin, site_filter)
+            if bitmaps is None:
+                continue
+            for campsite_id, mask in bitmaps.items():
+                if mask:
+                    rows[(park_id, campsite_id)] = mask
+
+        first = (calendar.start - origin).days
+        matrix = AvailabilityMatrix.from_bitmaps(
+            rows, first, first + calendar.num_days
+        )
+        result = {}
+        for (park_id, campsite_id), starts in matrix.rows(
+            calendar.matrix_starts(matrix)
+        ):
+            result.setdefault(park_id, {})[campsite_id] = [
+                {"start": start, "end": end} for start, end in calendar.ranges(starts)
+            ]
+        return result
+
+    def take_changes(self):
+        """
+        Returns {<park_id>: <entry>} for every park changed since the last
+        call, e.g. so a worker process can hand what it fetched to the
+        parent to `merge` and save.
+        """
+        with self._lock:
+            changes = {
+                park_id: copy.deepcopy(self._parks[park_id])
+                for park_id in self._changed
+            }
+            self._changed = set()
+        return changes
+
+    def merge(self, changes):
+        with self._lock:
+            for park_id, park in changes.items():
+                self._parks[park_id] = park
+                self._site_indexes.pop(park_id, None)
+                self._mark_changed(park_id)
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._unsaved:
+                return
+            data = json.dumps(
+                {
+                    park_id: dict(
+                        park,
+                        months={
+                            key: dict(
+                                month,
+                                masks={
+                                    site_id: format(mask, "x")
+                                    for site_id, mask in month["masks"].items()
+                                },
+                            )
+                            for key, month in park["months"].items()
+                        },
+                    )
+                    for park_id, park in self._parks.items()
+                }
+            )
+            self._unsaved = False
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+
+def _days(weekdays):
+    return tuple(sorted(set(weekdays))) if weekdays else None
+
+
+def _month_key(month_date):
+    return "{:04d}-{:02d}".format(month_date.year, month_date.month)
@@ -0,0 +1,156 @@
+import functools
+from datetime import timedelta
+
+from utils.availability import (
+    as_date,
+    iter_bits,
+    range_mask,
+    run_cover,
+    run_starts,
+    run_touches,
+    weekday_mask,
+)
+
+# Accepted by `parse_weekday`, in `date.weekday()` order.
+WEEKDAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+class CalendarMask:
+    """
+    The stays a search allows, as bitmasks over its window, bit i being the
+    night of `start + i days`:
+
+    - `allowed` is the nights a stay may use, e.g. only the nights on
+      `weekdays`, or in one of `windows` (a list of (start, end) dates, like
+      a holiday weekend).
+    - `check_ins` is the days a stay may start on: one of `check_in_days`,
+      and such that the stay includes a night on one of `must_include`.
+
+    Both only depend on the search, so they're worked out once for it (see
+    `calendar_mask`) and checking every site of a park is one pass over its
+    `AvailabilityMatrix`, however many constraints there are.
+
+    `nights` works like it does in `get_num_available_sites`, a missing or
+    out of range value meaning the whole window. A `weekdays` of None means
+    every day, but an empty one means none.
+    """
+
+    def __init__(
+        self,
+        start_date,
+        end_date,
+        nights=None,
+        weekdays=None,
+        check_in_days=None,
+        must_include=None,
+        windows=(),
+    ):
+        self.start = as_date(start_date)
+        self.num_days = max((end_date - start_date).days, 0)
+        if nights not in range(1, self.num_days + 1):
+            nights = self.num_days
+        self.nights = nights
+
+        allowed = range_mask(0, self.num_days)
+        if weekdays is not None:
+            allowed &= self.weekday_mask(weekdays)
+        if windows:
+            allowed &= functools.reduce(
+                lambda mask, window: mask | self.window_mask(*window), windows, 0
+            )
+        self.allowed = allowed
+
+        check_ins = range_mask(0, self.num_days)
+        if check_in_days:
+            check_ins &= self.weekday_mask(check_in_days)
+        if must_include:
+            check_ins &= run_touches(self.weekday_mask(must_include), nights)
+        self.check_ins = check_ins
+
+        # Every range starts and ends on a day in the window, so each of
+        # those is formatted once up front. `date.isoformat` is the same as
+        # DateFormat.INPUT_DATE_FORMAT, but a lot quicker than strftime.
+        self.labels = [
+            (self.start + timedelta(days=offset)).isoformat()
+            for offset in range(self.num_days + 1)
+        ]
+
+    def weekday_mask(self, weekdays):
+        return weekday_mask(self.start, self.num_days, weekdays)
+
+    def window_mask(self, start_date, end_date):
+        """
+        The nights from `start_date` up to, but not including, `end_date`.
+        """
+        return range_mask(
+            (as_date(start_date) - self.start).days,
+            min((as_date(end_date) - self.start).days, self.num_days),
+        )
+
+    def starts(self, available):
+        """
+        The days a stay can start on, given a bitmask of the nights
+        available (relative to `start`).
+        """
+        return run_starts(available & self.allowed, self.nights) & self.check_ins
+
+    def matrix_starts(self, matrix):
+        """
+        `starts` for every site at once, as a packed matrix of the same
+        shape as `matrix`, which must cover the window.
+        """
+        return matrix.run_starts(self.nights, self.allowed) & matrix.broadcast(
+            self.check_ins
+        )
+
+    def stay_nights(self, available=None):
+        """
+        Every night that's part of a stay that could be reported, given the
+        nights available (every night in the window by default).
+        """
+        if available is None:
+            available = range_mask(0, self.num_days)
+        return run_cover(self.starts(available), self.nights)
+
+    def ranges(self, starts):
+        """
+        (<start>, <end>) date strings for each stay in a row of `starts`.
+        """
+        return [
+            (self.labels[offset], self.labels[offset + self.nights])
+            for offset in iter_bits(starts)
+        ]
+
+
+@functools.lru_cache(maxsize=256)
+def calendar_mask(
+    start_date,
+    end_date,
+    nights=None,
+    weekdays=None,
+    check_in_days=None,
+    must_include=None,
+    windows=(),
+):
+    """
+    A `CalendarMask` shared by everything checking the same search. The
+    arguments must be hashable, so tuples rather than lists.
+    """
+    return CalendarMask(
+        start_date, end_date, nights, weekdays, check_in_days, must_include, windows
+    )
+
+
+def parse_weekday(value):
+    """
+    A day of the week, as a name like "sat" or "Saturday" or as a number
+    (0 is Monday, like `date.weekday()`).
+    """
+    value = str(value).strip().lower()
+    if value.isdigit() and int(value) < len(WEEKDAY_NAMES):
+        return int(value)
+    if len(value) >= 3:
+        for weekday, name in enumerate(WEEKDAY_NAMES):
+            if value.startswith(name):
+                return weekday
+    raise ValueError("Not a day of the week: '{}'".format(value))
@@ -1,9 +1,27 @@
 import argparse
 import logging
+import shlex
 import sys
 from datetime import datetime
 
+from clients.rate_limiter import DEFAULT_RATES
+from clients.recreation_client import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_MEMO_SIZE,
+    DEFAULT_MEMO_TTL,
+    DEFAULT_READ_TIMEOUT,
+    RecreationClient,
+)
+from clients.response_cache import DEFAULT_MAX_BYTES
 from enums.date_format import DateFormat
+from utils.calendar_mask import parse_weekday
+from utils.fetcher import DEFAULT_MAX_IN_FLIGHT, DEFAULT_MAX_PER_HOST
+from utils.scheduler import DEFAULT_JITTER, DEFAULT_POLL_INTERVAL
+from utils.workers import shard
+
+
+DEFAULT_BASE_URL = RecreationClient.BASE_URL
 
 
 class CampingArgumentParser(argparse.ArgumentParser):
@@ -14,13 +32,11 @@ class CampingArgumentParser(argparse.ArgumentParser):
         )
         self.add_argument(
             "--start-date",
-            required=True,
             help="Start date [YYYY-MM-DD]",
             type=self.TypeConverter.date,
         )
         self.add_argument(
             "--end-date",
-            required=True,
             help="End date [YYYY-MM-DD]. You expect to leave this day, not stay the night.",
             type=self.TypeConverter.date,
         )
@@ -48,12 +64,43 @@ class CampingArgumentParser(argparse.ArgumentParser):
                 '"STANDARD NONELECTRIC" or TODO'
             ),
         )
+        self.add_argument(
+            "--loops",
+            nargs="+",
+            default=(),
+            help="Only check sites in one of these loops, e.g. A B",
+        )
+        self.add_argument(
+            "--people",
+            type=self.TypeConverter.positive_int,
+            help=(
+                "Only check sites that allow a group of this many people"
+            ),
+        )
+        self.add_argument(
+            "--reserve-types",
+            nargs="+",
+            default=(),
+            help='Only check sites with one of these reserve types, e.g. "Site-Specific"',
+        )
+        self.add_argument(
+            "--types-of-use",
+            nargs="+",
+            default=(),
+            help='Only check sites with one of these types of use, e.g. "Overnight"',
+        )
+        self.add_argument(
+            "--capacity-ratings",
+            nargs="+",
+            default=(),
+            help='Only check sites with one of these capacity ratings, e.g. "Single"',
+        )
         self.add_argument(
             "--json-output",
             action="store_true",
             help=(
                 "This make the script output JSON instead of human readable "
-                "output. Note, this is incompatible with the twitter notifier. "
+                "output, which is what the twitter notifier reads. "
                 "This output includes more precise information, such as the exact "
                 "available dates and which sites are available."
             ),
@@ -65,13 +112,313 @@ class CampingArgumentParser(argparse.ArgumentParser):
                 "Include only weekends (i.e. starting Friday or Saturday)"
             ),
         )
+        self.add_argument(
+            "--weekdays",
+            nargs="+",
+            default=(),
+            help=(
+                "Only use the nights of these days of the week, e.g. "
+                "fri sat sun. Combined with --weekends-only, only the nights "
+                "in both count."
+            ),
+            type=self.TypeConverter.weekday,
+        )
+        self.add_argument(
+            "--check-in-days",
+            nargs="+",
+            default=(),
+            help="Only report stays starting on these days, e.g. fri",
+            type=self.TypeConverter.weekday,
+        )
+        self.add_argument(
+            "--must-include",
+            nargs="+",
+            default=(),
+            help=(
+                "Only report stays including a night on one of these days, "
+                "e.g. sat"
+            ),
+            type=self.TypeConverter.weekday,
+        )
         self.add_argument(
             "--exclusion-file",
             help=(
                 "File with site IDs to exclude"
             ),
         )
-        parks_group = self.add_mutually_exclusive_group(required=True)
+        self.add_argument(
+            "--base-url",
+            default=DEFAULT_BASE_URL,
+            help=(
+                "Where to send requests (default {}), e.g. a local "
+                "benchmarks.fake_server for testing.".format(DEFAULT_BASE_URL)
+            ),
+        )
+        self.add_argument(
+            "--max-concurrency",
+            default=DEFAULT_MAX_IN_FLIGHT,
+            help=(
+                "Maximum number of requests in flight at once "
+                "(default {}).".format(DEFAULT_MAX_IN_FLIGHT)
+            ),
+            type=self.TypeConverter.positive_int,
+        )
+        self.add_argument(
+            "--max-per-host",
+            default=DEFAULT_MAX_PER_HOST,
+            help=(
+                "Maximum number of requests in flight at once to a single "
+                "host (default {}).".format(DEFAULT_MAX_PER_HOST)
+            ),
+            type=self.TypeConverter.positive_int,
+        )
+        self.add_argument(
+            "--rate-limit",
+            dest="rate_limits",
+            metavar="ENDPOINT=RATE",
+            nargs="+",
+            default=(),
+            help=(
+                "Requests per second allowed to each endpoint, one of {} "
+                "(default {}). The rate drops automatically when "
+                "recreation.gov pushes back.".format(
+                    ", ".join(sorted(DEFAULT_RATES)),
+                    ", ".join(
+                        "{}={}".format(k, v) for k, v in sorted(DEFAULT_RATES.items())
+                    ),
+                )
+            ),
+            type=self.TypeConverter.endpoint_rate,
+        )
+        self.add_argument(
+            "--max-retries",
+            default=DEFAULT_MAX_RETRIES,
+            help=(
+                "Times to retry a request that failed with a connection "
+                "error, 429 or 5xx (default {}).".format(DEFAULT_MAX_RETRIES)
+            ),
+            type=self.TypeConverter.non_negative_int,
+        )
+        self.add_argument(
+            "--connect-timeout",
+            default=DEFAULT_CONNECT_TIMEOUT,
+            help=(
+                "Seconds to wait for a connection before retrying the "
+                "request (default {}).".format(DEFAULT_CONNECT_TIMEOUT)
+            ),
+            type=self.TypeConverter.positive_float,
+        )
+        self.add_argument(
+            "--read-timeout",
+            default=DEFAULT_READ_TIMEOUT,
+            help=(
+                "Seconds to wait for the server to send anything before "
+                "retrying the request (default {}).".format(DEFAULT_READ_TIMEOUT)
+            ),
+            type=self.TypeConverter.positive_float,
+        )
+        self.add_argument(
+            "--cache-dir",
+            help=(
+                "Optional, directory to cache availability responses in "
+                "between runs. Months close to today are kept for less time "
+                "than months far in the future."
+            ),
+        )
+        self.add_argument(
+            "--cache-max-bytes",
+            default=DEFAULT_MAX_BYTES,
+            help=(
+                "Size the cache is trimmed to, least recently used entries "
+                "first (default {}).".format(DEFAULT_MAX_BYTES)
+            ),
+            type=self.TypeConverter.positive_int,
+        )
+        self.add_argument(
+            "--memo-ttl",
+            default=DEFAULT_MEMO_TTL,
+            help=(
+                "Seconds to keep each month fetched in memory for, so "
+                "searches needing it again don't fetch it again (default {}, "
+                "0 to turn it off). Not used with --watch, where every poll "
+                "fetches.".format(DEFAULT_MEMO_TTL)
+            ),
+            type=self.TypeConverter.non_negative_int,
+        )
+        self.add_argument(
+            "--memo-size",
+            default=DEFAULT_MEMO_SIZE,
+            help=(
+                "Most months to keep in memory at once (default {}).".format(
+                    DEFAULT_MEMO_SIZE
+                )
+            ),
+            type=self.TypeConverter.positive_int,
+        )
+        self.add_argument(
+            "--metadata-file",
+            help=(
+                "Optional, JSON file to keep park names in between runs, so "
+                "they are only looked up once a week."
+            ),
+        )
+        self.add_argument(
+            "--history-db",
+            help=(
+                "Optional, SQLite file to record every month fetched in, and "
+                "every night that opened up or was taken. See history.py for "
+                "what you can do with it."
+            ),
+        )
+        self.add_argument(
+            "--availability-index",
+            help=(
+                "Optional, JSON file to keep the latest availability of every "
+                "park and month fetched in, so searches can be answered from "
+                "it with --offline."
+            ),
+        )
+        self.add_argument(
+            "--offline",
+            action="store_true",
+            help=(
+                "Answer from --availability-index without sending any "
+                "requests. Parks and months missing from it are reported "
+                "as errors."
+            ),
+        )
+        self.add_argument(
+            "--watch",
+            action="store_true",
+            help=(
+                "Keep running and poll the parks on a schedule instead of "
+                "checking once, printing results every time something is "
+                "polled. Use instead of running this from cron."
+            ),
+        )
+        self.add_argument(
+            "--poll-interval",
+            default=DEFAULT_POLL_INTERVAL,
+            help=(
+                "With --watch, seconds between polls of each park/month "
+                "(default {}).".format(DEFAULT_POLL_INTERVAL)
+            ),
+            type=self.TypeConverter.positive_int,
+        )
+        self.add_argument(
+            "--month-intervals",
+            metavar="SECONDS",
+            nargs="+",
+            default=(),
+            help=(
+                "With --watch, poll intervals by how many months ahead the "
+                "month is, e.g. '60 300 900' polls this month every minute, "
+                "next month every 5 minutes and later months every 15."
+            ),
+            type=self.TypeConverter.positive_int,
+        )
+        self.add_argument(
+            "--park-interval",
+            dest="park_intervals",
+            metavar="PARK_ID=SECONDS",
+            nargs="+",
+            default=(),
+            help=(
+                "With --watch, poll interval for specific parks. Takes "
+                "precedence over --month-intervals."
+            ),
+            type=self.TypeConverter.park_interval,
+        )
+        self.add_argument(
+            "--jitter",
+            default=DEFAULT_JITTER,
+            help=(
+                "With --watch, randomly vary each poll interval by up to "
+                "this fraction of it (default {}).".format(DEFAULT_JITTER)
+            ),
+            type=self.TypeConverter.jitter,
+        )
+        self.add_argument(
+            "--incremental",
+            action="store_true",
+            help=(
+                "Only output the nights that opened up or were taken since "
+                "the last check. Use with --snapshot-file, or --watch."
+            ),
+        )
+        self.add_argument(
+            "--snapshot-file",
+            help=(
+                "With --incremental, JSON file to keep the last availability "
+                "seen in between runs."
+            ),
+        )
+        self.add_argument(
+            "--queries",
+            help=(
+                "File of searches to run, one per line, each written as the "
+                "arguments you would give this script (e.g. '--start-date "
+                "2022-06-01 --end-date 2022-06-05 --parks 232448 --nights 2'). "
+                "Each park/month is only fetched once, however many searches "
+                "need it."
+            ),
+        )
+        self.add_argument(
+            "--stream",
+            action="store_true",
+            help=(
+                "Print each park as soon as it has been checked, rather than "
+                "everything at the end, then a summary line. With "
+                "--json-output each park is a line of JSON (NDJSON), and so "
+                "is the summary. Parks are printed in the order they finish."
+            ),
+        )
+        self.add_argument(
+            "--processes",
+            default=1,
+            help=(
+                "Number of processes to split the parks between (default 1). "
+                "Each has its own connections and up to --max-concurrency "
+                "requests in flight, while the rate limits are shared out "
+                "between them. Doesn't apply to --watch or --queries."
+            ),
+            type=self.TypeConverter.positive_int,
+        )
+        self.add_argument(
+            "--shard",
+            metavar="INDEX/COUNT",
+            help=(
+                "Only check the parks in shard INDEX (from 0) of COUNT, e.g. "
+                "to split one list of parks between machines, each run with "
+                "the same parks and its own INDEX."
+            ),
+            type=self.TypeConverter.shard,
+        )
+        self.add_argument(
+            "--profile",
+            action="store_true",
+            help=(
+                "Print how long each stage and request took, with status "
+                "codes, bytes received, cache hits and retries, to stderr "
+                "when done."
+            ),
+        )
+        self.add_argument(
+            "--metrics-file",
+            help=(
+                "Optional, file to write the same metrics as --profile to. "
+                "With --watch it is rewritten after every poll, e.g. for "
+                "Prometheus' node exporter textfile collector."
+            ),
+        )
+        self.add_argument(
+            "--metrics-format",
+            choices=("prometheus", "json"),
+            default="prometheus",
+            help="Format of --metrics-file (default prometheus).",
+        )
+        # Required unless --queries is given, see `parse_args`.
+        parks_group = self.add_mutually_exclusive_group()
         parks_group.add_argument(
             "--parks",
             dest="parks",
@@ -88,11 +435,88 @@ class CampingArgumentParser(argparse.ArgumentParser):
         )
 
     def parse_args(self, args=None, namespace=None):
-        args = super().parse_args(args, namespace)
-        args.parks = args.parks or [p.strip() for p in sys.stdin]
+        return self._complete(super().parse_args(args, namespace))
+
+    def _complete(self, args):
+        """
+        Checks the arguments argparse can't, and reads the parks from stdin
+        for --stdin.
+        """
+        if args.offline and not args.availability_index:
+            raise self.ArgumentCombinationError(
+                "--offline can only be used with --availability-index."
+            )
+        if args.incremental and args.queries:
+            raise self.ArgumentCombinationError(
+                "--incremental can't be used with --queries."
+            )
+        if args.incremental and not (args.snapshot_file or args.watch):
+            raise self.ArgumentCombinationError(
+                "--incremental needs --snapshot-file, unless used with --watch."
+            )
+        if args.queries:
+            args.parks = args.parks or []
+            return args
+
+        missing = [
+            name
+            for name, value in (
+                ("--start-date", args.start_date),
+                ("--end-date", args.end_date),
+            )
+            if value is None
+        ]
+        if args.parks is None and not args.stdin:
+            missing.append("one of the arguments --parks --stdin")
+        if missing:
+            self.error(
+                "the following arguments are required: {}".format(
+                    ", ".join(missing)
+                )
+            )
+
+        # Park IDs from stdin are ints like those from --parks, so they can
+        # be matched against e.g. --park-interval.
+        if not args.parks:
+            args.parks = self._read_parks(sys.stdin)
+        if args.shard:
+            args.parks = shard(args.parks, *args.shard)
         self._validate_args(args)
         return args
 
+    def parse_query(self, line):
+        """
+        Parses one line of a --queries file. The line is kept on the result
+        as `query`.
+        """
+        # Checked before `_complete`, which would read stdin for --stdin.
+        query = super().parse_args(shlex.split(line))
+        if query.queries or query.stdin:
+            raise self.ArgumentCombinationError(
+                "--queries and --stdin can't be used in a query: {}".format(line)
+            )
+        # Queries always report what's available, not what changed.
+        if query.incremental or query.snapshot_file:
+            raise self.ArgumentCombinationError(
+                "--incremental and --snapshot-file can't be used in a query: "
+                "{}".format(line)
+            )
+        query = self._complete(query)
+        query.query = line
+        return query
+
+    def _read_parks(self, lines):
+        parks = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                parks.append(int(line))
+            except ValueError:
+                self.error("not a valid park ID on stdin: '{}'".format(line))
+        return parks
+
     @classmethod
     def _validate_args(cls, args):
         if len(args.parks) > 1 and len(args.campsite_ids) > 0:
@@ -116,9 +540,90 @@ class CampingArgumentParser(argparse.ArgumentParser):
         def positive_int(cls, i):
             i = int(i)
             if i <= 0:
-                msg = "Not a valid number of nights: {0}".format(i)
+                msg = "Not a valid positive number: {0}".format(i)
+                raise argparse.ArgumentTypeError(msg)
+            return i
+
+        @classmethod
+        def positive_float(cls, float_str):
+            try:
+                f = float(float_str)
+            except ValueError:
+                f = None
+            # Also rules out nan and inf.
+            if f is None or not 0 < f < float("inf"):
+                msg = "Not a valid positive number: {0}".format(float_str)
+                raise argparse.ArgumentTypeError(msg)
+            return f
+
+        @classmethod
+        def non_negative_int(cls, i):
+            i = int(i)
+            if i < 0:
+                msg = "Not a valid non-negative number: {0}".format(i)
                 raise argparse.ArgumentTypeError(msg)
             return i
 
+        @classmethod
+        def jitter(cls, jitter_str):
+            try:
+                jitter = float(jitter_str)
+            except ValueError:
+                jitter = None
+            if jitter is None or not 0 <= jitter < 1:
+                msg = "Not a valid jitter (from 0 up to 1): '{0}'.".format(
+                    jitter_str
+                )
+                raise argparse.ArgumentTypeError(msg)
+            return jitter
+
+        @classmethod
+        def weekday(cls, weekday_str):
+            try:
+                return parse_weekday(weekday_str)
+            except ValueError as e:
+                raise argparse.ArgumentTypeError(str(e))
+
+        @classmethod
+        def park_interval(cls, park_interval_str):
+            try:
+                park_id, seconds = park_interval_str.split("=")
+                return int(park_id), cls.positive_int(seconds)
+            except ValueError:
+                msg = "Not a valid park interval: '{0}'.".format(
+                    park_interval_str
+                )
+                raise argparse.ArgumentTypeError(msg)
+
+        @classmethod
+        def shard(cls, shard_str):
+            try:
+                index, count = (int(n) for n in shard_str.split("/"))
+            except ValueError:
+                index, count = -1, 0
+            if not 0 <= index < count:
+                msg = "Not a valid shard: '{0}'.".format(shard_str)
+                raise argparse.ArgumentTypeError(msg)
+            return index, count
+
+        @classmethod
+        def endpoint_rate(cls, endpoint_rate_str):
+            try:
+                endpoint, rate = endpoint_rate_str.split("=")
+                rate = float(rate)
+            except ValueError:
+                rate = None
+            # Also rules out nan and inf.
+            if (
+                rate is None
+                or not 0 < rate < float("inf")
+                or endpoint not in DEFAULT_RATES
+            ):
+                msg = "Not a valid endpoint rate: '{0}'.".format(
+                    endpoint_rate_str
+                )
+                raise argparse.ArgumentTypeError(msg)
+            return endpoint, rate
+
     class ArgumentCombinationError(Exception):
         pass
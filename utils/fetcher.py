@@ -0,0 +1,95 @@
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_MAX_PER_HOST = 4
+
+# The outcome of running one item through `fetch_all`. Exactly one of `value`
+# and `error` is meaningful: if `error` is not None the call raised.
+FetchResult = namedtuple("FetchResult", ["item", "value", "error"])
+
+
+class RequestLimiter:
+    """
+    Caps the number of HTTP requests in flight at any one time, both overall
+    and per host. This is shared by every thread making requests, so it
+    doesn't matter how the work is split up, we never hit recreation.gov with
+    more than `max_per_host` requests at once.
+    """
+
+    def __init__(
+        self,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        max_per_host=DEFAULT_MAX_PER_HOST,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_per_host = max_per_host
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._per_host = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._per_host:
+                self._per_host[host] = threading.BoundedSemaphore(
+                    self.max_per_host
+                )
+            return self._per_host[host]
+
+    @contextmanager
+    def acquire(self, url):
+        host_semaphore = self._host_semaphore(url)
+        with self._in_flight, host_semaphore:
+            yield
+
+
+def fetch_all(fn, items, max_workers=DEFAULT_MAX_IN_FLIGHT):
+    """
+    Calls `fn(item)` for every item using a pool of threads and returns a
+    list of `FetchResult`s in the same order as `items`, regardless of the
+    order in which the calls finish.
+
+    An exception raised by one call is captured in its result rather than
+    propagated, so one bad park doesn't cancel the rest.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    if max_workers <= 1 or len(items) == 1:
+        return [_run(fn, item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(lambda item: _run(fn, item), items))
+
+
+def fetch_each(fn, items, max_workers=DEFAULT_MAX_IN_FLIGHT):
+    """
+    Like `fetch_all`, but yields each `FetchResult` as soon as its call
+    finishes, in whatever order that happens to be.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield _run(fn, item)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        futures = [pool.submit(_run, fn, item) for item in items]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _run(fn, item):
+    try:
+        return FetchResult(item, fn(item), None)
+    except Exception as e:
+        LOG.debug("Fetching {} failed: {!r}".format(item, e))
+        return FetchResult(item, None, e)
@@ -0,0 +1,283 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from utils.availability import iter_bits, month_mask
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS polls (
+    park_id INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    seen_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS site_months (
+    park_id INTEGER NOT NULL,
+    site_id INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    mask INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS site_months_by_site
+    ON site_months (park_id, month, site_id, seen_at);
+CREATE TABLE IF NOT EXISTS changes (
+    park_id INTEGER NOT NULL,
+    site_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    available INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_by_site ON changes (park_id, site_id, date);
+CREATE INDEX IF NOT EXISTS changes_by_date ON changes (park_id, date);
+"""
+
+# Tells the writer thread to stop.
+_STOP = object()
+
+
+class HistoryStore:
+    """
+    An append-only SQLite history of every availability month fetched.
+
+    - `polls` has a row for every fetch of a (park, month).
+    - `site_months` has each site's available nights in a month as a
+      bitmask (bit i is day i + 1), with a new row only when it changes.
+    - `changes` has a row for every night that opened up (available = 1) or
+      was taken (available = 0), indexed by (park, site, date) and by
+      (park, date).
+
+    `record_month` only queues the month. A background thread works out the
+    changes and writes them in batches, one transaction per batch, so
+    recording history doesn't hold up polling. `flush` waits for the queue
+    to be written.
+
+    The database is only opened, and the thread started, when the store is
+    first used, in the process using it. A SQLite connection mustn't be
+    shared across a fork, so with --processes the parent, which never
+    records anything, never opens one, and each worker opens its own.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, now=time.time):
+        self.path = path
+        self.batch_size = batch_size
+        self.now = now
+        self._lock = threading.Lock()
+        # The process `_conn`, `_queue` and `_writer` belong to.
+        self._pid = None
+        self._conn = None
+        self._queue = None
+        self._writer = None
+
+    def _open(self):
+        """
+        Opens the database and starts the writer thread, unless that's
+        already been done in this process. What was opened in another one is
+        never used.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._conn = self._connect()
+            self._conn.executescript(SCHEMA)
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._write_forever, daemon=True)
+            self._writer.start()
+            self._pid = os.getpid()
+
+    def _connection(self):
+        self._open()
+        return self._conn
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        # Readers don't block the writer thread, or other processes.
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def record_month(self, park_id, month_date, campsites):
+        """
+        Queues a month's campsites (as parsed by `parse_month`) to be
+        written.
+        """
+        self._open()
+        self._queue.put((int(park_id), _month_key(month_date), self.now(), campsites))
+
+    def flush(self):
+        # Nothing can have been queued in this process if it isn't open.
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self):
+        if self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._conn.close()
+        self._pid = None
+
+    def _write_forever(self):
+        conn = self._connect()
+        # {(park_id, month): {site_id: mask}} as last written.
+        last_masks = {}
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = _STOP in batch
+            try:
+                with conn:
+                    for item in batch:
+                        if item is not _STOP:
+                            self._write(conn, last_masks, *item)
+            except Exception as e:
+                # Anything escaping would end the thread, and every later
+                # `flush` would wait for it forever.
+                LOG.error("Couldn't write availability history: {}".format(e))
+                # The cached masks may not match the database any more.
+                last_masks.clear()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+
+    def _write(self, conn, last_masks, park_id, month, seen_at, campsites):
+        conn.execute(
+            "INSERT INTO polls (park_id, month, seen_at) VALUES (?, ?, ?)",
+            (park_id, month, seen_at),
+        )
+        key = (park_id, month)
+        if key not in last_masks:
+            last_masks[key] = dict(
+                conn.execute(
+                    "SELECT site_id, mask FROM site_months "
+                    "WHERE park_id = ? AND month = ? ORDER BY seen_at",
+                    key,
+                ).fetchall()
+            )
+        previous = last_masks[key]
+
+        site_rows = []
+        change_rows = []
+        for campsite_id, campsite_data in campsites.items():
+            site_id = int(campsite_id)
+            mask = month_mask(campsite_data["availabilities"])
+            old = previous.get(site_id)
+            if old == mask:
+                continue
+            site_rows.append((park_id, site_id, month, seen_at, mask))
+            previous[site_id] = mask
+            if old is None:
+                # Nothing to compare the first sighting with.
+                continue
+            for day in iter_bits(old ^ mask):
+                change_rows.append(
+                    (
+                        park_id,
+                        site_id,
+                        "{}-{:02d}".format(month, day + 1),
+                        seen_at,
+                        (mask >> day) & 1,
+                    )
+                )
+        conn.executemany(
+            "INSERT INTO site_months (park_id, site_id, month, seen_at, mask) "
+            "VALUES (?, ?, ?, ?, ?)",
+            site_rows,
+        )
+        conn.executemany(
+            "INSERT INTO changes (park_id, site_id, date, seen_at, available) "
+            "VALUES (?, ?, ?, ?, ?)",
+            change_rows,
+        )
+
+    def changes(self, park_id, site_id=None, start=None, end=None):
+        """
+        Returns [(site_id, date, seen_at, available), ...] for the nights in
+        [start, end) of `park_id` (or just `site_id`), oldest first.
+        """
+        query = "SELECT site_id, date, seen_at, available FROM changes WHERE park_id = ?"
+        params = [int(park_id)]
+        if site_id is not None:
+            query += " AND site_id = ?"
+            params.append(int(site_id))
+        query, params = _date_range(query, params, start, end)
+        query += " ORDER BY seen_at, site_id, date"
+        return self._connection().execute(query, params).fetchall()
+
+    def openings_by_site(self, park_id, start=None, end=None):
+        """
+        {<site_id>: <number of nights that opened up>} over [start, end),
+        i.e. which sites tend to get cancellations.
+        """
+        query = (
+            "SELECT site_id, COUNT(*) FROM changes "
+            "WHERE park_id = ? AND available = 1"
+        )
+        query, params = _date_range(query, [int(park_id)], start, end)
+        query += " GROUP BY site_id ORDER BY COUNT(*) DESC, site_id"
+        return dict(self._connection().execute(query, params).fetchall())
+
+    def openings_by_hour(self, park_id, start=None, end=None):
+        """
+        {<hour of the day, local time>: <number of nights that opened up>},
+        i.e. when cancellations tend to show up.
+        """
+        query = (
+            "SELECT CAST(strftime('%H', seen_at, 'unixepoch', 'localtime') "
+            "AS INTEGER), COUNT(*) FROM changes "
+            "WHERE park_id = ? AND available = 1"
+        )
+        query, params = _date_range(query, [int(park_id)], start, end)
+        query += " GROUP BY 1 ORDER BY 1"
+        return dict(self._connection().execute(query, params).fetchall())
+
+    def compact(self, before):
+        """
+        Drops polls older than `before` (a timestamp) and site snapshots
+        that had been superseded by then, keeping every change, then
+        reclaims the space.
+        """
+        self.flush()
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM polls WHERE seen_at < ?", (before,))
+            conn.execute(
+                "DELETE FROM site_months WHERE seen_at < ? AND EXISTS ("
+                "SELECT 1 FROM site_months AS newer "
+                "WHERE newer.park_id = site_months.park_id "
+                "AND newer.month = site_months.month "
+                "AND newer.site_id = site_months.site_id "
+                "AND newer.seen_at > site_months.seen_at "
+                "AND newer.seen_at <= ?)",
+                (before, before),
+            )
+        conn.execute("VACUUM")
+
+
+def _month_key(month_date):
+    return "{:04d}-{:02d}".format(month_date.year, month_date.month)
+
+
+def _date_range(query, params, start, end):
+    if start is not None:
+        query += " AND date >= ?"
+        params.append(_iso(start))
+    if end is not None:
+        query += " AND date < ?"
+        params.append(_iso(end))
+    return query, params
+
+
+def _iso(d):
+    return date(d.year, d.month, d.day).isoformat()
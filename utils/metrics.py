@@ -0,0 +1,208 @@
+import json
+import threading
+import time
+from contextlib import nullcontext
+
+PREFIX = "camping_"
+
+# Handed out by a disabled `Metrics` so timing something costs next to
+# nothing when nobody is looking.
+_NULL_TIMER = nullcontext()
+
+
+class Metrics:
+    """
+    Counters and timers, each identified by a name and optional labels,
+    e.g. `count("http_responses", endpoint="availability", status=200)`.
+
+    A disabled registry records nothing, so it can be called from hot paths
+    unconditionally.
+    """
+
+    def __init__(self, enabled=True, clock=time.perf_counter):
+        self.enabled = enabled
+        self.clock = clock
+        self._counters = {}
+        # {key: [count, total seconds, max seconds]}
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                self._timers[key] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                timer[2] = max(timer[2], seconds)
+
+    def timer(self, name, **labels):
+        """
+        Context manager that adds the time spent in it to the timer `name`.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def drain(self):
+        """
+        Returns everything recorded so far and starts afresh, e.g. to send a
+        worker process' metrics back to be `merge`d into the parent's.
+        """
+        with self._lock:
+            state = (self._counters, self._timers)
+            self._counters = {}
+            self._timers = {}
+        return state
+
+    def merge(self, state):
+        counters, timers = state
+        with self._lock:
+            for key, value in counters.items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, (count, total, longest) in timers.items():
+                timer = self._timers.get(key)
+                if timer is None:
+                    self._timers[key] = [count, total, longest]
+                else:
+                    timer[0] += count
+                    timer[1] += total
+                    timer[2] = max(timer[2], longest)
+
+    def counters(self):
+        with self._lock:
+            return sorted(self._counters.items())
+
+    def timers(self):
+        with self._lock:
+            return sorted(
+                (key, tuple(timer)) for key, timer in self._timers.items()
+            )
+
+    def summary(self):
+        """
+        A human readable table of everything recorded, for --profile.
+        """
+        lines = []
+        timers = self.timers()
+        if timers:
+            lines.append(
+                "{:<56} {:>7} {:>10} {:>9} {:>9}".format(
+                    "timer", "count", "total ms", "mean ms", "max ms"
+                )
+            )
+            for key, (count, total, longest) in timers:
+                lines.append(
+                    "{:<56} {:>7} {:>10.1f} {:>9.1f} {:>9.1f}".format(
+                        _format_key(key),
+                        count,
+                        total * 1000,
+                        total / count * 1000,
+                        longest * 1000,
+                    )
+                )
+        counters = self.counters()
+        if counters:
+            if lines:
+                lines.append("")
+            lines.append("{:<56} {:>7}".format("counter", "value"))
+            for key, value in counters:
+                lines.append("{:<56} {:>7}".format(_format_key(key), value))
+        return "\n".join(lines)
+
+    def to_prometheus(self):
+        """
+        The Prometheus text exposition format. Counters get a `_total`
+        suffix and timers are exported as summaries in seconds.
+        """
+        lines = []
+        seen = set()
+        for (name, labels), value in self.counters():
+            metric = PREFIX + name + "_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append("# TYPE {} counter".format(metric))
+            lines.append(
+                "{}{} {}".format(metric, _format_labels(labels), value)
+            )
+        for (name, labels), (count, total, _) in self.timers():
+            metric = PREFIX + name + "_seconds"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append("# TYPE {} summary".format(metric))
+            lines.append(
+                "{}_count{} {}".format(metric, _format_labels(labels), count)
+            )
+            lines.append(
+                "{}_sum{} {:.6f}".format(metric, _format_labels(labels), total)
+            )
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        return json.dumps(
+            {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.counters()
+                ],
+                "timers": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": count,
+                        "seconds": total,
+                        "max_seconds": longest,
+                    }
+                    for (name, labels), (count, total, longest) in self.timers()
+                ],
+            }
+        )
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = self.metrics.clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(
+            self.name, self.metrics.clock() - self.start, **self.labels
+        )
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{{{}}}".format(
+        ",".join(
+            '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"'))
+            for k, v in labels
+        )
+    )
+
+
+def _format_key(key):
+    name, labels = key
+    return name + _format_labels(labels)
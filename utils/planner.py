@@ -0,0 +1,89 @@
+import logging
+from datetime import datetime, timedelta
+
+from utils.availability import as_date, range_mask
+from utils.calendar_mask import calendar_mask
+
+LOG = logging.getLogger(__name__)
+
+# Nights this many days before today are still fetched, in case the park's
+# today is behind ours.
+PAST_GRACE_DAYS = 1
+
+
+def month_starts(start_date, end_date):
+    """
+    Returns the first of each month from `start_date` to `end_date`.
+    """
+    months = []
+    year, month = start_date.year, start_date.month
+    while datetime(year, month, 1) <= end_date:
+        months.append(datetime(year, month, 1))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def needed_nights(
+    start_date, end_date, nights=None, weekdays=None, today=None, calendar=None
+):
+    """
+    A bitmask, relative to `start_date`, of every night that's part of a
+    stay that could be reported: `nights` consecutive nights in the window,
+    all on `weekdays` if given, none of them already past. A `calendar`
+    (see `CalendarMask`) replaces `nights` and `weekdays`, for searches with
+    more constraints than those.
+
+    `nights` works like it does in `get_num_available_sites`, a missing or
+    out of range value meaning the whole window.
+    """
+    if calendar is None:
+        calendar = calendar_mask(
+            start_date, end_date, nights, tuple(weekdays) if weekdays else None
+        )
+    available = range_mask(0, calendar.num_days)
+    if today is not None:
+        past = (today - timedelta(days=PAST_GRACE_DAYS) - calendar.start).days
+        available &= ~range_mask(0, past)
+    return calendar.stay_nights(available)
+
+
+def plan_months(
+    start_date, end_date, nights=None, weekdays=None, today=None, calendar=None
+):
+    """
+    The first of each month holding a night in `needed_nights`, i.e. the
+    months worth fetching, nearest to `today` first (earliest first without
+    it). Months that can't change the answer, because they're past or
+    because no stay could touch them, are left out.
+    """
+    window_start = as_date(start_date)
+    needed = needed_nights(start_date, end_date, nights, weekdays, today, calendar)
+    months = []
+    for month_date in month_starts(start_date, end_date):
+        first = (as_date(month_date) - window_start).days
+        last = (as_date(_next_month(month_date)) - window_start).days
+        if needed & range_mask(first, last):
+            months.append(month_date)
+
+    if today is not None:
+        months.sort(key=lambda m: abs(months_ahead(today, m)))
+    LOG.debug(
+        "Fetching {} of the months from {} to {}".format(
+            len(months), start_date, end_date
+        )
+    )
+    return months
+
+
+def _next_month(month_date):
+    if month_date.month == 12:
+        return datetime(month_date.year + 1, 1, 1)
+    return datetime(month_date.year, month_date.month + 1, 1)
+
+
+def months_ahead(today, month_date):
+    """
+    How many months after today's month `month_date` is, negative if it's
+    before.
+    """
+    return (month_date.year - today.year) * 12 + (month_date.month - today.month)
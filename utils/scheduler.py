@@ -0,0 +1,94 @@
+import heapq
+import logging
+import random
+import time
+from datetime import date
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 5 * 60
+DEFAULT_JITTER = 0.1
+
+
+class PollScheduler:
+    """
+    Decides when each (park, month) should next be polled in watch mode.
+
+    The interval for a (park, month) is, in order of precedence:
+      - the park's entry in `park_intervals`, if it has one.
+      - `month_intervals[n]` where n is how many months ahead of today the
+        month is. Months further out than the list use the last value.
+      - `poll_interval`.
+
+    Every interval is stretched or shrunk by a random amount of up to
+    `jitter` (a fraction of the interval) so polls drift apart over time
+    rather than all firing at once.
+    """
+
+    def __init__(
+        self,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+        park_intervals=None,
+        month_intervals=(),
+        jitter=DEFAULT_JITTER,
+        clock=time.monotonic,
+        sleep=time.sleep,
+        today=date.today,
+        rng=random.random,
+    ):
+        self.poll_interval = poll_interval
+        self.park_intervals = park_intervals or {}
+        self.month_intervals = month_intervals
+        self.jitter = jitter
+        self.clock = clock
+        self.sleep = sleep
+        self.today = today
+        self.rng = rng
+        self._queue = []
+
+    def interval_for(self, park_id, month_date):
+        if park_id in self.park_intervals:
+            return self.park_intervals[park_id]
+        if self.month_intervals:
+            today = self.today()
+            months_ahead = (month_date.year - today.year) * 12 + (
+                month_date.month - today.month
+            )
+            index = min(max(months_ahead, 0), len(self.month_intervals) - 1)
+            return self.month_intervals[index]
+        return self.poll_interval
+
+    def _jittered(self, interval):
+        return interval * (1 + self.jitter * (2 * self.rng() - 1))
+
+    def add(self, park_id, month_date):
+        """
+        Schedules a (park, month) to be polled straight away, and every
+        interval after that.
+        """
+        heapq.heappush(self._queue, (self.clock(), park_id, month_date))
+
+    def wait(self):
+        """
+        Sleeps until at least one (park, month) is due, then returns every
+        (park, month) that is due, in the order they became due. Each is
+        rescheduled for its next poll.
+        """
+        if not self._queue:
+            return []
+        delay = self._queue[0][0] - self.clock()
+        if delay > 0:
+            LOG.debug("Sleeping {:.1f}s until the next poll".format(delay))
+            self.sleep(delay)
+
+        now = self.clock()
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            _, park_id, month_date = heapq.heappop(self._queue)
+            due.append((park_id, month_date))
+        for park_id, month_date in due:
+            next_poll = now + self._jittered(
+                self.interval_for(park_id, month_date)
+            )
+            heapq.heappush(self._queue, (next_poll, park_id, month_date))
+        return due
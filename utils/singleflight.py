@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SingleFlight:
+    """
+    Runs a function once per key at a time: callers that ask for a key
+    while it's already being worked out wait for that call and share its
+    result (or its exception) instead of starting their own.
+
+    Nothing is kept once the call is done, see `Memo` for that.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {<key>: <_Call>}, for the calls in flight.
+        self._calls = {}
+        # {(<event loop>, <key>): <future>}, for `do_async`.
+        self._futures = {}
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            return call.wait()
+
+        try:
+            call.value = fn(*args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    async def do_async(self, key, fn, *args):
+        """
+        `do` for asyncio: `fn` is run in the event loop's default executor,
+        so it can block. Coroutines asking for `key` meanwhile await the
+        same future rather than each taking up a thread to wait, and it
+        goes through `do`, so it's shared with threads calling `do` too.
+        """
+        # Only asyncio callers need asyncio, and it's slow to import.
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        future_key = (loop, key)
+        with self._lock:
+            future = self._futures.get(future_key)
+            if future is None:
+                future = self._futures[future_key] = loop.run_in_executor(
+                    None, self.do, key, fn, *args
+                )
+                future.add_done_callback(
+                    lambda _: self._drop_future(future_key)
+                )
+        # One caller being cancelled mustn't cancel the call for the rest.
+        return await asyncio.shield(future)
+
+    def _drop_future(self, future_key):
+        with self._lock:
+            del self._futures[future_key]
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class Memo:
+    """
+    Results kept for `ttl` seconds, and at most `max_entries` of them, the
+    least recently used going first.
+    """
+
+    def __init__(self, ttl, max_entries, now=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.now = now
+        self._lock = threading.Lock()
+        # {<key>: (<expiry time>, <value>)}, least recently used first.
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= self.now():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.now() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
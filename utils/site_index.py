@@ -0,0 +1,267 @@
+import threading
+from collections import defaultdict
+
+# The attributes of a site in the availability payload that can be filtered
+# on, and the `SiteFilter` argument for each.
+ATTRIBUTES = (
+    ("campsite_type", "campsite_types"),
+    ("loop", "loops"),
+    ("campsite_reserve_type", "reserve_types"),
+    ("type_of_use", "types_of_use"),
+    ("capacity_rating", "capacity_ratings"),
+)
+
+
+class SiteFilter:
+    """
+    Which sites a search wants, e.g. "loop A or B, at least 6 people,
+    Site-Specific, not these IDs".
+
+    Each attribute has a set of allowed values and a site has to have one
+    of them, for every attribute given. `people` is the size of the group,
+    which has to be within the site's min and max number of people. Site
+    IDs are kept as strings, like the keys of the payload, so every check
+    is a set lookup.
+
+    Filters combine with `&`, e.g. a search's filter with an exclusion file.
+    Combining two that no site can satisfy both of, e.g. with different
+    campsite IDs, gives a filter with `matches_nothing` set.
+    """
+
+    def __init__(
+        self,
+        campsite_types=(),
+        loops=(),
+        reserve_types=(),
+        types_of_use=(),
+        capacity_ratings=(),
+        campsite_ids=(),
+        excluded_site_ids=(),
+        people=None,
+    ):
+        values = {
+            "campsite_types": campsite_types,
+            "loops": loops,
+            "reserve_types": reserve_types,
+            "types_of_use": types_of_use,
+            "capacity_ratings": capacity_ratings,
+        }
+        # {<payload attribute>: <allowed values>}, only for those given.
+        self.allowed = {
+            attribute: frozenset(values[name])
+            for attribute, name in ATTRIBUTES
+            if values[name]
+        }
+        self.campsite_ids = frozenset(str(i) for i in campsite_ids)
+        self.excluded_site_ids = frozenset(str(i) for i in excluded_site_ids)
+        self.people = people
+        self.matches_nothing = False
+
+    @classmethod
+    def build(
+        cls, campsite_type=None, campsite_ids=(), excluded_site_ids=(), site_filter=None
+    ):
+        """
+        The filter for the older `campsite_type`, `campsite_ids` and
+        `excluded_site_ids` arguments, combined with `site_filter` if given.
+        """
+        built = cls(
+            campsite_types=[campsite_type] if campsite_type else (),
+            campsite_ids=campsite_ids,
+            excluded_site_ids=excluded_site_ids,
+        )
+        if site_filter is None:
+            return built
+        return built & site_filter
+
+    def key(self):
+        return (
+            tuple(sorted((a, tuple(sorted(v))) for a, v in self.allowed.items())),
+            tuple(sorted(self.campsite_ids)),
+            tuple(sorted(self.excluded_site_ids)),
+            self.people,
+            self.matches_nothing,
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, SiteFilter) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __bool__(self):
+        return bool(
+            self.matches_nothing
+            or self.allowed
+            or self.campsite_ids
+            or self.excluded_site_ids
+            or self.people is not None
+        )
+
+    def __repr__(self):
+        return "SiteFilter{}".format(self.key())
+
+    def __and__(self, other):
+        combined = SiteFilter()
+        combined.matches_nothing = self.matches_nothing or other.matches_nothing
+        combined.allowed = dict(self.allowed)
+        for attribute, values in other.allowed.items():
+            if attribute in combined.allowed:
+                values = combined.allowed[attribute] & values
+            combined.allowed[attribute] = values
+        if self.campsite_ids and other.campsite_ids:
+            combined.campsite_ids = self.campsite_ids & other.campsite_ids
+            if not combined.campsite_ids:
+                # No site is in both.
+                combined.matches_nothing = True
+        else:
+            combined.campsite_ids = self.campsite_ids or other.campsite_ids
+        combined.excluded_site_ids = self.excluded_site_ids | other.excluded_site_ids
+        if self.people is None or other.people is None:
+            combined.people = self.people if other.people is None else other.people
+        else:
+            combined.people = max(self.people, other.people)
+        return combined
+
+    def excludes(self, campsite_id):
+        return campsite_id in self.excluded_site_ids
+
+    def wants(self, campsite_data):
+        """
+        Whether a site (as in the payload) matches everything but the
+        exclusions, which `excludes` checks so excluded sites can be
+        dropped altogether.
+        """
+        if self.matches_nothing:
+            return False
+        for attribute, values in self.allowed.items():
+            if campsite_data.get(attribute) not in values:
+                return False
+        if self.campsite_ids and str(campsite_data["campsite_id"]) not in self.campsite_ids:
+            return False
+        if self.people is not None:
+            return _fits(
+                self.people,
+                campsite_data.get("min_num_people"),
+                campsite_data.get("max_num_people"),
+            )
+        return True
+
+
+class SiteIndex:
+    """
+    The attributes of every site seen at a park, indexed by value, so a
+    `SiteFilter` can be resolved into the set of sites it wants once with a
+    few set operations, then each site checked with a lookup.
+
+    Built up from the months fetched with `update`. Resolved filters are
+    cached until a new site turns up or a site's details change.
+    """
+
+    def __init__(self, campsites=None):
+        self._lock = threading.Lock()
+        # {<site_id>: {<attribute>: <value>}}
+        self._sites = {}
+        # {<attribute>: {<value>: {<site_id>, ...}}}
+        self._by_value = {attribute: defaultdict(set) for attribute, _ in ATTRIBUTES}
+        self._resolved = {}
+        if campsites:
+            self.update(campsites)
+
+    def __len__(self):
+        return len(self._sites)
+
+    def __contains__(self, campsite_id):
+        return campsite_id in self._sites
+
+    def update(self, campsites):
+        """
+        Indexes the sites of a month's payload, {<site_id>: <site>}, that
+        are new or whose details have changed, e.g. a site turned into a
+        group site. The rest are skipped with a comparison each.
+        """
+        changed = []
+        for campsite_id, campsite_data in campsites.items():
+            attributes = site_attributes(campsite_data)
+            if self._sites.get(campsite_id) != attributes:
+                changed.append((campsite_id, attributes))
+        if not changed:
+            return
+        with self._lock:
+            for campsite_id, attributes in changed:
+                old = self._sites.get(campsite_id)
+                if old is not None:
+                    for attribute, _ in ATTRIBUTES:
+                        self._by_value[attribute][old[attribute]].discard(campsite_id)
+                self._sites[campsite_id] = attributes
+                for attribute, _ in ATTRIBUTES:
+                    self._by_value[attribute][attributes[attribute]].add(campsite_id)
+            self._resolved = {}
+
+    def select(self, site_filter):
+        """
+        The IDs of the known sites `site_filter` wants, as a frozenset.
+        """
+        return frozenset(
+            campsite_id
+            for campsite_id, wanted in self.resolve(site_filter).items()
+            if wanted
+        )
+
+    def resolve(self, site_filter):
+        """
+        {<site_id>: <whether `site_filter` wants it>} for every site known
+        so far. Sites that turn up later aren't in it, so they can be
+        checked with `SiteFilter.wants` instead.
+        """
+        with self._lock:
+            resolved = self._resolved.get(site_filter)
+            if resolved is None:
+                selected = self._select(site_filter)
+                resolved = self._resolved[site_filter] = {
+                    campsite_id: campsite_id in selected
+                    for campsite_id in self._sites
+                }
+            return resolved
+
+    def _select(self, site_filter):
+        # Called with the lock held.
+        if site_filter.matches_nothing:
+            return frozenset()
+        candidates = set(self._sites)
+        for attribute, values in site_filter.allowed.items():
+            by_value = self._by_value[attribute]
+            candidates &= set().union(*(by_value.get(v, ()) for v in values))
+        if site_filter.campsite_ids:
+            candidates &= site_filter.campsite_ids
+        candidates -= site_filter.excluded_site_ids
+        if site_filter.people is not None:
+            candidates = {
+                campsite_id
+                for campsite_id in candidates
+                if _fits(
+                    site_filter.people,
+                    self._sites[campsite_id]["min_num_people"],
+                    self._sites[campsite_id]["max_num_people"],
+                )
+            }
+        return frozenset(candidates)
+
+
+def site_attributes(campsite_data):
+    """
+    The details of a site in the payload that `SiteIndex` indexes.
+    """
+    attributes = {attribute: campsite_data.get(attribute) for attribute, _ in ATTRIBUTES}
+    attributes["min_num_people"] = campsite_data.get("min_num_people")
+    attributes["max_num_people"] = campsite_data.get("max_num_people")
+    return attributes
+
+
+def _fits(people, min_num_people, max_num_people):
+    # Sites that don't say are given the benefit of the doubt.
+    if min_num_people is not None and people < min_num_people:
+        return False
+    if max_num_people is not None and people > max_num_people:
+        return False
+    return True
@@ -0,0 +1,101 @@
+import json
+import logging
+import os
+import threading
+from datetime import date
+
+from utils.availability import SiteBitmaps
+
+LOG = logging.getLogger(__name__)
+
+
+class SnapshotStore:
+    """
+    The last availability we saw for each park, so that each new poll can be
+    reduced to just the nights that opened up or were taken since.
+
+    Snapshots are the `SiteBitmaps` from `get_park_information`. If `path`
+    is given they are read from and saved to that JSON file, so the
+    comparison carries over between runs. Otherwise they only live as long
+    as the process, which is enough for watch mode.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        if path is None:
+            return
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            LOG.warning("Ignoring unreadable snapshot file {}: {}".format(path, e))
+            return
+        for park_id, snapshot in stored.items():
+            self._snapshots[park_id] = SiteBitmaps(
+                date.fromisoformat(snapshot["origin"]),
+                {
+                    site_id: int(mask, 16)
+                    for site_id, mask in snapshot["sites"].items()
+                },
+            )
+
+    def diff(self, park_id, bitmaps, window):
+        """
+        Compares `bitmaps` with the last snapshot of `park_id` over the
+        nights in `window` (a bitmask relative to `bitmaps.origin`), then
+        makes `bitmaps` the new snapshot.
+
+        Returns ({<site_id>: <opened nights>}, {<site_id>: <closed nights>}),
+        both bitmasks relative to `bitmaps.origin`. Sites with no changes
+        are left out. The first time a park is seen, everything available
+        counts as opened.
+        """
+        with self._lock:
+            previous = self._snapshots.get(str(park_id))
+            self._snapshots[str(park_id)] = bitmaps
+
+        shift = 0
+        if previous is not None:
+            shift = (previous.origin - bitmaps.origin).days
+
+        opened, closed = {}, {}
+        site_ids = set(bitmaps)
+        if previous is not None:
+            site_ids.update(previous)
+        for site_id in site_ids:
+            new = bitmaps.get(site_id, 0) & window
+            old = 0
+            if previous is not None:
+                old = previous.get(site_id, 0)
+                old = old << shift if shift >= 0 else old >> -shift
+                old &= window
+            if new & ~old:
+                opened[site_id] = new & ~old
+            if old & ~new:
+                closed[site_id] = old & ~new
+        return opened, closed
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            data = json.dumps(
+                {
+                    park_id: {
+                        "origin": bitmaps.origin.isoformat(),
+                        "sites": {
+                            site_id: format(mask, "x")
+                            for site_id, mask in bitmaps.items()
+                        },
+                    }
+                    for park_id, bitmaps in self._snapshots.items()
+                }
+            )
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,44 @@
+import zlib
+
+
+def shard(items, index, count):
+    """
+    The items that belong to shard `index` of `count`. Items are assigned by
+    a CRC of their string form, which unlike `hash` is the same in every
+    process on every machine, so `count` machines each given the same list
+    and their own `index` split it between them without overlap.
+    """
+    return [
+        item
+        for item in items
+        if zlib.crc32(str(item).encode("utf-8")) % count == index
+    ]
+
+
+def chunks(items, size):
+    items = list(items)
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def map_in_processes(fn, batches, processes, initializer=None, initargs=()):
+    """
+    Calls `fn(batch)` for every batch in a pool of `processes` processes,
+    yielding (<index of the batch>, <result>) as each one finishes, so the
+    caller can use results straight away and put them back in order later.
+
+    `fn`, `initializer` and everything passed to them must be picklable.
+    `initializer(*initargs)` runs once in each process before any batch, to
+    set up whatever the process needs (connections, configuration, ...).
+    """
+    # multiprocessing is only needed with --processes, so don't make every
+    # run pay for importing it.
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(
+        max_workers=processes, initializer=initializer, initargs=initargs
+    ) as pool:
+        futures = {
+            pool.submit(fn, batch): index for index, batch in enumerate(batches)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()